@@ -0,0 +1,215 @@
+"""
+WebSocket Backplane
+Pub/sub link that carries room events between API workers
+"""
+
+import abc
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+from urllib.parse import unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Every worker subscribes to this one channel and filters by room itself
+BACKPLANE_CHANNEL = "auction_events"
+
+# Bytes a publisher may have waiting for a slow or stalled server; beyond
+# this, messages are dropped rather than held in memory
+MAX_PUBLISH_BUFFER = 4 * 1024 * 1024
+
+MessageHandler = Callable[[bytes], None]
+
+
+class Backplane(abc.ABC):
+    """
+    Fan-out between ConnectionManager instances.
+
+    publish() never blocks the caller; delivery is best effort and a message
+    published while a link is down is lost (presence is resynced on reconnect).
+    """
+
+    @abc.abstractmethod
+    async def start(self, handler: MessageHandler, on_connect: Optional[Callable[[], None]] = None):
+        """Begin delivering messages from other workers to handler"""
+
+    @abc.abstractmethod
+    def publish(self, payload: bytes):
+        """Send payload to every other worker"""
+
+    def has_peers(self) -> bool:
+        """False when nobody else can receive, so publishing may be skipped"""
+        return True
+
+    async def stop(self):
+        pass
+
+
+class InProcessBackplane(Backplane):
+    """Backplane for a single process; several managers may share one instance"""
+
+    def __init__(self):
+        self._handlers: List[MessageHandler] = []
+
+    async def start(self, handler: MessageHandler, on_connect: Optional[Callable[[], None]] = None):
+        self._handlers.append(handler)
+        if on_connect is not None:
+            on_connect()
+
+    def publish(self, payload: bytes):
+        if not self._handlers:
+            return
+        loop = asyncio.get_running_loop()
+        for handler in self._handlers:
+            loop.call_soon(handler, payload)
+
+    def has_peers(self) -> bool:
+        return len(self._handlers) > 1
+
+
+class RESPError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+def encode_command(*args) -> bytes:
+    """Encode a command as a RESP array of bulk strings"""
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Read one RESP reply"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest
+    if kind == b"-":
+        raise RESPError(rest.decode(errors="replace"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Unexpected RESP reply: {line!r}")
+
+
+class RedisBackplane(Backplane):
+    """
+    Backplane over Redis PUBLISH/SUBSCRIBE, speaking RESP directly on asyncio
+    streams. Works with Redis, Valkey, KeyDB or any server implementing pub/sub.
+    """
+
+    def __init__(self, url: str, channel: str = BACKPLANE_CHANNEL, retry_seconds: float = 1.0,
+                 max_buffer: int = MAX_PUBLISH_BUFFER):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.channel = channel
+        self.retry_seconds = retry_seconds
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._publisher_ready = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, handler: MessageHandler, on_connect: Optional[Callable[[], None]] = None):
+        self._tasks = [
+            asyncio.create_task(self._run(self._subscribe, handler, on_connect)),
+            asyncio.create_task(self._run(self._publisher)),
+        ]
+
+    def publish(self, payload: bytes):
+        if self._writer is None or self._writer.is_closing():
+            self.dropped += 1
+            return
+        if self._writer.transport.get_write_buffer_size() >= self.max_buffer:
+            # The server is not keeping up; shed instead of buffering without bound
+            self.dropped += 1
+            return
+        self._writer.write(encode_command("PUBLISH", self.channel, payload))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password is not None:
+            args = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            writer.write(encode_command(*args))
+            await read_reply(reader)
+        return reader, writer
+
+    async def _run(self, link: Callable[..., Awaitable[None]], *args):
+        """Keep one link up, reconnecting after failures"""
+        while True:
+            try:
+                await link(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Backplane link to %s:%s lost: %s", self.host, self.port, e)
+            await asyncio.sleep(self.retry_seconds)
+
+    async def _publisher(self):
+        reader, writer = await self._connect()
+        self._writer = writer
+        self._publisher_ready.set()
+        try:
+            # PUBLISH replies are only drained; errors are logged, never raised to callers
+            while True:
+                try:
+                    await read_reply(reader)
+                except RESPError as e:
+                    logger.warning("Backplane publish failed: %s", e)
+        finally:
+            self._publisher_ready.clear()
+            self._writer = None
+            writer.close()
+
+    async def _subscribe(self, handler: MessageHandler, on_connect: Optional[Callable[[], None]]):
+        reader, writer = await self._connect()
+        try:
+            writer.write(encode_command("SUBSCRIBE", self.channel))
+            await read_reply(reader)
+            if on_connect is not None:
+                # Let the callback publish (e.g. ask peers for a presence resync)
+                await self._publisher_ready.wait()
+                on_connect()
+            while True:
+                reply = await read_reply(reader)
+                if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                    try:
+                        handler(reply[2])
+                    except Exception:
+                        logger.exception("Backplane message handler failed")
+        finally:
+            writer.close()
+
+
+def create_backplane(url: str) -> Backplane:
+    """Backplane for WS_BACKPLANE_URL: empty for in-process, redis:// for Redis"""
+    if not url:
+        return InProcessBackplane()
+    scheme = urlparse(url).scheme
+    if scheme in ("redis", "resp"):
+        return RedisBackplane(url)
+    raise ValueError(f"Unsupported WS_BACKPLANE_URL scheme: {scheme}")
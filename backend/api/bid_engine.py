@@ -0,0 +1,367 @@
+"""
+Live Auction Bid Engine
+Holds live auction state in memory and orders bids per auction
+"""
+
+import asyncio
+import bisect
+import contextvars
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import models
+from api.config import (
+    AUCTION_SCHEDULER_ENABLED, PROXY_BID_INCREMENT, SOFT_CLOSE_WINDOW_SECONDS, SOFT_CLOSE_EXTENSION_SECONDS
+)
+
+# Prices are stored as DECIMAL(15, 2); decide on the same precision the database keeps
+PRICE_QUANTUM = Decimal("0.01")
+
+SOFT_CLOSE_WINDOW = timedelta(seconds=SOFT_CLOSE_WINDOW_SECONDS)
+SOFT_CLOSE_EXTENSION = timedelta(seconds=SOFT_CLOSE_EXTENSION_SECONDS)
+
+# How far a proxy bids above the best competing amount
+PROXY_INCREMENT = Decimal(PROXY_BID_INCREMENT).quantize(PRICE_QUANTUM)
+
+class BidRejected(Exception):
+    """Raised when the engine refuses a bid"""
+
+    def __init__(self, reason: str, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+        self.detail = detail
+
+
+class ProxyMaximum:
+    """A bidder's hidden maximum for one auction"""
+
+    __slots__ = ("user_id", "bidder_name", "max_amount", "set_at")
+
+    def __init__(self, user_id, bidder_name: str, max_amount: Decimal, set_at: Optional[datetime] = None):
+        self.user_id = user_id
+        self.bidder_name = bidder_name
+        self.max_amount = Decimal(max_amount).quantize(PRICE_QUANTUM)
+        # When this amount was set; the earlier of two equal maximums wins. It
+        # is stored with the maximum so a reload or another worker agrees
+        self.set_at = set_at if set_at is not None else datetime.utcnow()
+
+    def key(self) -> Tuple[Decimal, datetime, str]:
+        return (-self.max_amount, self.set_at, str(self.user_id))
+
+
+class ProxyBook:
+    """
+    Hidden maximums of one auction, highest first, one per bidder.
+
+    Only the top two ever matter: however many proxies compete, the
+    highest wins at one increment over the runner-up, so the outcome is
+    a single bid rather than one per step of the contest.
+    """
+
+    __slots__ = ("_keys", "_proxies", "_by_user")
+
+    def __init__(self):
+        self._keys: List[Tuple[Decimal, datetime, str]] = []
+        self._proxies: List[ProxyMaximum] = []
+        self._by_user: Dict[object, ProxyMaximum] = {}
+
+    def __len__(self) -> int:
+        return len(self._proxies)
+
+    def get(self, user_id) -> Optional[ProxyMaximum]:
+        return self._by_user.get(user_id)
+
+    def put(self, proxy: ProxyMaximum):
+        """Add a bidder's maximum, replacing their previous one"""
+        previous = self._by_user.pop(proxy.user_id, None)
+        if previous is not None:
+            i = bisect.bisect_left(self._keys, previous.key())
+            del self._keys[i], self._proxies[i]
+        key = proxy.key()
+        i = bisect.bisect_left(self._keys, key)
+        self._keys.insert(i, key)
+        self._proxies.insert(i, proxy)
+        self._by_user[proxy.user_id] = proxy
+
+    def top_two(self) -> Tuple[Optional[ProxyMaximum], Optional[ProxyMaximum]]:
+        proxies = self._proxies
+        return (proxies[0] if proxies else None, proxies[1] if len(proxies) > 1 else None)
+
+
+class AuctionState:
+    """In-memory state of a single live auction"""
+
+    __slots__ = (
+        "auction_id", "current_price", "leading_bid_id", "leading_user_id", "bid_count", "ends_at",
+        "proxies", "is_open",
+    )
+
+    def __init__(self, auction_id: str, current_price: Decimal, bid_count: int = 0, leading_bid_id=None,
+                 ends_at: Optional[datetime] = None, leading_user_id=None):
+        self.auction_id = auction_id
+        self.current_price = Decimal(current_price).quantize(PRICE_QUANTUM)
+        self.leading_bid_id = leading_bid_id
+        self.leading_user_id = leading_user_id
+        self.bid_count = bid_count
+        # Bids at or after this are refused; None while there is no end time
+        self.ends_at = ends_at
+        self.proxies = ProxyBook()
+        self.is_open = True
+
+
+class AcceptedBid:
+    """Outcome of an accepted bid, ready to be persisted and broadcast"""
+
+    __slots__ = (
+        "id", "auction_id", "user_id", "amount", "type",
+        "bidder_name", "bidder_number", "timestamp", "previous_price", "previous_bid_id", "extended_until",
+        "proxy_response",
+    )
+
+    def __init__(self, auction_id: str, amount: Decimal, type: str, bidder_name: str,
+                 user_id=None, bidder_number: Optional[str] = None):
+        self.id = uuid.uuid4()
+        self.auction_id = auction_id
+        self.user_id = user_id
+        self.amount = Decimal(amount).quantize(PRICE_QUANTUM)
+        self.type = type
+        self.bidder_name = bidder_name
+        self.bidder_number = bidder_number
+        self.timestamp = datetime.utcnow()
+        self.previous_price = None
+        self.previous_bid_id = None
+        # New end time when this bid landed in the soft-close window
+        self.extended_until = None
+        # Bid a competing proxy placed straight after this one, if any
+        self.proxy_response = None
+
+
+class BidEngine:
+    """
+    Accepts or rejects bids against in-memory auction state.
+
+    Every live auction has its own queue drained by a single writer task, so
+    bids for one lot are decided strictly in arrival order while different
+    lots proceed independently. Persistence happens after the decision.
+    Proxy maximums go through the same queue, and each decision leaves the
+    best proxy answering the price in one step.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, AuctionState] = {}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+
+    def is_loaded(self, auction_id: str) -> bool:
+        return auction_id in self._states
+
+    def get_state(self, auction_id: str) -> Optional[AuctionState]:
+        return self._states.get(auction_id)
+
+    def open(self, auction_id: str, current_price: Decimal, bid_count: int = 0, leading_bid_id=None,
+             ends_at: Optional[datetime] = None, leading_user_id=None) -> AuctionState:
+        """Load a live auction into memory (no-op if it is already loaded)"""
+        state = self._states.get(auction_id)
+        if state is None:
+            state = AuctionState(auction_id, current_price, bid_count, leading_bid_id, ends_at, leading_user_id)
+            self._states[auction_id] = state
+        return state
+
+    def close(self, auction_id: str):
+        """Stop taking bids for an auction and drop its state"""
+        state = self._states.pop(auction_id, None)
+        if state is not None:
+            state.is_open = False
+        writer = self._writers.pop(auction_id, None)
+        if writer is not None:
+            writer.cancel()
+        queue = self._queues.pop(auction_id, None)
+        while queue is not None and not queue.empty():
+            _, future = queue.get_nowait()
+            if not future.done():
+                future.set_exception(BidRejected("not_live", "Auction is not live"))
+
+    def invalidate(self, auction_id: str):
+        """Forget cached state so it is reloaded from the database on next use"""
+        self.close(auction_id)
+
+    def observe(self, auction_id: str, bid_id, amount: Decimal, user_id=None):
+        """Apply a bid another worker has committed, if it beats what this worker knows"""
+        state = self._states.get(auction_id)
+        if state is None or amount <= state.current_price:
+            return
+        state.current_price = amount
+        state.leading_bid_id = bid_id
+        state.leading_user_id = user_id
+        state.bid_count += 1
+
+    def observe_proxy(self, auction_id: str, proxy: ProxyMaximum):
+        """Record a maximum registered on another worker; that worker has placed any bid it caused"""
+        state = self._states.get(auction_id)
+        if state is not None:
+            existing = state.proxies.get(proxy.user_id)
+            if existing is None or proxy.max_amount > existing.max_amount:
+                state.proxies.put(proxy)
+
+    def extend(self, auction_id: str, ends_at: datetime):
+        """Move a loaded auction's end time back, e.g. after a late bid on another worker"""
+        state = self._states.get(auction_id)
+        if state is not None and state.ends_at is not None and ends_at > state.ends_at:
+            state.ends_at = ends_at
+
+    async def submit(self, bid: AcceptedBid) -> AcceptedBid:
+        """Queue a bid behind earlier bids for the same auction and await the decision"""
+        return await self._enqueue(bid.auction_id, bid)
+
+    async def submit_proxy(self, auction_id: str, proxy: ProxyMaximum) -> Optional[AcceptedBid]:
+        """Queue a new or raised maximum; resolves to the visible bid it caused, if any"""
+        return await self._enqueue(auction_id, proxy)
+
+    async def _enqueue(self, auction_id: str, item):
+        if auction_id not in self._states:
+            raise BidRejected("not_live", "Auction is not live")
+
+        queue = self._queues.get(auction_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[auction_id] = queue
+            self._writers[auction_id] = asyncio.create_task(
+                self._writer(auction_id, queue), context=contextvars.Context()
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((item, future))
+        return await future
+
+    async def _writer(self, auction_id: str, queue: asyncio.Queue):
+        """Single writer for one auction: decides queued bids and proxies in order"""
+        while True:
+            item, future = await queue.get()
+            if future.done():
+                continue
+            try:
+                if isinstance(item, ProxyMaximum):
+                    future.set_result(self._register_proxy(auction_id, item))
+                else:
+                    future.set_result(self._decide(auction_id, item))
+            except BidRejected as e:
+                future.set_exception(e)
+
+    def _open_state(self, auction_id: str, now: datetime) -> AuctionState:
+        state = self._states.get(auction_id)
+        if state is None or not state.is_open:
+            raise BidRejected("not_live", "Auction is not live")
+        if state.ends_at is not None and now >= state.ends_at:
+            raise BidRejected("not_live", "Auction has ended")
+        return state
+
+    def _decide(self, auction_id: str, bid: AcceptedBid) -> AcceptedBid:
+        bid.timestamp = datetime.utcnow()
+        state = self._open_state(auction_id, bid.timestamp)
+
+        if bid.amount <= state.current_price:
+            raise BidRejected(
+                "too_low",
+                f"Bid must be higher than current price: ${state.current_price}"
+            )
+
+        self._apply(state, bid)
+        bid.proxy_response = self._resolve_proxies(state)
+        return bid
+
+    def _register_proxy(self, auction_id: str, proxy: ProxyMaximum) -> Optional[AcceptedBid]:
+        state = self._open_state(auction_id, datetime.utcnow())
+
+        existing = state.proxies.get(proxy.user_id)
+        if existing is not None and proxy.max_amount <= existing.max_amount:
+            raise BidRejected(
+                "too_low",
+                f"Maximum must be higher than your current maximum: ${existing.max_amount}"
+            )
+
+        if proxy.max_amount <= state.current_price:
+            raise BidRejected(
+                "too_low",
+                f"Maximum must be higher than current price: ${state.current_price}"
+            )
+
+        # Stamped in decision order, which is what breaks a tie
+        proxy.set_at = datetime.utcnow()
+        state.proxies.put(proxy)
+        return self._resolve_proxies(state)
+
+    def _resolve_proxies(self, state: AuctionState) -> Optional[AcceptedBid]:
+        """The one bid the best proxy places to lead at the lowest price its competition allows"""
+        top, runner = state.proxies.top_two()
+        if top is None:
+            return None
+
+        if top.user_id == state.leading_user_id:
+            # Already leading: only a runner-up with room left makes it go higher
+            if runner is None or runner.max_amount <= state.current_price:
+                return None
+            amount = min(top.max_amount, runner.max_amount + PROXY_INCREMENT)
+        else:
+            competing = state.current_price if runner is None else max(state.current_price, runner.max_amount)
+            amount = min(top.max_amount, competing + PROXY_INCREMENT)
+            if amount <= state.current_price:
+                return None
+
+        bid = AcceptedBid(state.auction_id, amount, "online", top.bidder_name, user_id=top.user_id)
+        self._apply(state, bid)
+        return bid
+
+    def _apply(self, state: AuctionState, bid: AcceptedBid):
+        if (AUCTION_SCHEDULER_ENABLED and state.ends_at is not None
+                and state.ends_at - bid.timestamp <= SOFT_CLOSE_WINDOW):
+            # Soft close: a late bid gives everyone time to answer it. Only the
+            # scheduler closes at ends_at, so without it there is nothing to move
+            extended = bid.timestamp + SOFT_CLOSE_EXTENSION
+            if extended > state.ends_at:
+                state.ends_at = bid.extended_until = extended
+
+        bid.previous_price = state.current_price
+        bid.previous_bid_id = state.leading_bid_id
+        state.current_price = bid.amount
+        state.leading_bid_id = bid.id
+        state.leading_user_id = bid.user_id
+        state.bid_count += 1
+
+
+bid_engine = BidEngine()
+
+
+async def load_auction_state(db: AsyncSession, auction: models.Auction) -> AuctionState:
+    """Load a live auction's price, leading bid, bid count, end time and proxies into the engine"""
+    state = bid_engine.get_state(str(auction.id))
+    if state is not None:
+        return state
+
+    leading = (await db.execute(
+        select(models.Bid.id, models.Bid.user_id)
+        .where(models.Bid.auction_id == auction.id, models.Bid.is_winning == True)
+    )).first()
+    leading_bid_id, leading_user_id = leading if leading else (None, None)
+    bid_count = await db.scalar(
+        select(func.count(models.Bid.id))
+        .where(models.Bid.auction_id == auction.id)
+    )
+    proxies = (await db.execute(
+        select(models.ProxyBid.user_id, models.User.name, models.ProxyBid.max_amount, models.ProxyBid.max_set_at)
+        .join(models.User, models.User.id == models.ProxyBid.user_id)
+        .where(models.ProxyBid.auction_id == auction.id)
+    )).all()
+
+    state = bid_engine.open(
+        str(auction.id), auction.current_price, bid_count, leading_bid_id, auction.ends_at, leading_user_id
+    )
+    if not len(state.proxies):
+        for user_id, name, max_amount, max_set_at in proxies:
+            state.proxies.put(ProxyMaximum(user_id, name, max_amount, max_set_at))
+    return state
+
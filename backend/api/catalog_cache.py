@@ -0,0 +1,175 @@
+"""
+Auction Catalog Cache
+Encoded GET /api/auctions/ pages with strong ETags and GET /api/auctions/{id}
+details, dropped on auction changes
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+from fastapi import Request, Response, status
+
+from api.bid_engine import bid_engine
+from api.config import (
+    AUCTION_DETAIL_CACHE_MAX_ENTRIES, AUCTION_DETAIL_CACHE_TTL_SECONDS,
+    CATALOG_CACHE_MAX_ENTRIES, CATALOG_CACHE_TTL_SECONDS
+)
+from api.schemas import auction_schemas
+from api.utils.cache import TTLCache
+from api.utils.cursor import NEXT_CURSOR_HEADER
+from api.utils.serialization import EncodedJSONResponse
+from api.websocket_manager import manager
+
+# Per-auction invalidations remembered for in-flight reads
+RECENT_CHANGES = 4096
+
+
+class CatalogPage:
+    """One encoded listing page and the auctions it shows"""
+
+    __slots__ = ("body", "etag", "next_cursor", "auction_ids")
+
+    def __init__(self, body: bytes, next_cursor: Optional[str], auction_ids: Tuple[str, ...]):
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.next_cursor = next_cursor
+        self.auction_ids = auction_ids
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag}
+        if self.next_cursor:
+            headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        if _etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return EncodedJSONResponse(content=self.body, headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or ("W/" + etag) in candidates
+
+
+class CatalogCache:
+    """
+    Listing pages keyed by (status, skip, limit, cursor), and auction details.
+
+    Pages are indexed by the status they filter on and by the auctions they
+    contain, so a change drops exactly the pages it can affect:
+    - a change to an auction's row drops the pages showing it;
+    - a change to which auctions match a status, or their order (create,
+      delete, status or date change), drops that status's pages and the
+      unfiltered ones.
+    Details are dropped on any change except a new bid: a live auction's
+    price and bid count are read from the bid engine instead.
+    The TTLs are only a safety net for invalidations lost between workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, detail_maxsize: int, detail_ttl: float):
+        self._pages = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=self._unindex)
+        self._details = TTLCache(maxsize=detail_maxsize, ttl=detail_ttl)
+        self._by_status: Dict[Optional[str], Set[Hashable]] = {}
+        self._by_auction: Dict[str, Set[Hashable]] = {}
+        # Bumped on every invalidation. A page read at an older generation is not
+        # stored if anything it depends on was invalidated after the read began.
+        self.generation = 0
+        self._listings_changed = 0
+        self._auctions_changed: "OrderedDict[str, int]" = OrderedDict()
+        # Newest generation forgotten from _auctions_changed
+        self._forgotten = 0
+
+    def get(self, key: Hashable) -> Optional[CatalogPage]:
+        return self._pages.get(key)
+
+    def put(self, key: Hashable, page: CatalogPage, generation: int):
+        """Store a page read at generation, unless something changed since"""
+        if generation < self._listings_changed:
+            return
+        if any(self._changed_since(auction_id, generation) for auction_id in page.auction_ids):
+            return
+        self._pages.set(key, page)
+        self._by_status.setdefault(key[0], set()).add(key)
+        for auction_id in page.auction_ids:
+            self._by_auction.setdefault(auction_id, set()).add(key)
+
+    def get_detail(self, auction_id: str) -> Optional[auction_schemas.Auction]:
+        return self._details.get(auction_id)
+
+    def put_detail(self, auction_id: str, auction: auction_schemas.Auction, generation: int):
+        """Store an auction read at generation, unless it changed since"""
+        if generation < self._listings_changed or self._changed_since(auction_id, generation):
+            return
+        self._details.set(auction_id, auction)
+
+    def invalidate(self, auction_id: str = None, *statuses: Optional[str], detail: bool = True):
+        """
+        Drop pages showing auction_id, plus every page listing any of statuses.
+        The auction's detail goes too unless detail is False (only a bid changed).
+        """
+        self.generation += 1
+        keys = set()
+        if auction_id:
+            keys.update(self._by_auction.get(auction_id, ()))
+            if detail:
+                self._details.pop(auction_id)
+            self._auctions_changed[auction_id] = self.generation
+            self._auctions_changed.move_to_end(auction_id)
+            if len(self._auctions_changed) > RECENT_CHANGES:
+                self._forgotten = self._auctions_changed.popitem(last=False)[1]
+        if statuses:
+            self._listings_changed = self.generation
+            for listed in (None,) + statuses:
+                keys.update(self._by_status.get(listed, ()))
+        for key in keys:
+            self._pages.pop(key)
+
+    def clear(self):
+        self.generation += 1
+        self._listings_changed = self.generation
+        self._pages.clear()
+        self._details.clear()
+
+    def _changed_since(self, auction_id: str, generation: int) -> bool:
+        if generation < self._forgotten:
+            return True
+        return self._auctions_changed.get(auction_id, 0) > generation
+
+    def _unindex(self, key: Hashable, page: CatalogPage):
+        _discard(self._by_status, key[0], key)
+        for auction_id in page.auction_ids:
+            _discard(self._by_auction, auction_id, key)
+
+
+def _discard(index: dict, value, key: Hashable):
+    keys = index.get(value)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[value]
+
+
+catalog_cache = CatalogCache(
+    maxsize=CATALOG_CACHE_MAX_ENTRIES, ttl=CATALOG_CACHE_TTL_SECONDS,
+    detail_maxsize=AUCTION_DETAIL_CACHE_MAX_ENTRIES, detail_ttl=AUCTION_DETAIL_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_catalog(auction_id: str = None, *statuses: Optional[str]):
+    """Invalidate an auction change here and on every other worker"""
+    catalog_cache.invalidate(auction_id, *statuses)
+    manager.publish("catalog", {"auction_id": auction_id, "statuses": list(statuses)})
+
+
+def _on_remote_change(message: dict):
+    auction_id = message["auction_id"]
+    catalog_cache.invalidate(auction_id, *message["statuses"])
+    if auction_id and message["statuses"]:
+        # Its status changed on another worker; stop treating it as live here
+        bid_engine.close(auction_id)
+
+
+manager.on_message("catalog", _on_remote_change)
+# Invalidations published while the backplane was down are lost
+manager.on_reconnect(catalog_cache.clear)
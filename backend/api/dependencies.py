@@ -2,23 +2,56 @@
 FastAPI Dependencies
 """
 
+import time
+from typing import Dict, Set
+from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 
 from database.database import get_db
 from database import models
-from api.config import SECRET_KEY, ALGORITHM
+from database.user_events import on_user_changed
+from api.config import SECRET_KEY, ALGORITHM, USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES
 from api.schemas.auth_schemas import TokenData
+from api.utils.cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Verified token -> detached User, so repeat requests skip the signature check and lookup
+_tokens_by_user: Dict[UUID, Set[str]] = {}
+
+def _forget_token(token: str, user: models.User):
+    tokens = _tokens_by_user.get(user.id)
+    if tokens is not None:
+        tokens.discard(token)
+        if not tokens:
+            del _tokens_by_user[user.id]
+
+user_cache = TTLCache(
+    maxsize=USER_CACHE_MAX_ENTRIES,
+    ttl=USER_CACHE_TTL_SECONDS,
+    on_evict=_forget_token
+)
+
+def invalidate_user(user_id: UUID):
+    """Drop every cached token of a user, e.g. after a role or is_active change"""
+    for token in list(_tokens_by_user.get(user_id, ())):
+        user_cache.pop(token)
+
+on_user_changed(invalidate_user)
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> models.User:
     """Get current authenticated user"""
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -30,11 +63,13 @@ async def get_current_user(
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
+        user_id = UUID(user_id)
+        expires_at = payload.get("exp")
         token_data = TokenData(email=payload.get("email"), role=payload.get("role"))
-    except JWTError:
+    except (JWTError, ValueError):
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.scalar(select(models.User).where(models.User.id == user_id))
     if user is None:
         raise credentials_exception
     
@@ -44,6 +79,13 @@ async def get_current_user(
             detail="User account is inactive"
         )
     
+    # Cache a detached copy for no longer than the token itself is valid
+    db.expunge(user)
+    _tokens_by_user.setdefault(user.id, set()).add(token)
+    user_cache.set(token, user, ttl=expires_at - time.time() if expires_at else None)
+    if token not in user_cache:
+        _forget_token(token, user)
+    
     return user
 
 async def get_current_admin(
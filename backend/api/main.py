@@ -3,23 +3,62 @@ FastAPI Main Application
 Live Auction System Backend
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import uvicorn
 
-from database.database import get_db, engine
+from database.database import get_db, engine, async_engine, pool_stats
+from database.pool import WAIT_BUCKETS, watch_long_checkouts
+from database.user_events import listen_for_user_changes
 from database import models
-from api.routers import auth, auctions, bids, registrations, chat
+from api.routers import auth, auctions, bids, registrations, chat, admin
+from api.write_behind import write_behind
+from api.websocket_manager import manager
+from api.dependencies import user_cache
+from api.utils.auth import password_hasher
+from api.scheduler import auction_scheduler
+from api.config import AUCTION_SCHEDULER_ENABLED, DATABASE_URL, WS_PER_MESSAGE_DEFLATE
+from api.utils.cursor import NEXT_CURSOR_HEADER
+from api.metrics import (
+    CONTENT_TYPE, GaugeFunction, HistogramFunction, MetricsMiddleware, registry, watch_event_loop_lag
+)
+from api.profiling import SlowRequestMiddleware, slow_requests
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Room events from the other workers reach our sockets through the backplane
+    await manager.start()
+    if AUCTION_SCHEDULER_ENABLED:
+        # Timed starts and closes for every scheduled and live auction
+        await auction_scheduler.start()
+    tasks = [
+        asyncio.create_task(watch_long_checkouts(pool_stats)),
+        asyncio.create_task(watch_event_loop_lag()),
+    ]
+    if engine.dialect.name == "postgresql":
+        # Role / is_active changes made by other processes invalidate cached users here
+        tasks.append(asyncio.create_task(
+            listen_for_user_changes(DATABASE_URL, on_reconnect=user_cache.clear)
+        ))
+    yield
+    for task in tasks:
+        task.cancel()
+    await auction_scheduler.stop()
+    # Make sure queued bids and chat messages reach the database before exit
+    await write_behind.stop()
+    await manager.stop()
+    # Close pooled connections (aiosqlite keeps a thread per connection alive until then)
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Live Auction API",
     description="Backend API for Live Auction System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -35,8 +74,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the browser read keyset pagination cursors
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Request latency per route for GET /metrics
+app.add_middleware(MetricsMiddleware)
+
+# SQL traces of slow requests for GET /api/admin/slow-requests
+slow_requests.attach(async_engine.sync_engine)
+app.add_middleware(SlowRequestMiddleware, log=slow_requests)
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
@@ -46,6 +94,7 @@ app.include_router(auctions.router, prefix="/api/auctions", tags=["Auctions"])
 app.include_router(bids.router, prefix="/api/bids", tags=["Bids"])
 app.include_router(registrations.router, prefix="/api/registrations", tags=["Registrations"])
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
 
 @app.get("/")
 async def root():
@@ -55,5 +104,40 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/health/pool")
+async def pool_health():
+    """Live connection pool statistics"""
+    return pool_stats.snapshot()
+
+# Read when scraped rather than tracked per request
+registry.register(GaugeFunction(
+    "ws_connections", "Open WebSocket connections on this worker per auction room", ("auction_id",),
+    lambda: (((auction_id,), len(room)) for auction_id, room in list(manager.active_connections.items()))
+))
+registry.register(GaugeFunction(
+    "db_pool_connections", "Connections in the database pool by state", ("state",),
+    lambda: (
+        (("checked_out",), pool_stats.pool.checkedout()),
+        (("checked_in",), pool_stats.pool.checkedin()),
+        # overflow() counts up from -pool_size
+        (("overflow",), max(0, pool_stats.pool.overflow())),
+    ) if pool_stats.pool is not None else ()
+))
+registry.register(HistogramFunction(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled database connection", WAIT_BUCKETS,
+    lambda: (pool_stats.wait_buckets, pool_stats.wait_sum, pool_stats.wait_count)
+))
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text-format metrics for this worker"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+@app.get("/api/health/hashing")
+async def hashing_health():
+    """Password hashing executor queue depth"""
+    return password_hasher.snapshot()
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True,
+                ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
@@ -0,0 +1,231 @@
+"""
+Metrics
+Prometheus text-format counters and histograms for the hot paths
+"""
+
+import asyncio
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Upper bounds (seconds) for request, fan-out and loop-lag histograms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RECIPIENT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base for one named metric family with fixed label names"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"] + list(self.samples())
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+
+class Counter(Metric):
+    """Monotonic count per label set"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram(Metric):
+    """Bucketed observations per label set; observing is a bisect and three additions"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total, count) in list(self._series.items()):
+            yield from render_histogram(self.name, self.labelnames, labels, self.buckets, counts, total, count)
+
+
+class GaugeFunction(Metric):
+    """Gauge read at scrape time, so nothing is tracked on the hot path"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str],
+                 read: Callable[[], Iterable[Tuple[LabelValues, float]]]):
+        super().__init__(name, help, labelnames)
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.read():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class HistogramFunction(Metric):
+    """Histogram whose bucket counts are kept elsewhere and read at scrape time"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float],
+                 read: Callable[[], Tuple[Sequence[int], float, int]]):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        counts, total, count = self.read()
+        return render_histogram(self.name, (), (), self.buckets, counts, total, count)
+
+
+def render_histogram(name: str, labelnames: Sequence[str], labels: Sequence[str], buckets: Sequence[float],
+                     counts: Sequence[int], total: float, count: int) -> Iterable[str]:
+    """Exposition lines for per-bucket (not yet cumulative) counts"""
+    cumulative = 0
+    for bound, bucket_count in zip(tuple(buckets) + (float("inf"),), counts):
+        cumulative += bucket_count
+        le = 'le="' + _number(bound) + '"'
+        yield f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}"
+    yield f"{name}_sum{_labels(labelnames, labels)} {_number(total)}"
+    yield f"{name}_count{_labels(labelnames, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+))
+bids_total = registry.register(Counter(
+    "auction_bids_total", "Bids decided, by outcome and rejection reason",
+    ("outcome", "reason")
+))
+broadcast_duration = registry.register(Histogram(
+    "ws_broadcast_duration_seconds", "Time to encode a room event and queue it for every local socket",
+    ("type",)
+))
+broadcast_recipients = registry.register(Histogram(
+    "ws_broadcast_recipients", "Local sockets a room event was queued for",
+    ("type",), buckets=RECIPIENT_BUCKETS
+))
+event_loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer"
+))
+
+
+class MetricsMiddleware:
+    """Times every HTTP request, labelled by route template rather than raw path"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._routes: Dict[Callable, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = [500]
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"], self._route(scope), str(status_code[0])
+            )
+
+    def _route(self, scope: Scope) -> str:
+        # The router leaves the matched endpoint in the scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            for candidate in getattr(app, "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = "unmatched"
+            self._routes[endpoint] = route
+        return route
+
+
+async def watch_event_loop_lag(interval: float = 0.5):
+    """Background task: how much later than asked a sleep wakes up is the loop's lag"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - start - interval))
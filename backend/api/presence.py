@@ -0,0 +1,115 @@
+"""
+Room Presence
+Who is watching an auction, merged per user and published as deltas
+"""
+
+from typing import Dict, Optional, Set
+
+# Client presence modes: full member list (snapshot + deltas) or just the head count
+PRESENCE_FULL = "full"
+PRESENCE_COUNT = "count"
+PRESENCE_MODES = (PRESENCE_FULL, PRESENCE_COUNT)
+
+
+class RoomPresence:
+    """
+    Participants of one room across all workers.
+
+    Connections are tracked individually but reported per user_id, so several
+    tabs of one user are a single entry; guests only add to the count. Changes
+    accumulate until take_delta() turns them into one versioned delta.
+    Snapshots describe the state as of the last delta, so a client that
+    starts from snapshot N is brought up to date by delta N+1 and the
+    snapshot can be shared by everyone joining until then.
+    """
+
+    __slots__ = ("members", "users", "guests", "version", "reported", "cache", "_joined", "_left", "_reported_count")
+
+    def __init__(self):
+        # connection key -> (user_id, user_name)
+        self.members: Dict[str, tuple] = {}
+        # user_id -> [user_name, open connections]
+        self.users: Dict[str, list] = {}
+        self.guests = 0
+        self.version = 0
+        # Users as of the last delta, and anything derived from them (e.g. encoded snapshots)
+        self.reported: Dict[str, str] = {}
+        self.cache: dict = {}
+        self._joined: Dict[str, str] = {}
+        self._left: Set[str] = set()
+        self._reported_count = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.users) + self.guests
+
+    def add(self, key: str, user_id: Optional[str], user_name: str):
+        if key in self.members:
+            return
+        self.members[key] = (user_id, user_name)
+        if user_id is None:
+            self.guests += 1
+            return
+        entry = self.users.get(user_id)
+        if entry is not None:
+            entry[1] += 1
+            return
+        self.users[user_id] = [user_name, 1]
+        if user_id in self._left:
+            # Left and came back within one interval: nothing to report
+            self._left.discard(user_id)
+        else:
+            self._joined[user_id] = user_name
+
+    def remove(self, key: str):
+        member = self.members.pop(key, None)
+        if member is None:
+            return
+        user_id = member[0]
+        if user_id is None:
+            self.guests -= 1
+            return
+        entry = self.users[user_id]
+        entry[1] -= 1
+        if entry[1]:
+            return
+        del self.users[user_id]
+        if self._joined.pop(user_id, None) is None:
+            self._left.add(user_id)
+
+    def snapshot(self, mode: str = PRESENCE_FULL) -> dict:
+        """State as of the last delta"""
+        if mode == PRESENCE_COUNT:
+            return {"version": self.version, "count": self._reported_count}
+        return {
+            "version": self.version,
+            "count": self._reported_count,
+            "participants": [
+                {"user_id": user_id, "user_name": user_name}
+                for user_id, user_name in self.reported.items()
+            ]
+        }
+
+    def take_delta(self) -> Optional[dict]:
+        """Changes since the previous delta, or None if there were none"""
+        # Extra tabs of a user already present change nothing visible
+        if not self._joined and not self._left and self.count == self._reported_count:
+            return None
+        self.version += 1
+        self._reported_count = self.count
+        delta = {
+            "version": self.version,
+            "count": self.count,
+            "joined": [
+                {"user_id": user_id, "user_name": user_name}
+                for user_id, user_name in self._joined.items()
+            ],
+            "left": list(self._left)
+        }
+        self.reported.update(self._joined)
+        for user_id in self._left:
+            self.reported.pop(user_id, None)
+        self.cache.clear()
+        self._joined = {}
+        self._left = set()
+        return delta
@@ -0,0 +1,206 @@
+"""
+Profiling
+On-demand sampling of the event loop, and SQL traces of slow requests
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import greenlet
+from sqlalchemy import event
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.config import SLOW_REQUEST_THRESHOLD_MS, SLOW_REQUEST_LOG_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Deepest stack kept per sample, and statements kept per slow request
+MAX_STACK_DEPTH = 128
+MAX_STATEMENTS = 200
+MAX_STATEMENT_LENGTH = 2000
+
+
+class SamplingProfiler:
+    """
+    Samples the event loop thread's stack from a helper thread.
+
+    Nothing is hooked into the interpreter, so the loop only pays for the
+    sampler holding the GIL while it copies one stack per interval.
+    Stacks are returned in collapsed form ("outer;...;inner count" per line),
+    which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self):
+        self.running = False
+
+    async def profile(self, seconds: float, interval: float) -> str:
+        self.running = True
+        try:
+            stacks = await asyncio.to_thread(self._sample, threading.get_ident(), seconds, interval)
+        finally:
+            self.running = False
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def _sample(self, thread_id: int, seconds: float, interval: float) -> Dict[str, int]:
+        stacks: Dict[str, int] = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            names = []
+            while frame is not None and len(names) < MAX_STACK_DEPTH:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                stack = ";".join(reversed(names))
+                stacks[stack] = stacks.get(stack, 0) + 1
+            time.sleep(interval)
+        return stacks
+
+
+def _frame_name(frame) -> str:
+    module = frame.f_globals.get("__name__") or frame.f_code.co_filename
+    return f"{module}:{frame.f_code.co_name}"
+
+
+profiler = SamplingProfiler()
+
+
+class _Trace:
+    """Statements issued while serving one request"""
+
+    __slots__ = ("statements", "count", "sql_time")
+
+    def __init__(self):
+        self.statements: List[dict] = []
+        self.count = 0
+        self.sql_time = 0.0
+
+
+# Trace of the current request, or None when nothing is recording
+_trace: ContextVar[Optional[_Trace]] = ContextVar("request_trace", default=None)
+
+
+def _issuer() -> Optional[str]:
+    """The api function whose await led to the statement, preferring router code"""
+    current = greenlet.getcurrent()
+    # The async engine runs the driver call in a child greenlet; the awaiting
+    # coroutines are suspended in its parent
+    frame = current.parent.gr_frame if current.parent is not None else sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("api.routers."):
+            return f"{module}:{frame.f_code.co_name}:{frame.f_lineno}"
+        if fallback is None and module.startswith("api."):
+            fallback = f"{module}:{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return fallback
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _trace.get() is not None:
+        context._profiling_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    started = getattr(context, "_profiling_started", None)
+    if trace is None or started is None:
+        return
+    duration = time.perf_counter() - started
+    trace.count += 1
+    trace.sql_time += duration
+    if len(trace.statements) < MAX_STATEMENTS:
+        trace.statements.append({
+            "sql": statement[:MAX_STATEMENT_LENGTH],
+            "duration_ms": round(duration * 1000, 3),
+            "issuer": _issuer(),
+        })
+
+
+class SlowRequestLog:
+    """
+    Keeps the SQL trace of the most recent requests slower than a threshold.
+
+    Every HTTP request records its statements while it runs (one timing and
+    a short frame walk per statement); only slow ones are kept. Background
+    tasks (write-behind, bid writers, timers) start in a fresh context, so
+    their statements never land in a request's trace.
+    """
+
+    def __init__(self, threshold_ms: float, maxlen: int):
+        self.threshold = threshold_ms / 1000
+        self.entries = deque(maxlen=maxlen)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def attach(self, engine):
+        """Time the statements of an engine (the sync_engine of an AsyncEngine)"""
+        if self.enabled:
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    def record(self, scope: Scope, status_code: int, duration: float, trace: _Trace):
+        endpoint = scope.get("endpoint")
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "endpoint": f"{endpoint.__module__}:{endpoint.__name__}" if endpoint is not None else None,
+            "status": status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "sql_ms": round(trace.sql_time * 1000, 3),
+            "statement_count": trace.count,
+            "statements": list(trace.statements),
+        }
+        self.entries.append(entry)
+        logger.warning(
+            "Slow request %s %s: %.0fms, %d statements, %.0fms in SQL",
+            entry["method"], entry["path"], entry["duration_ms"], entry["statement_count"], entry["sql_ms"]
+        )
+
+    def snapshot(self) -> List[dict]:
+        return list(reversed(self.entries))
+
+
+class SlowRequestMiddleware:
+    """Records each HTTP request's statements and keeps them if the request was slow"""
+
+    def __init__(self, app: ASGIApp, log: SlowRequestLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.log.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = [500]
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        trace = _Trace()
+        token = _trace.set(trace)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            duration = time.perf_counter() - start
+            if duration >= self.log.threshold:
+                self.log.record(scope, status_code[0], duration, trace)
+
+
+slow_requests = SlowRequestLog(SLOW_REQUEST_THRESHOLD_MS, SLOW_REQUEST_LOG_SIZE)
@@ -0,0 +1,49 @@
+"""
+Room Event Replay
+Sequence numbers and a bounded history so reconnecting clients catch up
+"""
+
+from collections import deque
+from typing import List, Optional, Tuple
+from uuid import uuid4
+
+
+class RoomHistory:
+    """
+    Recent events of one room, numbered in the order this worker delivered them.
+
+    Sequence numbers are only meaningful together with the history's epoch;
+    a client resuming on another worker, after a restart or after the history
+    was evicted must reload.
+    """
+
+    __slots__ = ("epoch", "seq", "events")
+
+    def __init__(self, size: int):
+        self.epoch = uuid4().hex
+        self.seq = 0
+        # (seq, message type, data)
+        self.events: deque = deque(maxlen=size)
+
+    def append(self, message_type: str, data: dict) -> int:
+        self.seq += 1
+        self.events.append((self.seq, message_type, data))
+        return self.seq
+
+    def since(self, seq: int) -> Optional[List[Tuple[int, str, dict]]]:
+        """Events after seq, or None if some of them are no longer buffered"""
+        if seq == self.seq:
+            return []
+        if not self.events or self.events[0][0] > seq + 1:
+            return None
+        return [event for event in self.events if event[0] > seq]
+
+
+def parse_cursor(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Split a ?since=<epoch>:<seq> cursor; None if absent or malformed"""
+    if not value:
+        return None
+    epoch, _, seq = value.rpartition(":")
+    if not epoch or not seq.isdigit():
+        return None
+    return epoch, int(seq)
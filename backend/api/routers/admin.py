@@ -0,0 +1,62 @@
+"""
+Admin Diagnostics Router
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+
+from database import models
+from api.dependencies import get_current_admin
+from api.profiling import profiler, slow_requests
+
+router = APIRouter()
+
+# Longest profile one request may take, and the sampling interval range (ms)
+MAX_PROFILE_SECONDS = 60
+MIN_INTERVAL_MS = 1
+MAX_INTERVAL_MS = 1000
+
+@router.post("/profile")
+async def profile(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    current_user: models.User = Depends(get_current_admin)
+):
+    """
+    Sample this worker's event loop for a while (Admin only)
+
+    Returns collapsed stacks, one "frame;frame;... count" line per distinct
+    stack, ready for flamegraph.pl or speedscope. The worker keeps serving
+    while it is sampled; only one profile runs at a time.
+    """
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}"
+        )
+
+    if not MIN_INTERVAL_MS <= interval_ms <= MAX_INTERVAL_MS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"interval_ms must be between {MIN_INTERVAL_MS} and {MAX_INTERVAL_MS}"
+        )
+
+    if profiler.running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running"
+        )
+
+    stacks = await profiler.profile(seconds, interval_ms / 1000)
+    return Response(content=stacks, media_type="text/plain")
+
+@router.get("/slow-requests")
+async def get_slow_requests(
+    current_user: models.User = Depends(get_current_admin)
+):
+    """
+    Recent requests slower than SLOW_REQUEST_THRESHOLD_MS, newest first (Admin only)
+
+    Each lists the SQL it issued with timings, attributed to the router
+    function (module:function:line) that awaited the statement.
+    """
+    return slow_requests.snapshot()
@@ -3,54 +3,146 @@ Auctions Router
 Handles auction CRUD operations and status management
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
+from uuid import UUID
 
 from database.database import get_db
 from database import models
 from api.schemas import auction_schemas
 from api.dependencies import get_current_user, get_current_admin
+from api.bid_engine import bid_engine, load_auction_state
+from api.catalog_cache import CatalogPage, catalog_cache, invalidate_catalog
+from api.scheduler import auction_changed, auction_deleted, auction_status_changed, default_ends_at, utc_naive
+from api.utils.cursor import decode_cursor, encode_cursor
+from api.utils.serialization import RowEncoder
+from api.write_behind import write_behind
 
 router = APIRouter()
 
+auction_rows = RowEncoder(auction_schemas.Auction, models.Auction)
+
+def _check_ends_at(auction_date: datetime, ends_at: Optional[datetime]):
+    if ends_at is not None and utc_naive(ends_at) <= utc_naive(auction_date):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ends_at must be after auction_date"
+        )
+
 @router.get("/", response_model=List[auction_schemas.Auction])
 async def get_auctions(
+    request: Request,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all auctions, optionally filtered by status"""
-    query = db.query(models.Auction)
+    """
+    Get all auctions, optionally filtered by status
+
+    Full pages carry an X-Next-Cursor header; pass it back as cursor= for
+    the next page (skip is then ignored). Pages are served from the catalog
+    cache with an ETag; a matching If-None-Match gets 304 Not Modified.
+    """
+    key = (status or None, 0 if cursor else skip, limit, cursor)
+    page = catalog_cache.get(key)
+    if page is not None:
+        return page.response(request)
+
+    generation = catalog_cache.generation
+    query = select(*auction_rows.columns)
     
     if status:
-        query = query.filter(models.Auction.status == status)
+        query = query.where(models.Auction.status == status)
+
+    if cursor:
+        auction_date, auction_id = decode_cursor(cursor, datetime, UUID)
+        query = query.where(tuple_(models.Auction.auction_date, models.Auction.id) < (auction_date, auction_id))
+    else:
+        query = query.offset(skip)
     
-    auctions = query.order_by(models.Auction.auction_date.desc()).offset(skip).limit(limit).all()
-    return auctions
+    auctions = auction_rows.to_dicts((await db.execute(
+        query.order_by(models.Auction.auction_date.desc(), models.Auction.id.desc()).limit(limit)
+    )).all())
+
+    next_cursor = None
+    if auctions and len(auctions) == limit:
+        last = auctions[-1]
+        next_cursor = encode_cursor(last["auction_date"], last["id"])
+
+    page = CatalogPage(
+        body=auction_rows.dump(auctions),
+        next_cursor=next_cursor,
+        auction_ids=tuple(str(auction["id"]) for auction in auctions)
+    )
+    catalog_cache.put(key, page, generation)
+    return page.response(request)
 
 @router.get("/{auction_id}", response_model=auction_schemas.Auction)
-async def get_auction(auction_id: str, db: Session = Depends(get_db)):
-    """Get auction by ID"""
-    auction = db.query(models.Auction).filter(models.Auction.id == auction_id).first()
-    
-    if not auction:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Auction not found"
-        )
+async def get_auction(auction_id: UUID, db: AsyncSession = Depends(get_db)):
+    """
+    Get auction by ID
+
+    Static fields come from the catalog cache. For a live auction the price,
+    bid count and end time come from the bid engine, so polling during a
+    sale does not touch the database.
+    """
+    key = str(auction_id)
+    auction = catalog_cache.get_detail(key)
+
+    if auction is None:
+        generation = catalog_cache.generation
+        db_auction = await db.scalar(select(models.Auction).where(models.Auction.id == auction_id))
+        
+        if not db_auction:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Auction not found"
+            )
+        
+        auction = auction_schemas.Auction.model_validate(db_auction)
+        catalog_cache.put_detail(key, auction, generation)
     
-    return auction
+    if auction.status != "live":
+        return auction
+
+    state = bid_engine.get_state(key)
+    if state is None:
+        # Read the price only after bids queued before a reload are written,
+        # without holding a connection the flush may need
+        await db.close()
+        await write_behind.drain()
+        db_auction = await db.scalar(select(models.Auction).where(models.Auction.id == auction_id))
+        if not db_auction or db_auction.status != "live":
+            # Changed on another worker since it was cached
+            catalog_cache.invalidate(key)
+            if not db_auction:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Auction not found"
+                )
+            return db_auction
+        state = await load_auction_state(db, db_auction)
+
+    return auction.model_copy(update={
+        "status": "live",
+        "current_price": state.current_price,
+        "bid_count": state.bid_count,
+        "ends_at": state.ends_at
+    })
 
 @router.post("/", response_model=auction_schemas.Auction, status_code=status.HTTP_201_CREATED)
 async def create_auction(
     auction: auction_schemas.AuctionCreate,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Create new auction (Admin only)"""
+    """Create new auction (Admin only); it starts at auction_date and closes at ends_at if given"""
+    _check_ends_at(auction.auction_date, auction.ends_at)
     db_auction = models.Auction(
         title=auction.title,
         description=auction.description,
@@ -58,27 +150,30 @@ async def create_auction(
         category=auction.category,
         starting_price=auction.starting_price,
         current_price=auction.starting_price,
-        auction_date=auction.auction_date,
+        auction_date=utc_naive(auction.auction_date),
+        ends_at=utc_naive(auction.ends_at),
         location=auction.location,
         status="scheduled",
         created_by=current_user.id
     )
     
     db.add(db_auction)
-    db.commit()
-    db.refresh(db_auction)
+    await db.commit()
+    await db.refresh(db_auction)
+    invalidate_catalog(str(db_auction.id), db_auction.status)
+    auction_changed(db_auction)
     
     return db_auction
 
 @router.put("/{auction_id}", response_model=auction_schemas.Auction)
 async def update_auction(
-    auction_id: str,
+    auction_id: UUID,
     auction_update: auction_schemas.AuctionUpdate,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update auction (Admin only, only if status is 'scheduled')"""
-    db_auction = db.query(models.Auction).filter(models.Auction.id == auction_id).first()
+    db_auction = await db.scalar(select(models.Auction).where(models.Auction.id == auction_id))
     
     if not db_auction:
         raise HTTPException(
@@ -94,21 +189,31 @@ async def update_auction(
     
     update_data = auction_update.dict(exclude_unset=True)
     for field, value in update_data.items():
+        if field in ("auction_date", "ends_at"):
+            value = utc_naive(value)
         setattr(db_auction, field, value)
+    _check_ends_at(db_auction.auction_date, db_auction.ends_at)
     
-    db.commit()
-    db.refresh(db_auction)
+    await db.commit()
+    await db.refresh(db_auction)
+    if "auction_date" in update_data:
+        # Listing order changes as well
+        invalidate_catalog(str(db_auction.id), db_auction.status)
+    else:
+        invalidate_catalog(str(db_auction.id))
+    if "auction_date" in update_data or "ends_at" in update_data:
+        auction_changed(db_auction)
     
     return db_auction
 
 @router.post("/{auction_id}/start", response_model=auction_schemas.Auction)
 async def start_auction(
-    auction_id: str,
+    auction_id: UUID,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Start auction - change status to 'live' (Admin only)"""
-    db_auction = db.query(models.Auction).filter(models.Auction.id == auction_id).first()
+    db_auction = await db.scalar(select(models.Auction).where(models.Auction.id == auction_id))
     
     if not db_auction:
         raise HTTPException(
@@ -123,19 +228,22 @@ async def start_auction(
         )
     
     db_auction.status = "live"
-    db.commit()
-    db.refresh(db_auction)
+    if db_auction.ends_at is None:
+        db_auction.ends_at = default_ends_at(datetime.utcnow())
+    await db.commit()
+    await db.refresh(db_auction)
+    await auction_status_changed(db_auction, "scheduled")
     
     return db_auction
 
 @router.post("/{auction_id}/end", response_model=auction_schemas.Auction)
 async def end_auction(
-    auction_id: str,
+    auction_id: UUID,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """End auction - change status to 'completed' (Admin only)"""
-    db_auction = db.query(models.Auction).filter(models.Auction.id == auction_id).first()
+    db_auction = await db.scalar(select(models.Auction).where(models.Auction.id == auction_id))
     
     if not db_auction:
         raise HTTPException(
@@ -150,19 +258,20 @@ async def end_auction(
         )
     
     db_auction.status = "completed"
-    db.commit()
-    db.refresh(db_auction)
+    await db.commit()
+    await db.refresh(db_auction)
+    await auction_status_changed(db_auction, "live")
     
     return db_auction
 
 @router.delete("/{auction_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_auction(
-    auction_id: str,
+    auction_id: UUID,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete auction (Admin only, only if status is 'scheduled')"""
-    db_auction = db.query(models.Auction).filter(models.Auction.id == auction_id).first()
+    db_auction = await db.scalar(select(models.Auction).where(models.Auction.id == auction_id))
     
     if not db_auction:
         raise HTTPException(
@@ -176,7 +285,9 @@ async def delete_auction(
             detail="Can only delete scheduled auctions"
         )
     
-    db.delete(db_auction)
-    db.commit()
+    await db.delete(db_auction)
+    await db.commit()
+    invalidate_catalog(str(auction_id), "scheduled")
+    auction_deleted(str(auction_id))
     
     return None
@@ -5,26 +5,34 @@ Handles user registration, login, and JWT tokens
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from database.database import get_db
 from database import models
 from api.schemas import auth_schemas
 from api.dependencies import get_current_user
-from api.utils.auth import verify_password, get_password_hash, create_access_token
+from api.utils.auth import password_hasher, HashQueueFull, create_access_token
 from api.config import ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter()
 
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=auth_schemas.User, status_code=status.HTTP_201_CREATED)
 async def register(
     user_data: auth_schemas.UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Register a new user"""
     # Check if email already exists
-    existing_user = db.query(models.User).filter(models.User.email == user_data.email).first()
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user_data.email))
     
     if existing_user:
         raise HTTPException(
@@ -34,38 +42,56 @@ async def register(
     
     # Check if username already exists
     if user_data.username:
-        existing_username = db.query(models.User).filter(models.User.username == user_data.username).first()
+        existing_username = await db.scalar(select(models.User).where(models.User.username == user_data.username))
         if existing_username:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already taken"
             )
     
+    # End the read transaction so the pooled connection is free while hashing
+    await db.commit()
+    
+    try:
+        password_hash = await password_hasher.hash(user_data.password)
+    except HashQueueFull:
+        raise _hashing_busy()
+    
     # Create new user
     db_user = models.User(
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         name=user_data.name,
         username=user_data.username,
         role="participant"
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=auth_schemas.Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Login and get access token"""
     # Find user by email (OAuth2PasswordRequestForm uses 'username' field)
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    user = await db.scalar(select(models.User).where(models.User.email == form_data.username))
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    # End the read transaction so the pooled connection is free while hashing
+    await db.commit()
+    
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await password_hasher.verify_and_update(form_data.password, user.password_hash)
+        except HashQueueFull:
+            raise _hashing_busy()
+    
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -78,6 +104,11 @@ async def login(
             detail="User account is inactive"
         )
     
+    # Transparently move the stored hash to the configured cost
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id), "email": user.email, "role": user.role},
@@ -3,159 +3,393 @@ Bids Router
 Handles bid placement and retrieval
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from typing import List
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status, WebSocket, WebSocketDisconnect
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
 
-from database.database import get_db
+from database.database import get_db, AsyncSessionLocal
 from database import models
 from api.schemas import bid_schemas
 from api.dependencies import get_current_user, get_current_admin
 from api.websocket_manager import manager
+from api.presence import PRESENCE_MODES
+from api.ws_codec import codebook, negotiate_encoding
+from api.utils.cursor import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from api.utils.serialization import EncodedJSONResponse, RowEncoder
+from api.utils.export import export_response, get_exportable_auction
+from api.config import EXPORT_CHUNK_SIZE
+from api.bid_engine import bid_engine, load_auction_state, AcceptedBid, BidRejected, ProxyMaximum
+from api.write_behind import write_behind
+from api.catalog_cache import catalog_cache
+from api.scheduler import auction_scheduler
+from api.metrics import bids_total
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/", response_model=bid_schemas.Bid, status_code=status.HTTP_201_CREATED)
-async def place_bid(
-    bid: bid_schemas.BidCreate,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Place a bid on an auction"""
-    # Get auction
-    auction = db.query(models.Auction).filter(models.Auction.id == bid.auction_id).first()
+bid_rows = RowEncoder(bid_schemas.Bid, models.Bid)
+
+async def _load_live_auction(db: AsyncSession, auction_id: str):
+    """Make sure a live auction's state is held by the bid engine"""
+    if bid_engine.is_loaded(auction_id):
+        return
+
+    # Bids decided before the state was dropped may still be queued; load
+    # the price only after they have reached the database. The flush needs a
+    # pooled connection, so hand this request's back while waiting
+    await db.close()
+    await write_behind.drain()
+    auction = await db.scalar(select(models.Auction).where(models.Auction.id == UUID(auction_id)))
     
     if not auction:
+        bids_total.inc("rejected", "not_found")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Auction not found"
         )
     
     if auction.status != "live":
+        bids_total.inc("rejected", "not_live")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Auction is not live"
         )
     
-    # Check if bid is higher than current price
-    if bid.amount <= auction.current_price:
+    await load_auction_state(db, auction)
+
+async def _publish_bid(bid: AcceptedBid) -> asyncio.Future:
+    """Queue a decided bid for the next group commit; the room hears about it right away"""
+    ack = write_behind.submit_bid(bid)
+    
+    await manager.broadcast_bid_update(bid.auction_id, {
+        "id": str(bid.id),
+        "auctionId": bid.auction_id,
+        "newPrice": float(bid.amount),
+        "bidderName": bid.bidder_name,
+        "type": bid.type,
+        "timestamp": bid.timestamp.isoformat()
+    })
+    if bid.extended_until is not None:
+        # Soft close: move the timer and tell the room the new end time
+        auction_scheduler.extend(bid.auction_id, bid.extended_until)
+    
+    return ack
+
+async def _settle_bid(db: AsyncSession, bid: AcceptedBid, outcome) -> datetime:
+    """Act on a published bid's commit outcome: its timestamp, None for a lost race, or an error"""
+    if isinstance(outcome, Exception):
+        bids_total.inc("rejected", "persist_error")
+        # In-memory state is ahead of the database now; reload it on the next bid
+        bid_engine.invalidate(bid.auction_id)
+        await manager.broadcast_bid_rejected(bid.auction_id, str(bid.id))
+        raise outcome
+    
+    if outcome is None:
+        # Another worker moved the price first (or closed the lot); resync from the database
+        bids_total.inc("rejected", "conflict")
+        bid_engine.invalidate(bid.auction_id)
+        await manager.broadcast_bid_rejected(bid.auction_id, str(bid.id))
+        auction = await db.scalar(select(models.Auction).where(models.Auction.id == UUID(bid.auction_id)))
+        if not auction or auction.status != "live":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Auction is not live"
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Bid must be higher than current price: ${auction.current_price}"
         )
     
-    # Create bid
-    db_bid = models.Bid(
-        auction_id=bid.auction_id,
-        user_id=current_user.id,
-        amount=bid.amount,
-        type="online",
-        bidder_name=current_user.name
-    )
+    bids_total.inc("accepted", "")
     
-    db.add(db_bid)
-    db.commit()
-    db.refresh(db_bid)
+    # The committed price shows in every catalog page listing this lot; other
+    # workers also move their in-memory price, which their detail endpoint reads
+    catalog_cache.invalidate(bid.auction_id, detail=False)
+    manager.publish("bidCommitted", {
+        "auction_id": bid.auction_id,
+        "bid_id": str(bid.id),
+        "amount": str(bid.amount),
+        "user_id": str(bid.user_id) if bid.user_id else None
+    })
+    return outcome
+
+async def _settle_proxy_bid(db: AsyncSession, bid: AcceptedBid, ack: asyncio.Future):
+    """Settle a bid placed by a proxy; its failure is not the requester's"""
+    outcome = (await asyncio.gather(ack, return_exceptions=True))[0]
+    try:
+        await _settle_bid(db, bid, outcome)
+    except HTTPException:
+        # Lost a race; already counted and retracted
+        pass
+    except Exception:
+        logger.exception("Proxy bid %s on auction %s failed to settle", bid.id, bid.auction_id)
+        if not isinstance(outcome, Exception):
+            # A write failure is counted by _settle_bid; anything after it is not
+            bids_total.inc("rejected", "persist_error")
+
+async def _accept_bid(db: AsyncSession, bid: AcceptedBid) -> models.Bid:
+    """Shared path for online and floor bids: decide in memory, broadcast, then await persistence"""
+    await _load_live_auction(db, bid.auction_id)
     
-    # Update auction price (trigger handles this, but refresh)
-    db.refresh(auction)
+    # Hand the request's connection back before queueing so waiting bids never starve the flush
+    await db.close()
     
-    # Broadcast bid update via WebSocket
-    await manager.broadcast_bid_update(bid.auction_id, {
-        "id": str(db_bid.id),
-        "auctionId": str(db_bid.auction_id),
-        "newPrice": float(db_bid.amount),
-        "bidderName": db_bid.bidder_name,
-        "type": db_bid.type,
-        "timestamp": db_bid.timestamp.isoformat()
-    })
+    try:
+        bid = await bid_engine.submit(bid)
+    except BidRejected as e:
+        bids_total.inc("rejected", e.reason)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=e.detail
+        )
     
-    return db_bid
+    # A competing proxy may answer at once; both bids go into the same group commit
+    ack = await _publish_bid(bid)
+    response = bid.proxy_response
+    response_ack = await _publish_bid(response) if response is not None else None
+    
+    outcome = (await asyncio.gather(ack, return_exceptions=True))[0]
+    if response is not None:
+        await _settle_proxy_bid(db, response, response_ack)
+    timestamp = await _settle_bid(db, bid, outcome)
+    
+    return models.Bid(
+        id=bid.id,
+        auction_id=bid.auction_id,
+        user_id=bid.user_id,
+        amount=bid.amount,
+        type=bid.type,
+        bidder_name=bid.bidder_name,
+        bidder_number=bid.bidder_number,
+        timestamp=timestamp,
+        is_winning=response is None
+    )
+
+def _on_remote_bid(message: dict):
+    user_id = message.get("user_id")
+    bid_engine.observe(
+        message["auction_id"], UUID(message["bid_id"]), Decimal(message["amount"]),
+        UUID(user_id) if user_id else None
+    )
+    catalog_cache.invalidate(message["auction_id"], detail=False)
+
+manager.on_message("bidCommitted", _on_remote_bid)
+
+def _on_remote_proxy(message: dict):
+    bid_engine.observe_proxy(message["auction_id"], ProxyMaximum(
+        UUID(message["user_id"]), message["bidder_name"], Decimal(message["max_amount"]),
+        datetime.fromisoformat(message["max_set_at"])
+    ))
+
+manager.on_message("proxyBid", _on_remote_proxy)
+
+@router.post("/", response_model=bid_schemas.Bid, status_code=status.HTTP_201_CREATED)
+async def place_bid(
+    bid: bid_schemas.BidCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Place a bid on an auction"""
+    return await _accept_bid(db, AcceptedBid(
+        auction_id=str(bid.auction_id),
+        amount=bid.amount,
+        type="online",
+        bidder_name=current_user.name,
+        user_id=current_user.id
+    ))
 
 @router.post("/floor", response_model=bid_schemas.Bid, status_code=status.HTTP_201_CREATED)
 async def place_floor_bid(
     bid: bid_schemas.FloorBidCreate,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Place a floor bid (Admin only)"""
-    # Get auction
-    auction = db.query(models.Auction).filter(models.Auction.id == bid.auction_id).first()
-    
-    if not auction:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Auction not found"
-        )
-    
-    if auction.status != "live":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Auction is not live"
-        )
+    # Floor bids may not have user_id
+    return await _accept_bid(db, AcceptedBid(
+        auction_id=str(bid.auction_id),
+        amount=bid.amount,
+        type="floor",
+        bidder_name=bid.bidder_name,
+        bidder_number=bid.bidder_number
+    ))
+
+@router.post("/proxy", response_model=bid_schemas.ProxyBid)
+async def set_proxy_bid(
+    proxy: bid_schemas.ProxyBidCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Set or raise your hidden maximum for a live auction
+
+    The engine bids for you, one increment over the best competing amount,
+    up to the maximum. Competing maximums are settled in a single bid; the
+    maximum itself is never broadcast. It can only be raised.
+    """
+    auction_id = str(proxy.auction_id)
+    await _load_live_auction(db, auction_id)
+    await db.close()
     
-    # Check if bid is higher than current price
-    if bid.amount <= auction.current_price:
+    maximum = ProxyMaximum(current_user.id, current_user.name, proxy.max_amount)
+    try:
+        bid = await bid_engine.submit_proxy(auction_id, maximum)
+    except BidRejected as e:
+        bids_total.inc("rejected", e.reason)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Bid must be higher than current price: ${auction.current_price}"
+            detail=e.detail
         )
     
-    # Create floor bid
-    db_bid = models.Bid(
-        auction_id=bid.auction_id,
-        user_id=None,  # Floor bids may not have user_id
-        amount=bid.amount,
-        type="floor",
-        bidder_name=bid.bidder_name,
-        bidder_number=bid.bidder_number
-    )
+    try:
+        db_proxy = await db.scalar(select(models.ProxyBid).where(
+            models.ProxyBid.auction_id == proxy.auction_id,
+            models.ProxyBid.user_id == current_user.id
+        ))
+        if db_proxy is None:
+            db_proxy = models.ProxyBid(auction_id=proxy.auction_id, user_id=current_user.id)
+            db.add(db_proxy)
+        db_proxy.max_amount = proxy.max_amount
+        db_proxy.max_set_at = maximum.set_at
+        await db.commit()
+        await db.refresh(db_proxy)
+    except Exception:
+        # The engine holds a maximum the database does not; reload it on the next bid
+        bid_engine.invalidate(auction_id)
+        raise
+    manager.publish("proxyBid", {
+        "auction_id": auction_id,
+        "user_id": str(current_user.id),
+        "bidder_name": current_user.name,
+        "max_amount": str(db_proxy.max_amount),
+        "max_set_at": maximum.set_at.isoformat()
+    })
     
-    db.add(db_bid)
-    db.commit()
-    db.refresh(db_bid)
+    if bid is not None:
+        await _settle_proxy_bid(db, bid, await _publish_bid(bid))
     
-    # Refresh auction
-    db.refresh(auction)
+    state = bid_engine.get_state(auction_id)
+    result = bid_schemas.ProxyBid.model_validate(db_proxy)
+    result.is_leading = state is not None and state.leading_user_id == current_user.id
+    return result
+
+@router.get("/proxy/{auction_id}", response_model=bid_schemas.ProxyBid)
+async def get_proxy_bid(
+    auction_id: UUID,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get your own maximum for an auction"""
+    db_proxy = await db.scalar(select(models.ProxyBid).where(
+        models.ProxyBid.auction_id == auction_id,
+        models.ProxyBid.user_id == current_user.id
+    ))
     
-    # Broadcast floor bid update via WebSocket
-    await manager.broadcast_bid_update(bid.auction_id, {
-        "id": str(db_bid.id),
-        "auctionId": str(db_bid.auction_id),
-        "newPrice": float(db_bid.amount),
-        "bidderName": db_bid.bidder_name,
-        "type": db_bid.type,
-        "timestamp": db_bid.timestamp.isoformat()
-    })
+    if not db_proxy:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No maximum set for this auction"
+        )
     
-    return db_bid
+    result = bid_schemas.ProxyBid.model_validate(db_proxy)
+    state = bid_engine.get_state(str(auction_id))
+    if state is not None:
+        result.is_leading = state.leading_user_id == current_user.id
+    return result
 
 @router.get("/auction/{auction_id}", response_model=List[bid_schemas.Bid])
 async def get_auction_bids(
-    auction_id: str,
+    auction_id: UUID,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all bids for an auction"""
-    bids = db.query(models.Bid)\
-        .filter(models.Bid.auction_id == auction_id)\
-        .order_by(models.Bid.timestamp.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
-    return bids
+    """
+    Get all bids for an auction, newest first
+
+    Full pages carry an X-Next-Cursor header; pass it back as cursor= for
+    the next page (skip is then ignored).
+    """
+    query = select(*bid_rows.columns).where(models.Bid.auction_id == auction_id)
+
+    if cursor:
+        timestamp, bid_id = decode_cursor(cursor, datetime, UUID)
+        query = query.where(tuple_(models.Bid.timestamp, models.Bid.id) < (timestamp, bid_id))
+    else:
+        query = query.offset(skip)
+
+    bids = bid_rows.to_dicts((await db.execute(
+        query.order_by(models.Bid.timestamp.desc(), models.Bid.id.desc()).limit(limit)
+    )).all())
+
+    headers = {}
+    if bids and len(bids) == limit:
+        last = bids[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last["timestamp"], last["id"])
+    return EncodedJSONResponse(content=bid_rows.dump(bids), headers=headers)
+
+@router.get("/auction/{auction_id}/export")
+async def export_auction_bids(
+    auction_id: UUID,
+    request: Request,
+    format: str = "ndjson",
+    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download every bid of a completed auction, oldest first (Admin only)
+
+    format is ndjson or csv. Rows are read through a server-side cursor and
+    streamed in chunks; send Accept-Encoding: gzip for a compressed body.
+    """
+    await get_exportable_auction(db, auction_id)
+    await db.close()
+
+    async def chunks():
+        async with AsyncSessionLocal() as export_db:
+            result = await export_db.stream(
+                select(*bid_rows.columns)
+                .where(models.Bid.auction_id == auction_id)
+                .order_by(models.Bid.timestamp, models.Bid.id)
+                .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+            )
+            async for rows in result.partitions():
+                yield bid_rows.to_dicts(rows)
+
+    return export_response(request, chunks(), bid_rows.names, format, f"auction-{auction_id}-bids")
+
+@router.get("/ws-codec")
+async def get_ws_codec():
+    """Type and field tags used by MessagePack WebSocket frames"""
+    return codebook()
 
 @router.websocket("/ws/{auction_id}")
 async def websocket_endpoint(
     websocket: WebSocket, 
     auction_id: str,
     token: str = None,
-    db: Session = Depends(get_db)
+    presence: str = None,
+    encoding: str = None,
+    since: str = None
 ):
-    """WebSocket endpoint for real-time bid updates"""
+    """
+    WebSocket endpoint for real-time bid updates
+
+    presence=full|count picks the presence frames the client receives;
+    by default signed-in users get the member list and guests the count.
+    encoding=msgpack (or the "msgpack" subprotocol) switches to compact
+    binary frames, see GET /api/bids/ws-codec; JSON text is the default.
+    since=<epoch>:<seq> (from the last "sync" frame and event seq) replays
+    the room events missed while disconnected.
+    """
     user = None
     if token:
         try:
@@ -165,15 +399,25 @@ async def websocket_endpoint(
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             user_id = payload.get("sub")
             if user_id:
-                user = db.query(models.User).filter(models.User.id == user_id).first()
+                # Short-lived session: the socket must not pin a pooled connection for its lifetime
+                async with AsyncSessionLocal() as db:
+                    user = await db.scalar(select(models.User).where(models.User.id == UUID(user_id)))
         except Exception as e:
-            print(f"WS Auth Error: {e}")
+            # Bad or expired tokens land here; the socket stays open as a guest
+            logger.warning("WebSocket auth failed: %s", e)
             
+    offered = websocket.scope.get("subprotocols", [])
+    negotiated = negotiate_encoding(encoding, offered)
+
     await manager.connect(
         websocket, 
         auction_id, 
         user_id=str(user.id) if user else None,
-        user_name=user.name if user else "Guest"
+        user_name=user.name if user else "Guest",
+        presence=presence if presence in PRESENCE_MODES else None,
+        encoding=negotiated,
+        subprotocol=negotiated if negotiated in offered else None,
+        since=since
     )
     
     try:
@@ -181,4 +425,6 @@ async def websocket_endpoint(
             data = await websocket.receive_text()
             # Handle incoming messages if needed
     except WebSocketDisconnect:
+        pass
+    finally:
         await manager.disconnect(websocket, auction_id)
@@ -3,68 +3,164 @@ Chat Router
 Handles auction room chat messages
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID, uuid4
+from datetime import datetime
 
-from database.database import get_db
+from database.database import get_db, AsyncSessionLocal
 from database import models
 from api.schemas import chat_schemas
-from api.dependencies import get_current_user
+from api.dependencies import get_current_user, get_current_admin
 from api.websocket_manager import manager
+from api.write_behind import write_behind
+from api.config import USER_NAME_CACHE_TTL_SECONDS, USER_NAME_CACHE_MAX_ENTRIES, EXPORT_CHUNK_SIZE
+from api.utils.cache import TTLCache
+from api.utils.cursor import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from api.utils.serialization import EncodedJSONResponse, RowEncoder
+from api.utils.export import export_response, get_exportable_auction
 
 router = APIRouter()
 
+message_rows = RowEncoder(chat_schemas.ChatMessage, models.ChatMessage)
+
+# user_id -> display name; the same few people chat in a room over and over
+user_names = TTLCache(maxsize=USER_NAME_CACHE_MAX_ENTRIES, ttl=USER_NAME_CACHE_TTL_SECONDS)
+
+async def _get_user_names(db: AsyncSession, user_ids: Iterable[UUID]) -> Dict[UUID, str]:
+    """Display names from the cache, with a single query for any misses"""
+    names, missing = {}, []
+    for user_id in user_ids:
+        name = user_names.get(user_id)
+        if name is None:
+            missing.append(user_id)
+        else:
+            names[user_id] = name
+
+    if missing:
+        rows = await db.execute(
+            select(models.User.id, models.User.name).where(models.User.id.in_(missing))
+        )
+        for user_id, name in rows:
+            user_names.set(user_id, name)
+            names[user_id] = name
+    return names
+
+async def _add_user_names(db: AsyncSession, messages: List[dict]):
+    """Fill in user_name on message dicts"""
+    names = await _get_user_names(db, {msg["user_id"] for msg in messages if msg["user_id"]})
+    for msg in messages:
+        if msg["user_id"]:
+            msg["user_name"] = names.get(msg["user_id"], "Unknown User")
+        else:
+            msg["user_name"] = "System"
+
 @router.get("/{auction_id}", response_model=List[chat_schemas.ChatMessage])
 async def get_chat_history(
     auction_id: UUID,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    before: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get chat history for an auction"""
-    messages = db.query(models.ChatMessage)\
-        .filter(models.ChatMessage.auction_id == auction_id)\
-        .order_by(models.ChatMessage.created_at.asc())\
-        .limit(limit)\
-        .all()
+    """
+    Get chat history for an auction, newest first
+
+    When more messages exist, the X-Next-Cursor response header holds a
+    cursor; pass it back as before= to get the next (older) page.
+    """
+    query = (
+        select(*message_rows.columns)
+        .where(models.ChatMessage.auction_id == auction_id)
+        .order_by(models.ChatMessage.created_at.desc(), models.ChatMessage.id.desc())
+        .limit(limit)
+    )
+    if before:
+        created_at, message_id = decode_cursor(before, datetime, UUID)
+        query = query.where(
+            tuple_(models.ChatMessage.created_at, models.ChatMessage.id) < (created_at, message_id)
+        )
+    messages = message_rows.to_dicts((await db.execute(query)).all())
     
-    # Add user names to messages
-    for msg in messages:
-        if msg.user_id:
-            user = db.query(models.User).filter(models.User.id == msg.user_id).first()
-            msg.user_name = user.name if user else "Unknown User"
-        else:
-            msg.user_name = "System"
+    await _add_user_names(db, messages)
+
+    headers = {}
+    if messages and len(messages) == limit:
+        last = messages[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last["created_at"], last["id"])
             
-    return messages
+    return EncodedJSONResponse(content=message_rows.dump(messages), headers=headers)
+
+@router.get("/{auction_id}/export")
+async def export_chat_history(
+    auction_id: UUID,
+    request: Request,
+    format: str = "ndjson",
+    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Download the whole chat of a completed auction, oldest first (Admin only)
+
+    format is ndjson or csv. Rows are read through a server-side cursor and
+    streamed in chunks; send Accept-Encoding: gzip for a compressed body.
+    """
+    await get_exportable_auction(db, auction_id)
+    await db.close()
+
+    async def chunks():
+        async with AsyncSessionLocal() as export_db:
+            result = await export_db.stream(
+                select(*message_rows.columns)
+                .where(models.ChatMessage.auction_id == auction_id)
+                .order_by(models.ChatMessage.created_at, models.ChatMessage.id)
+                .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+            )
+            async for rows in result.partitions():
+                messages = message_rows.to_dicts(rows)
+                # Name lookups cannot share a connection with the open cursor
+                async with AsyncSessionLocal() as names_db:
+                    await _add_user_names(names_db, messages)
+                yield messages
+
+    return export_response(request, chunks(), message_rows.names, format, f"auction-{auction_id}-chat")
 
 @router.post("/", response_model=chat_schemas.ChatMessage)
 async def send_chat_message(
     chat_msg: chat_schemas.ChatMessageCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Send a chat message to an auction room"""
     # Check if auction exists
-    auction = db.query(models.Auction).filter(models.Auction.id == chat_msg.auction_id).first()
+    auction = await db.scalar(select(models.Auction).where(models.Auction.id == chat_msg.auction_id))
     if not auction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Auction not found"
         )
     
-    # Create database entry
+    # Queue for the next group commit, handing the request's connection back first
+    await db.close()
+    user_names.set(current_user.id, current_user.name)
     db_msg = models.ChatMessage(
+        id=uuid4(),
         auction_id=chat_msg.auction_id,
         user_id=current_user.id,
         message=chat_msg.message,
-        is_admin_message=(current_user.role == "admin")
+        is_admin_message=(current_user.role == "admin"),
+        created_at=datetime.utcnow()
     )
-    
-    db.add(db_msg)
-    db.commit()
-    db.refresh(db_msg)
+    # Broadcast only once the row is committed: a chat line has no retraction
+    await write_behind.submit_message({
+        "id": db_msg.id,
+        "auction_id": db_msg.auction_id,
+        "user_id": db_msg.user_id,
+        "message": db_msg.message,
+        "is_admin_message": db_msg.is_admin_message,
+        "created_at": db_msg.created_at
+    })
     
     # Prepare data for broadcast
     broadcast_data = {
@@ -77,7 +173,6 @@ async def send_chat_message(
         "created_at": db_msg.created_at.isoformat()
     }
     
-    # Broadcast via WebSocket
     await manager.broadcast_chat_message(str(chat_msg.auction_id), broadcast_data)
     
     # Add user_name for response model compatibility
@@ -4,7 +4,8 @@ Handles auction participant registration
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from uuid import UUID
 
@@ -19,11 +20,11 @@ router = APIRouter()
 async def register_for_auction(
     registration: registration_schemas.RegistrationCreate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Register for an auction"""
     # Check if auction exists
-    auction = db.query(models.Auction).filter(models.Auction.id == registration.auction_id).first()
+    auction = await db.scalar(select(models.Auction).where(models.Auction.id == registration.auction_id))
     
     if not auction:
         raise HTTPException(
@@ -32,10 +33,10 @@ async def register_for_auction(
         )
     
     # Check if already registered
-    existing = db.query(models.Registration).filter(
+    existing = await db.scalar(select(models.Registration).where(
         models.Registration.auction_id == registration.auction_id,
         models.Registration.user_id == current_user.id
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -52,54 +53,56 @@ async def register_for_auction(
     )
     
     db.add(db_registration)
-    db.commit()
-    db.refresh(db_registration)
+    await db.commit()
+    await db.refresh(db_registration)
     
     return db_registration
 
 @router.get("/auction/{auction_id}", response_model=List[registration_schemas.Registration])
 async def get_auction_registrations(
-    auction_id: str,
+    auction_id: UUID,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all registrations for an auction (Admin only)"""
-    registrations = db.query(models.Registration)\
-        .filter(models.Registration.auction_id == auction_id)\
-        .all()
+    registrations = await db.scalars(
+        select(models.Registration)
+        .where(models.Registration.auction_id == auction_id)
+    )
     
-    return registrations
+    return registrations.all()
 
 @router.get("/user/{user_id}", response_model=List[registration_schemas.Registration])
 async def get_user_registrations(
-    user_id: str,
+    user_id: UUID,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all registrations for a user"""
     # Users can only see their own registrations
-    if str(current_user.id) != user_id and current_user.role != "admin":
+    if current_user.id != user_id and current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized"
         )
     
-    registrations = db.query(models.Registration)\
-        .filter(models.Registration.user_id == user_id)\
-        .all()
+    registrations = await db.scalars(
+        select(models.Registration)
+        .where(models.Registration.user_id == user_id)
+    )
     
-    return registrations
+    return registrations.all()
 
 @router.delete("/{registration_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def unregister_from_auction(
-    registration_id: str,
+    registration_id: UUID,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Unregister from an auction"""
-    registration = db.query(models.Registration).filter(
+    registration = await db.scalar(select(models.Registration).where(
         models.Registration.id == registration_id
-    ).first()
+    ))
     
     if not registration:
         raise HTTPException(
@@ -114,8 +117,8 @@ async def unregister_from_auction(
             detail="Not authorized"
         )
     
-    db.delete(registration)
-    db.commit()
+    await db.delete(registration)
+    await db.commit()
     
     return None
 
@@ -123,10 +126,10 @@ async def unregister_from_auction(
 async def approve_registration(
     registration_id: UUID,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Approve a registration (Admin only)"""
-    registration = db.query(models.Registration).filter(models.Registration.id == registration_id).first()
+    registration = await db.scalar(select(models.Registration).where(models.Registration.id == registration_id))
     
     if not registration:
         raise HTTPException(
@@ -135,8 +138,8 @@ async def approve_registration(
         )
     
     registration.status = "approved"
-    db.commit()
-    db.refresh(registration)
+    await db.commit()
+    await db.refresh(registration)
     
     return registration
 
@@ -144,10 +147,10 @@ async def approve_registration(
 async def reject_registration(
     registration_id: UUID,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Reject a registration (Admin only)"""
-    registration = db.query(models.Registration).filter(models.Registration.id == registration_id).first()
+    registration = await db.scalar(select(models.Registration).where(models.Registration.id == registration_id))
     
     if not registration:
         raise HTTPException(
@@ -156,8 +159,8 @@ async def reject_registration(
         )
     
     registration.status = "rejected"
-    db.commit()
-    db.refresh(registration)
+    await db.commit()
+    await db.refresh(registration)
     
     return registration
 
@@ -166,10 +169,10 @@ async def update_bidder_number(
     registration_id: UUID,
     bidder_number: str,
     current_user: models.User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Assign or update a bidder number (Admin only)"""
-    registration = db.query(models.Registration).filter(models.Registration.id == registration_id).first()
+    registration = await db.scalar(select(models.Registration).where(models.Registration.id == registration_id))
     
     if not registration:
         raise HTTPException(
@@ -178,7 +181,7 @@ async def update_bidder_number(
         )
     
     registration.bidder_number = bidder_number
-    db.commit()
-    db.refresh(registration)
+    await db.commit()
+    await db.refresh(registration)
     
     return registration
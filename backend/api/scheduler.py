@@ -0,0 +1,294 @@
+"""
+Auction Scheduler
+Starts auctions at auction_date and closes them at ends_at from in-memory timers
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, or_, select, update
+
+from database.database import AsyncSessionLocal
+from database import models
+from api.bid_engine import bid_engine
+from api.catalog_cache import invalidate_catalog
+from api.config import AUCTION_DURATION_SECONDS
+from api.websocket_manager import manager
+from api.write_behind import write_behind
+
+logger = logging.getLogger(__name__)
+
+START = "start"
+CLOSE = "close"
+
+# Timers handled at once; thousands of lots due together queue behind these
+# instead of emptying the connection pool
+MAX_CONCURRENT_FIRES = 4
+
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; convert aware ones before storing or comparing"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def default_ends_at(started_at: datetime) -> Optional[datetime]:
+    """End time for an auction started without one"""
+    if AUCTION_DURATION_SECONDS > 0:
+        return started_at + timedelta(seconds=AUCTION_DURATION_SECONDS)
+    return None
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+class AuctionScheduler:
+    """
+    One timer per scheduled or live auction, kept in a heap.
+
+    A single task sleeps until the earliest deadline, so thousands of lots
+    cost one heap entry each and the database is read only at startup (and
+    after a backplane reconnect). Rescheduling pushes a new entry and leaves
+    the old one to be skipped when it reaches the top.
+
+    Every worker keeps the same timers. Firing is a guarded UPDATE on the
+    auction's status, so exactly one worker moves it and broadcasts.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, str, str]] = []
+        # auction_id -> (when, action) of its one current timer
+        self._due: Dict[str, Tuple[datetime, str]] = {}
+        self._counter = itertools.count()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._fires: Optional[asyncio.Semaphore] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._fires = asyncio.Semaphore(MAX_CONCURRENT_FIRES)
+        await self.reload()
+        self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+    async def stop(self):
+        tasks = list(self._pending)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def reload(self):
+        """Rebuild every timer from the database"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(models.Auction.id, models.Auction.status, models.Auction.auction_date, models.Auction.ends_at)
+                .where(models.Auction.status.in_(("scheduled", "live")))
+            )).all()
+        self._heap.clear()
+        self._due.clear()
+        for auction_id, status, auction_date, ends_at in rows:
+            self.track(str(auction_id), status, auction_date, ends_at)
+        logger.info("Scheduler tracking %d auctions", len(self._due))
+
+    def resync(self):
+        """Reload every timer in the background, e.g. after missing backplane messages"""
+        if self._task is not None:
+            self._spawn(self.reload())
+
+    def track(self, auction_id: str, status: Optional[str], auction_date: Optional[datetime],
+              ends_at: Optional[datetime]):
+        """Set an auction's timer from its current status and times"""
+        if status == "scheduled" and auction_date is not None:
+            self._schedule(auction_id, START, utc_naive(auction_date))
+        elif status == "live" and ends_at is not None:
+            self._schedule(auction_id, CLOSE, utc_naive(ends_at))
+        else:
+            self._due.pop(auction_id, None)
+
+    def _schedule(self, auction_id: str, action: str, when: datetime):
+        if self._due.get(auction_id) == (when, action):
+            return
+        self._due[auction_id] = (when, action)
+        if len(self._heap) > 2 * len(self._due) + 64:
+            # Mostly superseded entries: rebuild from the live timers
+            self._heap = [(w, next(self._counter), a, act) for a, (w, act) in self._due.items()]
+            heapq.heapify(self._heap)
+        else:
+            heapq.heappush(self._heap, (when, next(self._counter), auction_id, action))
+        if self._wake is not None and self._heap[0][2] == auction_id:
+            self._wake.set()
+
+    def extend(self, auction_id: str, ends_at: datetime):
+        """A late bid on this worker pushed the close back"""
+        if self._task is None:
+            # Not running (AUCTION_SCHEDULER_ENABLED is off, or shutting down)
+            return
+        self._schedule(auction_id, CLOSE, ends_at)
+        self._spawn(self._save_end(auction_id, ends_at))
+        manager.publish("schedule", {
+            "auction_id": auction_id, "status": "live", "auction_date": None, "ends_at": _iso(ends_at)
+        })
+        self._spawn(manager.broadcast_auction_status(auction_id, "live", ends_at))
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            delay = None
+            while self._heap:
+                when, _, auction_id, action = self._heap[0]
+                if self._due.get(auction_id) != (when, action):
+                    heapq.heappop(self._heap)
+                    continue
+                delay = (when - datetime.utcnow()).total_seconds()
+                if delay > 0:
+                    break
+                heapq.heappop(self._heap)
+                del self._due[auction_id]
+                self._spawn(self._fire(auction_id, action))
+                delay = None
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _spawn(self, coro):
+        # Spawned from request handlers too; keep their context (and SQL trace) out
+        task = asyncio.create_task(coro, context=contextvars.Context())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _fire(self, auction_id: str, action: str):
+        async with self._fires:
+            try:
+                if action == START:
+                    await self._start(auction_id)
+                else:
+                    await self._close(auction_id)
+            except Exception:
+                logger.exception("Scheduled %s of auction %s failed", action, auction_id)
+
+    async def _start(self, auction_id: str):
+        now = datetime.utcnow()
+        values = {"status": "live"}
+        if default_ends_at(now) is not None:
+            values["ends_at"] = func.coalesce(models.Auction.ends_at, default_ends_at(now))
+        async with AsyncSessionLocal() as db:
+            auction = await db.scalar(
+                update(models.Auction)
+                .where(models.Auction.id == UUID(auction_id),
+                       models.Auction.status == "scheduled",
+                       models.Auction.auction_date <= now)
+                .values(**values)
+                .returning(models.Auction)
+            )
+            await db.commit()
+            if auction is None:
+                # Started, moved or deleted elsewhere; follow what the database says
+                await self._resync(db, auction_id)
+                return
+        await auction_status_changed(auction, "scheduled")
+
+    async def _close(self, auction_id: str):
+        state = bid_engine.get_state(auction_id)
+        if state is not None and state.ends_at is not None and state.ends_at > datetime.utcnow():
+            # A late bid was decided but has not been handed to extend() yet
+            self._schedule(auction_id, CLOSE, state.ends_at)
+            return
+        # Refuse new bids here, let the requests of bids already decided queue
+        # them, then wait for those to reach the database
+        bid_engine.close(auction_id)
+        await asyncio.sleep(0)
+        await write_behind.drain()
+        async with AsyncSessionLocal() as db:
+            auction = await db.scalar(
+                update(models.Auction)
+                .where(models.Auction.id == UUID(auction_id),
+                       models.Auction.status == "live",
+                       models.Auction.ends_at <= datetime.utcnow())
+                .values(status="completed")
+                .returning(models.Auction)
+            )
+            await db.commit()
+            if auction is None:
+                # Extended or ended elsewhere; the engine reloads on the next bid
+                await self._resync(db, auction_id)
+                return
+        await auction_status_changed(auction, "live")
+
+    async def _resync(self, db, auction_id: str):
+        auction = await db.scalar(select(models.Auction).where(models.Auction.id == UUID(auction_id)))
+        if auction is None:
+            self.track(auction_id, None, None, None)
+        else:
+            self.track(auction_id, auction.status, auction.auction_date, auction.ends_at)
+
+    async def _save_end(self, auction_id: str, ends_at: datetime):
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                await db.execute(
+                    update(models.Auction)
+                    .where(models.Auction.id == UUID(auction_id),
+                           models.Auction.status == "live",
+                           or_(models.Auction.ends_at.is_(None), models.Auction.ends_at < ends_at))
+                    .values(ends_at=ends_at)
+                )
+        invalidate_catalog(auction_id)
+
+
+auction_scheduler = AuctionScheduler()
+
+
+def auction_changed(auction: models.Auction):
+    """Reset an auction's timer after it was created or edited, here and on every worker"""
+    auction_id = str(auction.id)
+    auction_scheduler.track(auction_id, auction.status, auction.auction_date, auction.ends_at)
+    manager.publish("schedule", {
+        "auction_id": auction_id,
+        "status": auction.status,
+        "auction_date": _iso(auction.auction_date),
+        "ends_at": _iso(auction.ends_at),
+    })
+
+
+def auction_deleted(auction_id: str):
+    auction_scheduler.track(auction_id, None, None, None)
+    manager.publish("schedule", {"auction_id": auction_id, "status": None, "auction_date": None, "ends_at": None})
+
+
+async def auction_status_changed(auction: models.Auction, previous_status: str):
+    """Everything that follows a committed status change: caches, bid engine, timers and the room"""
+    auction_id = str(auction.id)
+    invalidate_catalog(auction_id, previous_status, auction.status)
+    if auction.status != "live":
+        # Stop accepting bids held in memory for this lot
+        bid_engine.close(auction_id)
+    auction_changed(auction)
+    await manager.broadcast_auction_status(auction_id, auction.status, auction.ends_at)
+
+
+def _on_remote_schedule(message: dict):
+    ends_at = _parse(message["ends_at"])
+    auction_scheduler.track(message["auction_id"], message["status"], _parse(message["auction_date"]), ends_at)
+    if ends_at is not None:
+        bid_engine.extend(message["auction_id"], ends_at)
+
+manager.on_message("schedule", _on_remote_schedule)
+manager.on_reconnect(auction_scheduler.resync)
@@ -15,6 +15,7 @@ class AuctionBase(BaseModel):
     category: Optional[str] = None
     starting_price: Decimal
     auction_date: datetime
+    ends_at: Optional[datetime] = None
     location: Optional[str] = None
 
 class AuctionCreate(AuctionBase):
@@ -27,6 +28,7 @@ class AuctionUpdate(BaseModel):
     category: Optional[str] = None
     starting_price: Optional[Decimal] = None
     auction_date: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
     location: Optional[str] = None
 
 class Auction(AuctionBase):
@@ -36,6 +38,8 @@ class Auction(AuctionBase):
     created_by: Optional[UUID] = None
     created_at: datetime
     updated_at: datetime
+    # Only filled in for live auctions by GET /api/auctions/{id}
+    bid_count: Optional[int] = None
 
     class Config:
         from_attributes = True
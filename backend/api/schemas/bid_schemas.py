@@ -30,3 +30,19 @@ class Bid(BidBase):
 
     class Config:
         from_attributes = True
+
+class ProxyBidCreate(BaseModel):
+    auction_id: UUID
+    max_amount: Decimal
+
+class ProxyBid(ProxyBidCreate):
+    """A bidder's own hidden maximum; never shown to anyone else"""
+    id: UUID
+    user_id: UUID
+    created_at: datetime
+    updated_at: datetime
+    # Whether this bidder holds the highest bid once the maximum took effect
+    is_leading: bool = False
+
+    class Config:
+        from_attributes = True
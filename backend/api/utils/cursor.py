@@ -0,0 +1,45 @@
+"""
+Opaque Page Cursors
+Keyset pagination tokens carrying the sort key of the last row on a page
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _plain(value) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(*values) -> str:
+    """Pack a row's sort key (e.g. created_at, id) into a URL-safe token"""
+    raw = json.dumps([_plain(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, *types: Callable) -> Tuple:
+    """Unpack a token made by encode_cursor, converting each value with types"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of values")
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, values)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
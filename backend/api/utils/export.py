@@ -0,0 +1,123 @@
+"""
+Streaming Exports
+NDJSON and CSV downloads written chunk by chunk, optionally gzipped
+"""
+
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from uuid import UUID
+
+import orjson
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import models
+from api.utils.serialization import json_default
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def get_exportable_auction(db: AsyncSession, auction_id: UUID) -> models.Auction:
+    """The auction to export; its history is only final once it is completed"""
+    auction = await db.scalar(select(models.Auction).where(models.Auction.id == auction_id))
+
+    if not auction:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Auction not found"
+        )
+
+    if auction.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Can only export completed auctions"
+        )
+
+    return auction
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().lower()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _csv_value(value: Any) -> Any:
+    # Match the JSON forms: ISO timestamps and lowercase booleans
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+async def _encode(chunks: AsyncIterator[List[Dict[str, Any]]], fields: Sequence[str], format: str):
+    if format == "ndjson":
+        async for items in chunks:
+            yield b"".join(
+                orjson.dumps(item, default=json_default, option=orjson.OPT_APPEND_NEWLINE) for item in items
+            )
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for items in chunks:
+        writer.writerows([_csv_value(item[field]) for field in fields] for item in items)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _gzip(body: AsyncIterator[bytes]):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for data in body:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(request: Request, chunks: AsyncIterator[List[Dict[str, Any]]], fields: Sequence[str],
+                    format: str, filename: str) -> StreamingResponse:
+    """
+    Stream chunks of row dicts as NDJSON (one object per line) or CSV.
+
+    Only one chunk is held at a time, so memory stays flat however long the
+    history is. The body is gzipped when the client accepts it.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format: {format}"
+        )
+
+    body = _encode(chunks, fields, format)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if _accepts_gzip(request.headers.get("accept-encoding")):
+        body = _gzip(body)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
@@ -0,0 +1,64 @@
+"""
+Fast JSON Encoding for List Endpoints
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Type
+from uuid import UUID
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy import inspect
+
+
+def json_default(value: Any) -> Any:
+    # Decimal keeps its exact digits; asyncpg's UUID subclass is not one orjson knows
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON")
+
+
+class EncodedJSONResponse(Response):
+    """Response whose body is already-encoded JSON"""
+
+    media_type = "application/json"
+
+
+class RowEncoder:
+    """
+    Encodes column-only query rows as the JSON a list of schema objects gives.
+
+    Select encoder.columns, then encode the rows: no ORM objects are built and
+    no models are validated. orjson writes the values the same way the schema
+    does, Decimal as its exact string, never via float.
+    Schema fields that are not columns get their default, unless the caller
+    fills them in on the dicts before encoding.
+    """
+
+    def __init__(self, schema: Type[BaseModel], model):
+        mapped = inspect(model).column_attrs
+        self.names = tuple(schema.model_fields)
+        self.columns = [getattr(model, name) for name in self.names if name in mapped]
+        # Position of each field in a row, or None to use the field's default
+        positions = {column.key: i for i, column in enumerate(self.columns)}
+        self._fields = tuple(
+            (name, positions.get(name), field.default)
+            for name, field in schema.model_fields.items()
+        )
+        self._plain = all(position is not None for _, position, _ in self._fields)
+
+    def to_dicts(self, rows: Iterable) -> List[Dict[str, Any]]:
+        if self._plain:
+            return [dict(zip(self.names, row)) for row in rows]
+        return [
+            {name: default if position is None else row[position] for name, position, default in self._fields}
+            for row in rows
+        ]
+
+    @staticmethod
+    def dump(items: List[Dict[str, Any]]) -> bytes:
+        return orjson.dumps(items, default=json_default)
+
+    def encode(self, rows: Iterable) -> bytes:
+        return self.dump(self.to_dicts(rows))
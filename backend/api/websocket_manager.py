@@ -2,131 +2,467 @@
 WebSocket Connection Manager
 """
 
-from typing import Dict, List
+import asyncio
+import contextvars
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+from uuid import uuid4
 from fastapi import WebSocket
 import json
 
+from api.backplane import Backplane, InProcessBackplane, create_backplane
+from api.metrics import broadcast_duration, broadcast_recipients
+from api.presence import PRESENCE_COUNT, PRESENCE_FULL, RoomPresence
+from api.replay import RoomHistory, parse_cursor
+from api.utils.cache import TTLCache
+from api.ws_codec import ENCODING_JSON, encode_frame
+from api.config import (
+    WS_BACKPLANE_URL, WS_BACKPLANE_HEARTBEAT_SECONDS, WS_PRESENCE_INTERVAL_MS,
+    WS_REPLAY_BUFFER_SIZE, WS_REPLAY_MAX_ROOMS, WS_REPLAY_TTL_SECONDS,
+    WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT_SECONDS
+)
+
+# Message types where only the newest frame matters; older queued ones may be dropped
+REPLACEABLE_TYPES = {"bidUpdated", "presenceCount"}
+
+# Queue kind of a "sync" frame telling a client to reload after numbered frames were dropped
+RELOAD = "reload"
+
+
+class Connection:
+    """
+    One client socket with its own bounded outbound queue and writer task.
+
+    Broadcasts only append pre-encoded frames here, so a slow client delays
+    nobody but itself. When its queue fills up, stale replaceable frames are
+    discarded first; if that is not enough the client is disconnected.
+    Discarding numbered room events would leave a hole in the client's seq,
+    so those are replaced by one "sync" frame asking it to reload instead.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, user_name: str,
+                 on_close: Callable[["Connection"], None]):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.user_name = user_name
+        self.closed = False
+        # Room-wide id of this connection, assigned by the manager
+        self.key = None
+        # Presence frames this client gets: member snapshot + deltas, or counts only
+        self.presence_mode = PRESENCE_FULL
+        # Wire encoding negotiated on connect (JSON text or MessagePack binary)
+        self.encoding = ENCODING_JSON
+        self._on_close = on_close
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._writer = asyncio.create_task(self._write(), context=contextvars.Context())
+
+    def send(self, message_type: str, frame: Union[str, bytes],
+             cursor: Optional[Tuple[str, int]] = None) -> bool:
+        """Queue a frame, numbered with the room's (epoch, seq) if given; returns False if the client cannot keep up"""
+        if self.closed:
+            return False
+        if len(self._queue) >= WS_SEND_QUEUE_SIZE:
+            if message_type not in REPLACEABLE_TYPES:
+                return False
+            # A newer price (or participant list) supersedes any queued one. A
+            # queued reload only goes if a numbered frame can take its place
+            kept = deque(
+                item for item in self._queue
+                if item[0] != message_type and (cursor is None or item[0] != RELOAD)
+            )
+            if len(kept) >= WS_SEND_QUEUE_SIZE:
+                return False
+            if cursor is not None and len(kept) < len(self._queue):
+                # Numbered events were dropped: move the client's cursor past them
+                # and have it refetch, rather than leave a gap it cannot see
+                epoch, seq = cursor
+                message_type = RELOAD
+                frame = encode_frame(self.encoding, "sync", {
+                    "epoch": epoch, "seq": seq, "replayed": 0, "reload": True
+                })
+            self._queue = kept
+        self._queue.append((message_type, frame))
+        self._ready.set()
+        return True
+
+    async def _write(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    _, frame = self._queue.popleft()
+                    if isinstance(frame, bytes):
+                        send = self.websocket.send_bytes(frame)
+                    else:
+                        send = self.websocket.send_text(frame)
+                    await asyncio.wait_for(send, WS_SEND_TIMEOUT_SECONDS)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or timed out: treat the client as gone
+            self.close()
+
+    def close(self):
+        """Stop writing and tell the manager; safe to call more than once"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._on_close(self)
+
+
 class ConnectionManager:
-    def __init__(self):
-        # Dictionary mapping auction_id to list of connection dicts
-        # { auction_id: [ { "websocket": ws, "user_id": uid, "user_name": name }, ... ] }
-        self.active_connections: Dict[str, List[dict]] = {}
+    """
+    Rooms of local sockets plus a backplane to the other API workers.
+
+    Room events are delivered to local sockets straight away and published
+    once on the backplane; every other worker delivers them to its own
+    sockets. Each worker also keeps the room-wide presence (joins and leaves
+    from all workers); clients get a snapshot on connect and coalesced,
+    versioned deltas after that.
+
+    Room events are numbered per room as this worker delivers them and the
+    latest few are kept, so a client reconnecting with ?since=<epoch>:<seq>
+    only receives what it missed.
+    """
 
-    async def connect(self, websocket: WebSocket, auction_id: str, user_id: str = None, user_name: str = None):
+    def __init__(self, backplane: Backplane = None):
+        # Dictionary mapping auction_id to this worker's connections, keyed by socket
+        # { auction_id: { websocket: Connection(websocket, user_id, user_name), ... } }
+        self.active_connections: Dict[str, Dict[WebSocket, Connection]] = {}
+        # Participants across all workers: { auction_id: RoomPresence }
+        self.presence: Dict[str, RoomPresence] = {}
+        # Recent events per room, kept after the room empties so clients can resume
+        self.history = TTLCache(maxsize=WS_REPLAY_MAX_ROOMS, ttl=WS_REPLAY_TTL_SECONDS)
+        self.backplane = backplane or InProcessBackplane()
+        self.worker_id = uuid4().hex
+        # Last heartbeat time of every other worker, used to expire crashed ones
+        self._peers: Dict[str, float] = {}
+        self._next_key = 0
+        self._heartbeat_task = None
+        # Rooms whose participants changed since the last presence delta went out
+        self._presence_dirty: Set[str] = set()
+        self._presence_task = None
+        # Other modules' backplane messages, by kind, and what to run after a reconnect
+        self._handlers: Dict[str, Callable[[dict], None]] = {}
+        self._reconnect_hooks: List[Callable[[], None]] = []
+
+    async def start(self):
+        """Join the backplane; call once from the app lifespan"""
+        await self.backplane.start(self._on_backplane_message, on_connect=self._on_backplane_connect)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        """Tell peers this worker's participants are gone and leave the backplane"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        self._publish({"k": "bye"})
+        await asyncio.sleep(0)
+        await self.backplane.stop()
+
+    async def connect(self, websocket: WebSocket, auction_id: str, user_id: str = None, user_name: str = None,
+                      presence: str = None, encoding: str = ENCODING_JSON, subprotocol: str = None,
+                      since: str = None):
         """Accept WebSocket connection and add to auction room"""
-        await websocket.accept()
-        
-        if auction_id not in self.active_connections:
-            self.active_connections[auction_id] = []
-        
-        self.active_connections[auction_id].append({
-            "websocket": websocket,
-            "user_id": user_id,
-            "user_name": user_name or "Anonymous"
+        await websocket.accept(subprotocol=subprotocol)
+
+        connection = Connection(
+            websocket,
+            user_id,
+            user_name or "Anonymous",
+            on_close=lambda connection: self._drop(connection, auction_id)
+        )
+        self._next_key += 1
+        connection.key = f"{self.worker_id}:{self._next_key}"
+        # Guests see only the head count unless they ask for more
+        connection.presence_mode = presence or (PRESENCE_FULL if user_id else PRESENCE_COUNT)
+        connection.encoding = encoding
+        self.active_connections.setdefault(auction_id, {})[websocket] = connection
+
+        self._join(auction_id, connection.key, connection.user_id, connection.user_name)
+        # The newcomer starts from a snapshot; its own join arrives with everyone else's in the next delta
+        connection.send("presenceSnapshot", self._snapshot_frame(auction_id, connection.presence_mode, encoding))
+        self._resume(connection, auction_id, since)
+        self._publish({
+            "k": "join", "r": auction_id, "c": connection.key,
+            "u": connection.user_id, "n": connection.user_name
         })
-        
-        # Notify others about the participants list
-        await self.broadcast_participant_update(auction_id)
 
     async def disconnect(self, websocket: WebSocket, auction_id: str):
         """Remove WebSocket connection from auction room"""
-        if auction_id in self.active_connections:
-            self.active_connections[auction_id] = [
-                c for c in self.active_connections[auction_id] 
-                if c["websocket"] != websocket
-            ]
-            
-            # Clean up empty rooms
-            if not self.active_connections[auction_id]:
-                del self.active_connections[auction_id]
-            else:
-                # Notify others about the participants list
-                await self.broadcast_participant_update(auction_id)
+        connection = self.active_connections.get(auction_id, {}).get(websocket)
+        if connection is not None:
+            connection.close()
+
+    def _drop(self, connection: Connection, auction_id: str):
+        """Remove a closed connection from its room"""
+        room = self.active_connections.get(auction_id)
+        if room is None or room.get(connection.websocket) is not connection:
+            return
+
+        del room[connection.websocket]
+
+        # Clean up empty rooms
+        if not room:
+            del self.active_connections[auction_id]
+
+        self._leave(auction_id, connection.key)
+        self._publish({"k": "leave", "r": auction_id, "c": connection.key})
+
+        # Make sure a slow client we gave up on actually goes away
+        asyncio.ensure_future(self._close_socket(connection.websocket))
+
+    def _room_history(self, auction_id: str) -> RoomHistory:
+        history = self.history.get(auction_id)
+        if history is None:
+            history = RoomHistory(WS_REPLAY_BUFFER_SIZE)
+        # Setting it again keeps rooms with recent events from expiring
+        self.history.set(auction_id, history)
+        return history
+
+    def _resume(self, connection: Connection, auction_id: str, since: str = None):
+        """Replay events the client missed, then tell it where the room is at"""
+        history = self._room_history(auction_id)
+        cursor = parse_cursor(since)
+        missed = None
+        if cursor is not None and cursor[0] == history.epoch and cursor[1] <= history.seq:
+            missed = history.since(cursor[1])
+            # Too much to queue at once: a REST reload is cheaper than a forced disconnect
+            if missed is not None and len(missed) >= WS_SEND_QUEUE_SIZE - 1:
+                missed = None
+
+        for seq, message_type, data in missed or ():
+            connection.send(message_type, encode_frame(connection.encoding, message_type, data, seq))
+
+        connection.send("sync", encode_frame(connection.encoding, "sync", {
+            "epoch": history.epoch,
+            "seq": history.seq,
+            "replayed": len(missed or ()),
+            # The client asked to resume but the gap is gone: refetch bids and chat
+            "reload": cursor is not None and missed is None
+        }))
+
+    def _join(self, auction_id: str, key: str, user_id: str, user_name: str):
+        room = self.presence.get(auction_id)
+        if room is None:
+            room = self.presence[auction_id] = RoomPresence()
+        room.add(key, user_id, user_name)
+        self._presence_changed(auction_id)
+
+    def _leave(self, auction_id: str, key: str):
+        room = self.presence.get(auction_id)
+        if room is None or key not in room.members:
+            return
+        room.remove(key)
+        self._presence_changed(auction_id)
+
+    def _snapshot_frame(self, auction_id: str, mode: str, encoding: str) -> Union[str, bytes]:
+        """Encoded snapshot, shared by every client joining before the next delta"""
+        room = self.presence[auction_id]
+        frame = room.cache.get((mode, encoding))
+        if frame is None:
+            frame = room.cache[(mode, encoding)] = encode_frame(encoding, "presenceSnapshot", room.snapshot(mode))
+        return frame
+
+    def _forget_worker(self, worker_id: str):
+        """Drop every participant that belongs to another worker"""
+        prefix = worker_id + ":"
+        for auction_id, room in list(self.presence.items()):
+            for key in [key for key in room.members if key.startswith(prefix)]:
+                self._leave(auction_id, key)
+
+    def _local_members(self) -> list:
+        return [
+            [auction_id, c.key, c.user_id, c.user_name]
+            for auction_id, room in self.active_connections.items()
+            for c in room.values()
+        ]
+
+    def _publish(self, envelope: dict):
+        if not self.backplane.has_peers():
+            return
+        envelope["o"] = self.worker_id
+        self.backplane.publish(json.dumps(envelope).encode())
+
+    def on_message(self, kind: str, handler: Callable[[dict], None]):
+        """Call handler with the data of every message of this kind from other workers"""
+        self._handlers[kind] = handler
+
+    def on_reconnect(self, hook: Callable[[], None]):
+        """Call hook whenever the backplane (re)connects; messages may have been missed"""
+        self._reconnect_hooks.append(hook)
+
+    def publish(self, kind: str, data: dict):
+        """Send data to the handlers registered for kind on every other worker"""
+        self._publish({"k": "x", "x": kind, "d": data})
+
+    def _on_backplane_connect(self):
+        # Anything published while we were away is lost: ask every peer for its members
+        self._publish({"k": "hello"})
+        for hook in self._reconnect_hooks:
+            hook()
+
+    def _on_backplane_message(self, payload: bytes):
+        envelope = json.loads(payload)
+        origin = envelope.get("o")
+        if origin == self.worker_id:
+            return
+        kind = envelope.get("k")
+        if kind != "bye":
+            self._peers[origin] = time.monotonic()
+
+        if kind == "event":
+            self._deliver(envelope["r"], envelope["t"], envelope["d"])
+        elif kind == "join":
+            self._join(envelope["r"], envelope["c"], envelope["u"], envelope["n"])
+        elif kind == "leave":
+            self._leave(envelope["r"], envelope["c"])
+        elif kind == "hello":
+            self._publish({"k": "sync", "m": self._local_members()})
+        elif kind == "sync":
+            self._forget_worker(origin)
+            for auction_id, key, user_id, user_name in envelope["m"]:
+                self._join(auction_id, key, user_id, user_name)
+        elif kind == "bye":
+            self._peers.pop(origin, None)
+            self._forget_worker(origin)
+        elif kind == "x":
+            handler = self._handlers.get(envelope["x"])
+            if handler is not None:
+                handler(envelope["d"])
+
+    async def _heartbeat(self):
+        """Announce this worker and expire peers that stopped announcing"""
+        interval = WS_BACKPLANE_HEARTBEAT_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            self._publish({"k": "alive"})
+            cutoff = time.monotonic() - 3 * interval
+            for worker_id, seen in list(self._peers.items()):
+                if seen < cutoff:
+                    del self._peers[worker_id]
+                    self._forget_worker(worker_id)
+
+    def _presence_changed(self, auction_id: str):
+        """Mark a room for the next coalesced presence delta"""
+        self._presence_dirty.add(auction_id)
+        if self._presence_task is None:
+            self._presence_task = asyncio.create_task(self._flush_presence(), context=contextvars.Context())
+
+    async def _flush_presence(self):
+        await asyncio.sleep(WS_PRESENCE_INTERVAL_MS / 1000)
+        # Changes made while broadcasting below schedule a fresh flush
+        self._presence_task = None
+        dirty, self._presence_dirty = self._presence_dirty, set()
+        for auction_id in dirty:
+            room = self.presence.get(auction_id)
+            if room is None:
+                continue
+            # Every worker derives deltas from its own copy, so they are never published
+            delta = room.take_delta()
+            if not room.members:
+                del self.presence[auction_id]
+            if delta is not None:
+                self._deliver_presence(auction_id, delta)
+
+    def _deliver_presence(self, auction_id: str, delta: dict):
+        """Send a delta to full-presence clients and just the count to the rest"""
+        room = self.active_connections.get(auction_id)
+        if not room:
+            return
+
+        messages = {
+            PRESENCE_FULL: ("presenceDelta", delta),
+            PRESENCE_COUNT: ("presenceCount", {"version": delta["version"], "count": delta["count"]}),
+        }
+        started = time.perf_counter()
+        frames = {}
+
+        slow = []
+        for connection in room.values():
+            key = (connection.presence_mode, connection.encoding)
+            frame = frames.get(key)
+            if frame is None:
+                frame = frames[key] = encode_frame(connection.encoding, *messages[connection.presence_mode])
+            if not connection.send(messages[connection.presence_mode][0], frame):
+                slow.append(connection)
+        broadcast_recipients.observe(len(room), "presence")
+        for connection in slow:
+            connection.close()
+        broadcast_duration.observe(time.perf_counter() - started, "presence")
+
+    @staticmethod
+    async def _close_socket(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send message to specific WebSocket"""
         await websocket.send_text(json.dumps(message))
 
+    def broadcast(self, auction_id: str, message_type: str, data: dict):
+        """Send a message to everyone in the room, on this worker and all others"""
+        self._deliver(auction_id, message_type, data)
+        self._publish({"k": "event", "r": auction_id, "t": message_type, "d": data})
+
+    def _deliver(self, auction_id: str, message_type: str, data: dict):
+        """Number a room event, then encode it once per encoding and queue it on every local connection"""
+        history = self._room_history(auction_id)
+        seq = history.append(message_type, data)
+        cursor = (history.epoch, seq)
+
+        room = self.active_connections.get(auction_id)
+        if not room:
+            return
+
+        started = time.perf_counter()
+        frames = {}
+
+        slow = []
+        for connection in room.values():
+            frame = frames.get(connection.encoding)
+            if frame is None:
+                frame = frames[connection.encoding] = encode_frame(connection.encoding, message_type, data, seq)
+            if not connection.send(message_type, frame, cursor):
+                slow.append(connection)
+        broadcast_recipients.observe(len(room), message_type)
+        for connection in slow:
+            connection.close()
+        broadcast_duration.observe(time.perf_counter() - started, message_type)
+
     async def broadcast_bid_update(self, auction_id: str, bid_data: dict):
         """Broadcast bid update to all connections in auction room"""
-        if auction_id not in self.active_connections:
-            return
-        
-        message = {
-            "type": "bidUpdated",
-            "data": bid_data
-        }
-        
-        disconnected = []
-        for connection in self.active_connections[auction_id]:
-            try:
-                await connection["websocket"].send_text(json.dumps(message))
-            except:
-                disconnected.append(connection["websocket"])
-        
-        # Remove disconnected connections
-        for ws in disconnected:
-            await self.disconnect(ws, auction_id)
+        self.broadcast(auction_id, "bidUpdated", bid_data)
+
+    async def broadcast_bid_rejected(self, auction_id: str, bid_id: str):
+        """Retract a broadcast bid that failed to persist"""
+        self.broadcast(auction_id, "bidRejected", {
+            "id": bid_id,
+            "auctionId": auction_id
+        })
 
     async def broadcast_participant_update(self, auction_id: str):
-        """Broadcast participant list/count update"""
-        if auction_id not in self.active_connections:
-            return
-        
-        participants = [
-            {"user_id": c["user_id"], "user_name": c["user_name"]}
-            for c in self.active_connections[auction_id]
-        ]
-        
-        message = {
-            "type": "participantUpdate",
-            "data": {
-                "count": len(participants),
-                "participants": participants
-            }
-        }
-        
-        disconnected = []
-        for connection in self.active_connections[auction_id]:
-            try:
-                await connection["websocket"].send_text(json.dumps(message))
-            except:
-                disconnected.append(connection["websocket"])
-        
-        for ws in disconnected:
-            await self.disconnect(ws, auction_id)
+        """Push pending presence changes with the next coalesced delta"""
+        self._presence_changed(auction_id)
 
     async def broadcast_chat_message(self, auction_id: str, message_data: dict):
         """Broadcast chat message to all connections in auction room"""
-        if auction_id not in self.active_connections:
-            return
-        
-        message = {
-            "type": "chatMessage",
-            "data": message_data
-        }
-        
-        disconnected = []
-        for connection in self.active_connections[auction_id]:
-            try:
-                await connection["websocket"].send_text(json.dumps(message))
-            except:
-                disconnected.append(connection["websocket"])
-        
-        # Remove disconnected connections
-        for ws in disconnected:
-            await self.disconnect(ws, auction_id)
-
-    async def broadcast_auction_status(self, auction_id: str, status: str):
-        """Broadcast auction status change"""
-        message = {
-            "type": "auctionStatus",
-            "data": {
-                "auctionId": auction_id,
-                "status": status
-            }
-        }
-        
-        await self.broadcast_bid_update(auction_id, message["data"])
+        self.broadcast(auction_id, "chatMessage", message_data)
+
+    async def broadcast_auction_status(self, auction_id: str, status: str, ends_at: datetime = None):
+        """Broadcast auction status change (or a new end time for a live auction)"""
+        self.broadcast(auction_id, "auctionStatus", {
+            "auctionId": auction_id,
+            "status": status,
+            "endsAt": ends_at.isoformat() if ends_at is not None else None
+        })
 
-manager = ConnectionManager()
+manager = ConnectionManager(create_backplane(WS_BACKPLANE_URL))
@@ -0,0 +1,177 @@
+"""
+Write-Behind Queue
+Group-commits accepted bids and chat messages in small batches
+"""
+
+import asyncio
+import contextvars
+import logging
+from contextlib import nullcontext
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from database.database import AsyncSessionLocal
+from database import models
+from database.bid_store import accept_bid_batch
+from api.config import WRITE_BEHIND_FLUSH_MS, WRITE_BEHIND_MAX_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehind:
+    """
+    Collects rows from request handlers and writes them in one transaction.
+
+    A flush happens every few milliseconds, or as soon as a batch fills up,
+    so a burst of bids costs one commit instead of one per row. Each submit
+    returns a future that resolves once the row is durable, which lets the
+    caller broadcast first and await the acknowledgement afterwards.
+    """
+
+    def __init__(self, flush_interval: float, max_batch: int):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._bids: List[Tuple[object, asyncio.Future]] = []
+        self._messages: List[Tuple[dict, asyncio.Future]] = []
+        # The batch being written right now
+        self._writing: List[Tuple[object, asyncio.Future]] = []
+        self._has_work = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+    def _pending(self) -> int:
+        return len(self._bids) + len(self._messages)
+
+    def _enqueue(self, queue: list, item) -> asyncio.Future:
+        if self._task is None or self._task.done():
+            # A fresh context, so the task does not inherit the first submitter's
+            # request-scoped state (e.g. its SQL trace)
+            self._task = asyncio.create_task(self._run(), context=contextvars.Context())
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append((item, future))
+        self._has_work.set()
+        if self._pending() >= self.max_batch:
+            self._batch_full.set()
+        return future
+
+    def submit_bid(self, bid) -> asyncio.Future:
+        """Queue a bid decided by the engine; resolves to its timestamp, or None if it lost a race"""
+        return self._enqueue(self._bids, bid)
+
+    def submit_message(self, values: dict) -> asyncio.Future:
+        """Queue a chat message row; resolves to None once it is committed"""
+        return self._enqueue(self._messages, values)
+
+    async def drain(self):
+        """Wait until everything queued so far has been written (or has failed)"""
+        futures = [future for _, future in self._writing + self._bids + self._messages]
+        if futures:
+            await asyncio.wait(futures)
+
+    async def stop(self):
+        """Flush whatever is still queued and stop the background task"""
+        self._closing = True
+        self._has_work.set()
+        self._batch_full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        self._closing = False
+
+    async def _run(self):
+        while not (self._closing and not self._pending()):
+            await self._has_work.wait()
+            if self._pending() < self.max_batch and not self._closing:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self._flush_once()
+
+    async def _flush_once(self):
+        bids, self._bids = self._bids[:self.max_batch], self._bids[self.max_batch:]
+        room = self.max_batch - len(bids)
+        messages, self._messages = self._messages[:room], self._messages[room:]
+        if not self._pending():
+            self._has_work.clear()
+        self._batch_full.clear()
+        if not bids and not messages:
+            return
+
+        self._writing = bids + messages
+        try:
+            results, message_error = await self._write(
+                [bid for bid, _ in bids],
+                [values for values, _ in messages]
+            )
+        except Exception as e:
+            for _, future in bids + messages:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._writing = []
+
+        for (_, future), result in zip(bids, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        for _, future in messages:
+            if future.done():
+                continue
+            if message_error is not None:
+                future.set_exception(message_error)
+            else:
+                future.set_result(None)
+
+    async def _write(self, bids: list, messages: List[dict]) -> Tuple[list, Optional[Exception]]:
+        """
+        Write one batch in a single transaction.
+
+        Each auction's bids, and the chat messages, go in their own savepoint,
+        so a failing group only fails its own rows. Returns per-bid timestamps
+        (or the group's exception) in order, and the chat insert's exception.
+        """
+        by_auction = {}
+        for bid in bids:
+            by_auction.setdefault(bid.auction_id, []).append(bid)
+        # A lone group needs no savepoint: the transaction already isolates it
+        isolate = len(by_auction) + bool(messages) > 1
+
+        outcome = {}
+        message_error = None
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                for auction_id, auction_bids in by_auction.items():
+                    try:
+                        async with db.begin_nested() if isolate else nullcontext():
+                            timestamps = await accept_bid_batch(db, auction_bids)
+                    except Exception as e:
+                        if not isolate:
+                            raise
+                        logger.exception("Writing %d bids for auction %s failed", len(auction_bids), auction_id)
+                        timestamps = [e] * len(auction_bids)
+                    for bid, timestamp in zip(auction_bids, timestamps):
+                        outcome[bid.id] = timestamp
+                if messages:
+                    try:
+                        async with db.begin_nested() if isolate else nullcontext():
+                            await db.execute(insert(models.ChatMessage), messages)
+                    except Exception as e:
+                        if not isolate:
+                            raise
+                        logger.exception("Writing %d chat messages failed", len(messages))
+                        message_error = e
+
+        return [outcome[bid.id] for bid in bids], message_error
+
+write_behind = WriteBehind(
+    flush_interval=WRITE_BEHIND_FLUSH_MS / 1000,
+    max_batch=WRITE_BEHIND_MAX_BATCH
+)
@@ -0,0 +1,94 @@
+"""
+WebSocket Frame Encodings
+JSON for existing clients, MessagePack with short tags for compact ones
+"""
+
+import json
+from typing import Optional, Union
+
+import msgpack
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODINGS = (ENCODING_JSON, ENCODING_MSGPACK)
+
+# MessagePack frames are [type tag, data] (plus the sequence number for room events)
+# with every known key replaced by its tag.
+# Tags are part of the wire protocol: add new ones, never reuse or renumber.
+TYPE_TAGS = {
+    "bidUpdated": 1,
+    "bidRejected": 2,
+    "chatMessage": 3,
+    "auctionStatus": 4,
+    "presenceSnapshot": 5,
+    "presenceDelta": 6,
+    "presenceCount": 7,
+    "sync": 8,
+}
+
+FIELD_TAGS = {
+    "id": "i",
+    "auctionId": "a",
+    "auction_id": "ai",
+    "newPrice": "p",
+    "bidderName": "b",
+    "type": "k",
+    "timestamp": "ts",
+    "status": "s",
+    "user_id": "u",
+    "user_name": "n",
+    "message": "m",
+    "is_admin_message": "am",
+    "created_at": "ca",
+    "version": "v",
+    "count": "c",
+    "participants": "ps",
+    "joined": "j",
+    "left": "l",
+    "epoch": "e",
+    "seq": "q",
+    "replayed": "r",
+    "reload": "rl",
+    "endsAt": "ea",
+}
+
+
+def negotiate_encoding(requested: Optional[str], subprotocols) -> str:
+    """Pick the encoding from ?encoding= or the Sec-WebSocket-Protocol offer"""
+    if requested in ENCODINGS:
+        return requested
+    if ENCODING_MSGPACK in (subprotocols or ()):
+        return ENCODING_MSGPACK
+    return ENCODING_JSON
+
+
+def _tag(value):
+    if isinstance(value, dict):
+        return {FIELD_TAGS.get(key, key): _tag(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_tag(item) for item in value]
+    return value
+
+
+def encode_frame(encoding: str, message_type: str, data: dict, seq: int = None) -> Union[str, bytes]:
+    """Encode one room message; JSON frames are text, MessagePack frames binary"""
+    if encoding == ENCODING_MSGPACK:
+        frame = [TYPE_TAGS.get(message_type, message_type), _tag(data)]
+        if seq is not None:
+            frame.append(seq)
+        return msgpack.packb(frame)
+    frame = {
+        "type": message_type,
+        "data": data
+    }
+    if seq is not None:
+        frame["seq"] = seq
+    return json.dumps(frame)
+
+
+def codebook() -> dict:
+    """Tag tables for clients building a MessagePack decoder"""
+    return {
+        "types": TYPE_TAGS,
+        "fields": FIELD_TAGS,
+    }
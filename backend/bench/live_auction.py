@@ -0,0 +1,396 @@
+"""
+Live Auction Benchmark
+Drives one live auction through the HTTP and WebSocket APIs and reports
+bid-to-broadcast latency as JSON.
+
+Run from the backend directory against the database in DATABASE_URL
+(schema at `alembic upgrade head`):
+    python -m bench.live_auction --bidders 20 --watchers 200 --duration 15 --output bench.json
+
+By default the API is started on a free port with uvicorn; pass --url to
+measure a server that is already running. Every run registers fresh users
+and creates its own auction, which it ends afterwards.
+
+N bidders sign in, join the room over /api/bids/ws/{auction_id} and bid via
+POST /api/bids/ in a loop; M watchers join as guests. Amounts come from one
+counter, so every bid is unique and most are accepted; concurrent bids that
+arrive out of order are rejected as too low, as in a real sale. Chat
+messages go through POST /api/chat/ at --chat-rate.
+
+Latency is measured from just before the bid is POSTed to the moment each
+socket receives the matching bidUpdated frame. --compare checks the result
+against an earlier run and exits with status 1 on a regression.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+import msgpack
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "bench-password"
+
+
+def percentiles(samples: List[float]) -> dict:
+    """Nearest-rank percentiles in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Recorder:
+    """Send times of bids and chat messages, and every socket's receive times"""
+
+    def __init__(self):
+        self.bid_sent: Dict[float, float] = {}
+        self.chat_sent: Dict[str, float] = {}
+        self.bid_latency: List[float] = []
+        self.chat_latency: List[float] = []
+        self.bid_http: List[float] = []
+        self.chat_http: List[float] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.chats = 0
+        self.frames = 0
+        self.dropped_sockets = 0
+
+    def on_frame(self, message_type: str, data: dict, received: float):
+        self.frames += 1
+        if message_type == "bidUpdated":
+            sent = self.bid_sent.get(round(float(data["newPrice"]), 2))
+            if sent is not None:
+                self.bid_latency.append(received - sent)
+        elif message_type == "chatMessage":
+            sent = self.chat_sent.get(data["message"])
+            if sent is not None:
+                self.chat_latency.append(received - sent)
+
+
+class Decoder:
+    """Turns JSON or MessagePack room frames back into (type, data)"""
+
+    def __init__(self, codebook: dict):
+        self.types = {tag: name for name, tag in codebook["types"].items()}
+        self.fields = {tag: name for name, tag in codebook["fields"].items()}
+
+    def decode(self, frame):
+        if isinstance(frame, str):
+            message = json.loads(frame)
+            return message["type"], message["data"]
+        message = msgpack.unpackb(frame)
+        data = message[1]
+        if isinstance(data, dict):
+            data = {self.fields.get(key, key): value for key, value in data.items()}
+        return self.types.get(message[0]), data
+
+
+async def _listen(url: str, recorder: Recorder, decoder: Decoder, ready: asyncio.Event, stop: asyncio.Event):
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            ready.set()
+            while not stop.is_set():
+                try:
+                    frame = await asyncio.wait_for(ws.recv(), 0.5)
+                except asyncio.TimeoutError:
+                    continue
+                received = time.perf_counter()
+                message_type, data = decoder.decode(frame)
+                recorder.on_frame(message_type, data, received)
+    except websockets.ConnectionClosed:
+        recorder.dropped_sockets += 1
+    finally:
+        ready.set()
+
+
+async def _sign_up(client: httpx.AsyncClient, run_id: str, index: int) -> str:
+    email = f"bench-{run_id}-{index}@example.com"
+    response = await client.post("/api/auth/register", json={
+        "email": email, "password": PASSWORD, "name": f"Bidder {index}"
+    })
+    response.raise_for_status()
+    response = await client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def _promote(email: str):
+    from database.database import SessionLocal
+    from database import models
+    # Registers the hooks that tell running API workers to drop cached copies of changed users
+    from database import user_events
+    with SessionLocal() as db:
+        # Assign on the object: a bulk query update skips the flush hooks above
+        user = db.query(models.User).filter(models.User.email == email).one()
+        user.role = "admin"
+        db.commit()
+
+
+async def _admin_token(client: httpx.AsyncClient, run_id: str) -> str:
+    email = f"bench-{run_id}-admin@example.com"
+    response = await client.post("/api/auth/register", json={
+        "email": email, "password": PASSWORD, "name": "Bench Admin"
+    })
+    response.raise_for_status()
+    await asyncio.to_thread(_promote, email)
+    response = await client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run(args) -> dict:
+    run_id = uuid.uuid4().hex[:8]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.bidders + 10)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30, limits=limits) as client:
+        admin = {"Authorization": f"Bearer {await _admin_token(client, run_id)}"}
+        response = await client.post("/api/auctions/", headers=admin, json={
+            "title": f"Benchmark {run_id}",
+            "starting_price": args.start_price,
+            "auction_date": datetime.utcnow().isoformat()
+        })
+        response.raise_for_status()
+        auction_id = response.json()["id"]
+        (await client.post(f"/api/auctions/{auction_id}/start", headers=admin)).raise_for_status()
+
+        tokens = await asyncio.gather(*(_sign_up(client, run_id, i) for i in range(args.bidders)))
+        decoder = Decoder((await client.get("/api/bids/ws-codec")).json())
+
+        ws_base = args.url.replace("http", "ws", 1) + f"/api/bids/ws/{auction_id}?encoding={args.encoding}"
+        urls = [f"{ws_base}&token={token}" for token in tokens] + [ws_base] * args.watchers
+        stop = asyncio.Event()
+        listeners = []
+        for start in range(0, len(urls), 50):
+            batch = []
+            for url in urls[start:start + 50]:
+                ready = asyncio.Event()
+                listeners.append(asyncio.create_task(_listen(url, recorder, decoder, ready, stop)))
+                batch.append(ready.wait())
+            await asyncio.gather(*batch)
+        sockets = len(urls) - recorder.dropped_sockets
+        # Let join presence settle before measuring
+        await asyncio.sleep(1)
+
+        next_amount = [args.start_price]
+        deadline = time.perf_counter() + args.duration
+
+        async def bidder(token: str):
+            headers = {"Authorization": f"Bearer {token}"}
+            while time.perf_counter() < deadline:
+                next_amount[0] += args.increment
+                amount = round(next_amount[0], 2)
+                sent = time.perf_counter()
+                recorder.bid_sent[amount] = sent
+                try:
+                    response = await client.post("/api/bids/", headers=headers, json={
+                        "auction_id": auction_id, "amount": amount
+                    })
+                except httpx.HTTPError:
+                    recorder.errors += 1
+                    continue
+                recorder.bid_http.append(time.perf_counter() - sent)
+                if response.status_code == 201:
+                    recorder.accepted += 1
+                elif response.status_code == 400:
+                    recorder.rejected += 1
+                else:
+                    recorder.errors += 1
+                if args.think_ms:
+                    await asyncio.sleep(args.think_ms / 1000)
+
+        async def chatter():
+            headers = {"Authorization": f"Bearer {tokens[0]}"}
+            while time.perf_counter() < deadline:
+                await asyncio.sleep(1 / args.chat_rate)
+                message = f"bench {run_id} {recorder.chats}"
+                sent = time.perf_counter()
+                recorder.chat_sent[message] = sent
+                recorder.chats += 1
+                try:
+                    response = await client.post("/api/chat/", headers=headers, json={
+                        "auction_id": auction_id, "message": message
+                    })
+                    recorder.chat_http.append(time.perf_counter() - sent)
+                    if response.status_code != 200:
+                        recorder.errors += 1
+                except httpx.HTTPError:
+                    recorder.errors += 1
+
+        started = time.perf_counter()
+        workers = [bidder(token) for token in tokens]
+        if args.chat_rate > 0 and tokens:
+            workers.append(chatter())
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+        # Give the last broadcasts time to arrive
+        await asyncio.sleep(args.drain)
+        stop.set()
+        await asyncio.gather(*listeners)
+        await client.post(f"/api/auctions/{auction_id}/end", headers=admin)
+
+    expected = recorder.accepted * sockets
+    return {
+        "benchmark": "live_auction",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "bidders": args.bidders,
+            "watchers": args.watchers,
+            "duration_s": args.duration,
+            "think_ms": args.think_ms,
+            "chat_rate": args.chat_rate,
+            "encoding": args.encoding,
+            "workers": args.workers,
+        },
+        "bids": {
+            "sent": recorder.accepted + recorder.rejected + recorder.errors,
+            "accepted": recorder.accepted,
+            "rejected": recorder.rejected,
+            "errors": recorder.errors,
+            "accepted_per_s": round(recorder.accepted / elapsed, 2),
+            "http_ms": percentiles(recorder.bid_http),
+        },
+        "broadcast": {
+            "sockets": sockets,
+            "frames_received": recorder.frames,
+            "deliveries_per_s": round(len(recorder.bid_latency) / elapsed, 2),
+            # Accepted bids not seen by a socket; a slow socket may legitimately skip superseded prices
+            "missed": max(0, expected - len(recorder.bid_latency)),
+            "bid_to_broadcast_ms": percentiles(recorder.bid_latency),
+        },
+        "chat": {
+            "sent": recorder.chats,
+            "http_ms": percentiles(recorder.chat_http),
+            "chat_to_broadcast_ms": percentiles(recorder.chat_latency),
+        },
+        "dropped_sockets": recorder.dropped_sockets,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Metrics that got worse than baseline by more than tolerance (a fraction)"""
+    checks = (
+        ("bids.accepted_per_s", True),
+        ("bids.http_ms.p99", False),
+        ("broadcast.bid_to_broadcast_ms.p50", False),
+        ("broadcast.bid_to_broadcast_ms.p99", False),
+        ("chat.chat_to_broadcast_ms.p99", False),
+    )
+    regressions = []
+    for path, higher_is_better in checks:
+        current, previous = result, baseline
+        for key in path.split("."):
+            current, previous = (current or {}).get(key), (previous or {}).get(key)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{path}: {previous} -> {current} ({change:+.0%})")
+    return regressions
+
+
+def _start_server(args) -> subprocess.Popen:
+    port = _free_port()
+    args.url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"{args.url}/api/health", timeout=1).raise_for_status()
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                raise RuntimeError("API server exited during startup")
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("API server did not become healthy")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="measure an already running API instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when starting the API")
+    parser.add_argument("--bidders", type=int, default=20)
+    parser.add_argument("--watchers", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10, help="seconds of bidding")
+    parser.add_argument("--think-ms", type=float, default=50, help="pause between a bidder's bids")
+    parser.add_argument("--chat-rate", type=float, default=5, help="chat messages per second, 0 for none")
+    parser.add_argument("--encoding", choices=("json", "msgpack"), default="json")
+    parser.add_argument("--start-price", type=float, default=100)
+    parser.add_argument("--increment", type=float, default=1)
+    parser.add_argument("--drain", type=float, default=2, help="seconds to wait for late broadcasts")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    parser.add_argument("--compare", help="earlier result to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown as a fraction")
+    args = parser.parse_args()
+
+    server = None if args.url else _start_server(args)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
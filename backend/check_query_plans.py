@@ -0,0 +1,118 @@
+"""
+Query Plan Check
+Flags hot-path queries that PostgreSQL can only answer with a sequential scan.
+
+Run from the backend directory after `alembic upgrade head`:
+    python check_query_plans.py
+
+Sequential scans are disabled for the check, so the planner falls back to one
+only when no index fits; small tables therefore do not cause false alarms.
+Exits with status 1 if any query needs a sequential scan.
+"""
+
+import json
+import sys
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select, text, tuple_
+
+from database.database import engine
+from database import models
+from database.bid_store import ACCEPT_BID_SQL, CLEAR_WINNER_SQL, RAISE_PRICE_SQL
+
+SAMPLE_ID = uuid.uuid4()
+SAMPLE_TIME = datetime(2030, 1, 1)
+
+# One entry per query shape issued by the routers
+HOT_QUERIES = {
+    "auctions: list": select(models.Auction)
+        .order_by(models.Auction.auction_date.desc(), models.Auction.id.desc()).limit(100),
+    "auctions: list by status": select(models.Auction)
+        .where(models.Auction.status == "live")
+        .order_by(models.Auction.auction_date.desc(), models.Auction.id.desc()).limit(100),
+    "auctions: list by status, next page": select(models.Auction)
+        .where(models.Auction.status == "live",
+               tuple_(models.Auction.auction_date, models.Auction.id) < (SAMPLE_TIME, SAMPLE_ID))
+        .order_by(models.Auction.auction_date.desc(), models.Auction.id.desc()).limit(100),
+    "auctions: scheduler timers": select(models.Auction.id, models.Auction.status,
+                                         models.Auction.auction_date, models.Auction.ends_at)
+        .where(models.Auction.status.in_(("scheduled", "live"))),
+    "auctions: by id": select(models.Auction).where(models.Auction.id == SAMPLE_ID),
+    "bids: page": select(models.Bid)
+        .where(models.Bid.auction_id == SAMPLE_ID,
+               tuple_(models.Bid.timestamp, models.Bid.id) < (SAMPLE_TIME, SAMPLE_ID))
+        .order_by(models.Bid.timestamp.desc(), models.Bid.id.desc()).limit(100),
+    "bids: export": select(models.Bid)
+        .where(models.Bid.auction_id == SAMPLE_ID)
+        .order_by(models.Bid.timestamp, models.Bid.id),
+    "bids: leading bid": select(models.Bid.id)
+        .where(models.Bid.auction_id == SAMPLE_ID, models.Bid.is_winning == True),
+    "bids: count": select(func.count(models.Bid.id)).where(models.Bid.auction_id == SAMPLE_ID),
+    "bids: accept": ACCEPT_BID_SQL.bindparams(
+        id=SAMPLE_ID, auction_id=SAMPLE_ID, user_id=SAMPLE_ID, amount=Decimal("1.00"),
+        type="online", bidder_name="x", bidder_number=None, timestamp=SAMPLE_TIME
+    ),
+    "bids: clear winner": CLEAR_WINNER_SQL.bindparams(auction_id=SAMPLE_ID, id=SAMPLE_ID),
+    "bids: raise price": RAISE_PRICE_SQL.bindparams(
+        auction_id=SAMPLE_ID, amount=Decimal("1.00"), floor_amount=Decimal("1.00")
+    ),
+    "proxy bids: by auction": select(models.ProxyBid.user_id, models.ProxyBid.max_amount, models.ProxyBid.max_set_at)
+        .where(models.ProxyBid.auction_id == SAMPLE_ID),
+    "proxy bids: auction and user": select(models.ProxyBid)
+        .where(models.ProxyBid.auction_id == SAMPLE_ID, models.ProxyBid.user_id == SAMPLE_ID),
+    "chat: page": select(models.ChatMessage)
+        .where(models.ChatMessage.auction_id == SAMPLE_ID,
+               tuple_(models.ChatMessage.created_at, models.ChatMessage.id) < (SAMPLE_TIME, SAMPLE_ID))
+        .order_by(models.ChatMessage.created_at.desc(), models.ChatMessage.id.desc()).limit(50),
+    "chat: export": select(models.ChatMessage)
+        .where(models.ChatMessage.auction_id == SAMPLE_ID)
+        .order_by(models.ChatMessage.created_at, models.ChatMessage.id),
+    "registrations: by auction": select(models.Registration)
+        .where(models.Registration.auction_id == SAMPLE_ID),
+    "registrations: by user": select(models.Registration)
+        .where(models.Registration.user_id == SAMPLE_ID),
+    "registrations: auction and user": select(models.Registration)
+        .where(models.Registration.auction_id == SAMPLE_ID, models.Registration.user_id == SAMPLE_ID),
+    "users: by id": select(models.User).where(models.User.id == SAMPLE_ID),
+    "users: by email": select(models.User).where(models.User.email == "x@example.com"),
+    "users: names": select(models.User.id, models.User.name).where(models.User.id.in_([SAMPLE_ID])),
+}
+
+
+def _seq_scans(plan: dict):
+    """Tables read by Seq Scan nodes anywhere in a plan tree"""
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name")
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+def check() -> int:
+    if engine.dialect.name != "postgresql":
+        print("Query plan check needs PostgreSQL")
+        return 1
+
+    failures = 0
+    with engine.connect() as conn:
+        for name, statement in HOT_QUERIES.items():
+            sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            with conn.begin():
+                conn.execute(text("SET LOCAL enable_seqscan = off"))
+                plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            tables = sorted(set(_seq_scans(plan[0]["Plan"])))
+            if tables:
+                failures += 1
+                print(f"SEQ SCAN  {name}: {', '.join(tables)}")
+            else:
+                print(f"ok        {name}")
+
+    print(f"{failures} of {len(HOT_QUERIES)} queries need a sequential scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(check())
@@ -0,0 +1,161 @@
+"""
+Bid Persistence
+Atomic compare-and-swap acceptance of bids
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import text, bindparam, insert, update, DateTime, DECIMAL, String, Uuid
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import models
+
+# One statement per bid: raise the auction price only if the bid still beats it,
+# and insert the bid. The insert is gated on the guarded UPDATE, so a bid that
+# lost the race leaves no trace and returns no row.
+ACCEPT_BID_SQL = text("""
+    WITH raised AS (
+        UPDATE auctions
+        SET current_price = :amount,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = :auction_id
+          AND status = 'live'
+          AND current_price < :amount
+        RETURNING id
+    )
+    INSERT INTO bids (id, auction_id, user_id, amount, type, bidder_name, bidder_number, timestamp, is_winning)
+    SELECT :id, raised.id, :user_id, :amount, :type, :bidder_name, :bidder_number, :timestamp, TRUE
+    FROM raised
+    RETURNING id, timestamp
+""").bindparams(
+    bindparam("id", type_=Uuid),
+    bindparam("auction_id", type_=Uuid),
+    bindparam("user_id", type_=Uuid),
+    bindparam("amount", type_=DECIMAL(15, 2)),
+    bindparam("type", type_=String),
+    bindparam("bidder_name", type_=String),
+    bindparam("bidder_number", type_=String),
+    bindparam("timestamp", type_=DateTime),
+).columns(
+    id=Uuid,
+    timestamp=DateTime,
+)
+
+# Moves the winning flag off every other bid once a bid is in. This must be a
+# separate statement: a CTE reads the snapshot taken when its statement began,
+# so it would miss a winner committed while the raise waited on the row lock.
+# A new statement sees it under READ COMMITTED, and the locked auctions row
+# keeps other bids for the lot out until this transaction ends.
+CLEAR_WINNER_SQL = text("""
+    UPDATE bids
+    SET is_winning = FALSE
+    WHERE auction_id = :auction_id
+      AND is_winning = TRUE
+      AND id <> :id
+""").bindparams(
+    bindparam("auction_id", type_=Uuid),
+    bindparam("id", type_=Uuid),
+)
+
+# Group commit of several in-order bids for one auction: a single guarded price
+# raise covers the whole batch, then the bids go in as one multi-row insert.
+RAISE_PRICE_SQL = text("""
+    UPDATE auctions
+    SET current_price = :amount,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = :auction_id
+      AND status = 'live'
+      AND current_price < :floor_amount
+    RETURNING id
+""").bindparams(
+    bindparam("auction_id", type_=Uuid),
+    bindparam("amount", type_=DECIMAL(15, 2)),
+    bindparam("floor_amount", type_=DECIMAL(15, 2)),
+)
+
+
+def _bid_values(bid) -> dict:
+    return {
+        "id": bid.id,
+        "auction_id": UUID(str(bid.auction_id)),
+        "user_id": bid.user_id,
+        "amount": bid.amount,
+        "type": bid.type,
+        "bidder_name": bid.bidder_name,
+        "bidder_number": bid.bidder_number,
+        "timestamp": bid.timestamp,
+    }
+
+
+async def accept_bid(db: AsyncSession, bid) -> Optional[datetime]:
+    """
+    Persist an accepted bid: one statement for the guarded raise and insert,
+    one to move the winning flag if it went in.
+
+    Returns the stored timestamp, or None when the auction is no longer live
+    or another worker has already moved the price to or past this amount.
+    The caller owns the transaction.
+    """
+    if db.bind.dialect.name != "postgresql":
+        # Data-modifying CTEs are PostgreSQL only; local SQLite runs take the
+        # multi-statement path inside the caller's transaction instead
+        return (await _insert_raised(db, [bid]))[0]
+
+    values = _bid_values(bid)
+    row = (await db.execute(ACCEPT_BID_SQL, values)).first()
+    if row is None:
+        return None
+    await db.execute(CLEAR_WINNER_SQL, {"auction_id": values["auction_id"], "id": bid.id})
+    return row.timestamp
+
+
+async def accept_bid_batch(db: AsyncSession, bids: list) -> List[Optional[datetime]]:
+    """
+    Persist bids for one auction, already ordered by the bid engine.
+
+    Returns one timestamp (or None for a lost race) per bid, in order. When
+    another worker has moved the price into the middle of the batch, or the
+    amounts are not strictly increasing (e.g. bids requeued after an engine
+    reload), falls back to per-bid compare-and-swap so each bid gets its own
+    verdict.
+    """
+    if len(bids) == 1:
+        return [await accept_bid(db, bids[0])]
+
+    if any(later.amount <= earlier.amount for earlier, later in zip(bids, bids[1:])):
+        return [await accept_bid(db, bid) for bid in bids]
+
+    outcome = await _insert_raised(db, bids)
+    if outcome[0] is None:
+        return [await accept_bid(db, bid) for bid in bids]
+    return outcome
+
+
+async def _insert_raised(db: AsyncSession, bids: list) -> List[Optional[datetime]]:
+    """
+    Guarded price raise covering all bids, then the winning flag move and a
+    multi-row insert. The amounts must be strictly increasing: the first one
+    is the floor the price must be under, the last one wins.
+    """
+    auction_id = UUID(str(bids[0].auction_id))
+    raised = (await db.execute(RAISE_PRICE_SQL, {
+        "auction_id": auction_id,
+        "amount": bids[-1].amount,
+        "floor_amount": bids[0].amount,
+    })).first()
+
+    if raised is None:
+        return [None] * len(bids)
+
+    await db.execute(
+        update(models.Bid)
+        .where(models.Bid.auction_id == auction_id, models.Bid.is_winning == True)
+        .values(is_winning=False)
+    )
+    await db.execute(insert(models.Bid), [
+        dict(_bid_values(bid), is_winning=bid is bids[-1])
+        for bid in bids
+    ])
+    return [bid.timestamp for bid in bids]
@@ -2,8 +2,7 @@
 SQLAlchemy Database Models
 """
 
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, DECIMAL, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, DECIMAL, UniqueConstraint, Uuid, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -13,7 +12,7 @@ from database.database import Base
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     email = Column(String(255), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
     name = Column(String(255), nullable=False)
@@ -31,7 +30,7 @@ class User(Base):
 class Auction(Base):
     __tablename__ = "auctions"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     title = Column(String(255), nullable=False)
     description = Column(Text)
     image_url = Column(String(500))
@@ -39,24 +38,33 @@ class Auction(Base):
     starting_price = Column(DECIMAL(15, 2), nullable=False)
     current_price = Column(DECIMAL(15, 2), nullable=False)
     auction_date = Column(DateTime, nullable=False)
+    # When the scheduler closes the live auction; late bids push it back
+    ends_at = Column(DateTime)
     status = Column(String(50), nullable=False, default="scheduled")
     location = Column(String(255))
-    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    created_by = Column(Uuid, ForeignKey("users.id"))
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+    # Indexes are created by migrations/versions; keep these in sync
+    __table_args__ = (
+        Index("ix_auctions_status_date", "status", "auction_date", "id"),
+        Index("ix_auctions_date", "auction_date", "id"),
+    )
+
     # Relationships
     creator = relationship("User", back_populates="auctions_created")
     registrations = relationship("Registration", back_populates="auction", cascade="all, delete-orphan")
     bids = relationship("Bid", back_populates="auction", cascade="all, delete-orphan")
+    proxy_bids = relationship("ProxyBid", back_populates="auction", cascade="all, delete-orphan")
     chat_messages = relationship("ChatMessage", back_populates="auction", cascade="all, delete-orphan")
 
 class Registration(Base):
     __tablename__ = "registrations"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    auction_id = Column(UUID(as_uuid=True), ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    auction_id = Column(Uuid, ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     type = Column(String(50), nullable=False)  # 'online' or 'onfield'
     status = Column(String(50), nullable=False, default="registered")
     bidder_number = Column(String(50))
@@ -66,14 +74,17 @@ class Registration(Base):
     auction = relationship("Auction", back_populates="registrations")
     user = relationship("User", back_populates="registrations")
 
-    __table_args__ = (UniqueConstraint('auction_id', 'user_id', name='unique_auction_user'),)
+    __table_args__ = (
+        UniqueConstraint('auction_id', 'user_id', name='unique_auction_user'),
+        Index("ix_registrations_user", "user_id"),
+    )
 
 class Bid(Base):
     __tablename__ = "bids"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    auction_id = Column(UUID(as_uuid=True), ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    auction_id = Column(Uuid, ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     amount = Column(DECIMAL(15, 2), nullable=False)
     type = Column(String(50), nullable=False)  # 'online' or 'floor'
     bidder_name = Column(String(255), nullable=False)
@@ -81,20 +92,50 @@ class Bid(Base):
     timestamp = Column(DateTime, server_default=func.now())
     is_winning = Column(Boolean, default=False)
 
+    __table_args__ = (
+        Index("ix_bids_auction_timestamp", "auction_id", "timestamp", "id"),
+        Index("ix_bids_auction_winning", "auction_id",
+              postgresql_where=text("is_winning"), sqlite_where=text("is_winning")),
+    )
+
     # Relationships
     auction = relationship("Auction", back_populates="bids")
     user = relationship("User", back_populates="bids")
 
+class ProxyBid(Base):
+    __tablename__ = "proxy_bids"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    auction_id = Column(Uuid, ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    max_amount = Column(DECIMAL(15, 2), nullable=False)
+    # When the bid engine accepted this amount; breaks ties between equal maximums
+    max_set_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("auction_id", "user_id", name="unique_proxy_auction_user"),
+    )
+
+    # Relationships
+    auction = relationship("Auction", back_populates="proxy_bids")
+    user = relationship("User")
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    auction_id = Column(UUID(as_uuid=True), ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    auction_id = Column(Uuid, ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     message = Column(Text, nullable=False)
     is_admin_message = Column(Boolean, default=False)
     created_at = Column(DateTime, server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_chat_messages_auction_created", "auction_id", "created_at", "id"),
+    )
+
     # Relationships
     auction = relationship("Auction", back_populates="chat_messages")
     user = relationship("User", foreign_keys=[user_id])
@@ -0,0 +1,125 @@
+"""
+Connection Pool Instrumentation
+Live statistics for the async engine's connection pool
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the checkout wait-time histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    """Counters fed by pool events; cheap enough to leave on in production"""
+
+    def __init__(self, long_checkout_seconds: float):
+        self.long_checkout_seconds = long_checkout_seconds
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self.wait_count = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.long_checkouts = 0
+        # id(connection record) -> (checkout time, already reported)
+        self._held: Dict[int, tuple] = {}
+        self.pool = None
+
+    def record_wait(self, seconds: float):
+        self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+        self.wait_sum += seconds
+        self.wait_count += 1
+
+    def attach(self, pool):
+        """Listen to checkout/checkin on an engine's pool"""
+        self.pool = pool
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        if self.pool is not None and self.pool.checkedout() > self.pool.size():
+            self.overflow_checkouts += 1
+        self._held[id(connection_record)] = (time.monotonic(), False)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        held = self._held.pop(id(connection_record), None)
+        if held is None:
+            return
+        seconds = time.monotonic() - held[0]
+        if seconds > self.long_checkout_seconds and not held[1]:
+            self.long_checkouts += 1
+            logger.warning("Connection returned after being checked out for %.1fs", seconds)
+
+    def report_long_checkouts(self):
+        """Log connections that are still checked out past the threshold (once each)"""
+        now = time.monotonic()
+        for key, (started, reported) in list(self._held.items()):
+            if not reported and now - started > self.long_checkout_seconds:
+                self._held[key] = (started, True)
+                self.long_checkouts += 1
+                logger.warning("Connection still checked out after %.1fs", now - started)
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        cumulative, buckets = 0, {}
+        for bound, count in zip(WAIT_BUCKETS + (float("inf"),), self.wait_buckets):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {
+            "size": pool.size() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "checked_in": pool.checkedin() if pool is not None else 0,
+            "overflow": pool.overflow() if pool is not None else 0,
+            "overflow_checkouts": self.overflow_checkouts,
+            "timeouts": self.timeouts,
+            "long_checkouts": self.long_checkouts,
+            "wait_seconds": {
+                "buckets": buckets,
+                "sum": self.wait_sum,
+                "count": self.wait_count,
+            },
+        }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that times how long callers wait for a connection"""
+
+    stats: PoolStats = None
+
+    def recreate(self):
+        # Keep reporting into the same stats when the engine swaps the pool out
+        # (event listeners are carried over by the base class)
+        pool = super().recreate()
+        pool.stats = self.stats
+        if self.stats is not None:
+            self.stats.pool = pool
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            if self.stats is not None:
+                self.stats.timeouts += 1
+            raise
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start)
+
+
+async def watch_long_checkouts(stats: PoolStats):
+    """Background task that logs connections held past the threshold"""
+    interval = max(stats.long_checkout_seconds / 2, 0.5)
+    while True:
+        await asyncio.sleep(interval)
+        stats.report_long_checkouts()
@@ -1,5 +1,6 @@
 -- Live Auction System Database Schema
 -- PostgreSQL Database Schema
+-- Reference only: databases are created and upgraded with `alembic upgrade head`
 
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
@@ -27,6 +28,7 @@ CREATE TABLE auctions (
     starting_price DECIMAL(15, 2) NOT NULL,
     current_price DECIMAL(15, 2) NOT NULL,
     auction_date TIMESTAMP NOT NULL,
+    ends_at TIMESTAMP,
     status VARCHAR(50) NOT NULL DEFAULT 'scheduled', -- 'scheduled', 'live', 'completed'
     location VARCHAR(255),
     created_by UUID REFERENCES users(id),
@@ -59,6 +61,18 @@ CREATE TABLE bids (
     is_winning BOOLEAN DEFAULT FALSE
 );
 
+-- Proxy Bids Table (hidden maximums; the bids they place go into bids)
+CREATE TABLE proxy_bids (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    auction_id UUID NOT NULL REFERENCES auctions(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    max_amount DECIMAL(15, 2) NOT NULL,
+    max_set_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT unique_proxy_auction_user UNIQUE(auction_id, user_id)
+);
+
 -- Chat Messages Table
 CREATE TABLE chat_messages (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -69,14 +83,13 @@ CREATE TABLE chat_messages (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Indexes for performance
-CREATE INDEX idx_auctions_status ON auctions(status);
-CREATE INDEX idx_auctions_auction_date ON auctions(auction_date);
-CREATE INDEX idx_registrations_auction_id ON registrations(auction_id);
-CREATE INDEX idx_registrations_user_id ON registrations(user_id);
-CREATE INDEX idx_bids_auction_id ON bids(auction_id);
-CREATE INDEX idx_bids_timestamp ON bids(timestamp DESC);
-CREATE INDEX idx_chat_auction_id ON chat_messages(auction_id);
+-- Indexes for performance (kept in sync with migrations/versions/0003_hot_path_indexes.py)
+CREATE INDEX ix_auctions_status_date ON auctions(status, auction_date, id);
+CREATE INDEX ix_auctions_date ON auctions(auction_date, id);
+CREATE INDEX ix_registrations_user ON registrations(user_id);
+CREATE INDEX ix_bids_auction_timestamp ON bids(auction_id, timestamp, id);
+CREATE INDEX ix_bids_auction_winning ON bids(auction_id) WHERE is_winning;
+CREATE INDEX ix_chat_messages_auction_created ON chat_messages(auction_id, created_at, id);
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -94,31 +107,5 @@ CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users
 CREATE TRIGGER update_auctions_updated_at BEFORE UPDATE ON auctions
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- Function to update current_price when new bid is placed
-CREATE OR REPLACE FUNCTION update_auction_price()
-RETURNS TRIGGER AS $$
-BEGIN
-    UPDATE auctions
-    SET current_price = NEW.amount,
-        updated_at = CURRENT_TIMESTAMP
-    WHERE id = NEW.auction_id
-    AND NEW.amount > current_price;
-    
-    -- Mark previous winning bid as false
-    UPDATE bids
-    SET is_winning = FALSE
-    WHERE auction_id = NEW.auction_id
-    AND is_winning = TRUE;
-    
-    -- Mark new bid as winning
-    UPDATE bids
-    SET is_winning = TRUE
-    WHERE id = NEW.id;
-    
-    RETURN NEW;
-END;
-$$ language 'plpgsql';
-
--- Trigger for bid updates
-CREATE TRIGGER update_price_on_bid AFTER INSERT ON bids
-    FOR EACH ROW EXECUTE FUNCTION update_auction_price();
+-- Bid acceptance (price update and winning flag) is done in a single guarded
+-- statement by the application, see database/bid_store.py
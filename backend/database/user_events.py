@@ -0,0 +1,100 @@
+"""
+User Change Notifications
+Tells every API process when a user's role or active flag changes
+"""
+
+import asyncio
+import logging
+from typing import Callable, List
+from uuid import UUID
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL NOTIFY channel carrying the id of a changed user
+USER_CHANGED_CHANNEL = "user_changed"
+
+# Attributes of users rows that affect authorization and must not be served from a cache
+USERS_TABLE = "users"
+WATCHED_ATTRIBUTES = ("role", "is_active")
+
+_local_listeners: List[Callable[[UUID], None]] = []
+
+
+def on_user_changed(callback: Callable[[UUID], None]):
+    """Register a callback run with the user id after a committed change (any process)"""
+    _local_listeners.append(callback)
+
+
+def _notify_local(user_id: UUID):
+    for callback in _local_listeners:
+        callback(user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    changed = session.info.setdefault("changed_user_ids", set())
+    for obj in session.dirty:
+        # Compare by table so scripts importing models under another package path are covered too
+        if getattr(obj, "__tablename__", None) != USERS_TABLE:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in WATCHED_ATTRIBUTES):
+            changed.add(obj.id)
+            if session.bind is not None and session.bind.dialect.name == "postgresql":
+                # Delivered to listeners only when this transaction commits
+                session.connection().execute(
+                    text("SELECT pg_notify(:channel, :user_id)"),
+                    {"channel": USER_CHANGED_CHANNEL, "user_id": str(obj.id)}
+                )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_user_changes(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        _notify_local(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop("changed_user_ids", None)
+
+
+async def listen_for_user_changes(database_url: str, on_reconnect: Callable[[], None] = None,
+                                  retry_seconds: float = 5.0):
+    """
+    Relay NOTIFY messages from other processes (e.g. promote_admin.py) to the
+    local callbacks. Runs until cancelled; PostgreSQL only. Notifications sent
+    while disconnected are lost, so on_reconnect should drop cached state.
+    """
+    import asyncpg
+
+    dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+    def relay(connection, pid, channel, payload):
+        try:
+            _notify_local(UUID(payload))
+        except ValueError:
+            logger.warning("Ignoring malformed %s payload: %r", channel, payload)
+
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(USER_CHANGED_CHANNEL, relay)
+            if on_reconnect is not None:
+                on_reconnect()
+            # Block here until the connection drops
+            while not connection.is_closed():
+                await asyncio.sleep(retry_seconds)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("User change listener disconnected: %s", e)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(retry_seconds)
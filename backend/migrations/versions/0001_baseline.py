@@ -0,0 +1,102 @@
+"""Baseline schema
+
+Creates the tables as they were before migrations were introduced. Databases
+set up earlier (schema.sql or create_all) already have them and are left as is.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _missing(table: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade() -> None:
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("email", sa.String(255), nullable=False, unique=True),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("username", sa.String(100), unique=True),
+            sa.Column("role", sa.String(50), nullable=False),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("is_active", sa.Boolean()),
+        )
+
+    if _missing("auctions"):
+        op.create_table(
+            "auctions",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("title", sa.String(255), nullable=False),
+            sa.Column("description", sa.Text()),
+            sa.Column("image_url", sa.String(500)),
+            sa.Column("category", sa.String(100)),
+            sa.Column("starting_price", sa.DECIMAL(15, 2), nullable=False),
+            sa.Column("current_price", sa.DECIMAL(15, 2), nullable=False),
+            sa.Column("auction_date", sa.DateTime(), nullable=False),
+            sa.Column("status", sa.String(50), nullable=False),
+            sa.Column("location", sa.String(255)),
+            sa.Column("created_by", sa.Uuid(), sa.ForeignKey("users.id")),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+    if _missing("registrations"):
+        op.create_table(
+            "registrations",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("auction_id", sa.Uuid(), sa.ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("type", sa.String(50), nullable=False),
+            sa.Column("status", sa.String(50), nullable=False),
+            sa.Column("bidder_number", sa.String(50)),
+            sa.Column("registered_at", sa.DateTime(), server_default=sa.func.now()),
+            sa.UniqueConstraint("auction_id", "user_id", name="unique_auction_user"),
+        )
+
+    if _missing("bids"):
+        op.create_table(
+            "bids",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("auction_id", sa.Uuid(), sa.ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id", ondelete="SET NULL")),
+            sa.Column("amount", sa.DECIMAL(15, 2), nullable=False),
+            sa.Column("type", sa.String(50), nullable=False),
+            sa.Column("bidder_name", sa.String(255), nullable=False),
+            sa.Column("bidder_number", sa.String(50)),
+            sa.Column("timestamp", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("is_winning", sa.Boolean()),
+        )
+
+    if _missing("chat_messages"):
+        op.create_table(
+            "chat_messages",
+            sa.Column("id", sa.Uuid(), primary_key=True),
+            sa.Column("auction_id", sa.Uuid(), sa.ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id", ondelete="SET NULL")),
+            sa.Column("message", sa.Text(), nullable=False),
+            sa.Column("is_admin_message", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    for table in ("chat_messages", "bids", "registrations", "auctions", "users"):
+        op.drop_table(table)
@@ -0,0 +1,33 @@
+"""Drop the bid price trigger
+
+Databases created from the original schema.sql still run update_auction_price()
+after every bid insert. Bids are now accepted by one guarded statement in
+database/bid_store.py, and the trigger would race with it.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP TRIGGER IF EXISTS update_price_on_bid ON bids")
+    op.execute("DROP FUNCTION IF EXISTS update_auction_price()")
+
+
+def downgrade() -> None:
+    # The trigger conflicts with the application's bid acceptance; not restored
+    pass
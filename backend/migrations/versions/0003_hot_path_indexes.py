@@ -0,0 +1,74 @@
+"""Hot-path indexes
+
+Composite indexes matching the filters and sort orders of the routers, plus
+removal of the single-column indexes from schema.sql they supersede.
+
+On PostgreSQL every index is built and dropped CONCURRENTLY outside a
+transaction, so this can run against a live database without blocking
+writes. If a concurrent build fails it leaves an INVALID index behind:
+drop it by hand and run the upgrade again.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, partial index condition)
+INDEXES = (
+    # GET /api/auctions/?status=  ORDER BY auction_date DESC, id DESC
+    ("ix_auctions_status_date", "auctions", ["status", "auction_date", "id"], None),
+    # GET /api/auctions/  ORDER BY auction_date DESC, id DESC
+    ("ix_auctions_date", "auctions", ["auction_date", "id"], None),
+    # GET /api/bids/auction/{id}, bid counts  WHERE auction_id ORDER BY timestamp DESC, id DESC
+    ("ix_bids_auction_timestamp", "bids", ["auction_id", "timestamp", "id"], None),
+    # Leading bid lookup and the is_winning reset in bid_store.py
+    ("ix_bids_auction_winning", "bids", ["auction_id"], "is_winning"),
+    # GET /api/chat/{id}  WHERE auction_id ORDER BY created_at DESC, id DESC
+    ("ix_chat_messages_auction_created", "chat_messages", ["auction_id", "created_at", "id"], None),
+    # GET /api/registrations/user/{id}  (auction_id lookups use unique_auction_user)
+    ("ix_registrations_user", "registrations", ["user_id"], None),
+)
+
+# Created by schema.sql and covered by the indexes above
+LEGACY_INDEXES = (
+    ("idx_auctions_status", "auctions"),
+    ("idx_auctions_auction_date", "auctions"),
+    ("idx_registrations_auction_id", "registrations"),
+    ("idx_registrations_user_id", "registrations"),
+    ("idx_bids_auction_id", "bids"),
+    ("idx_bids_timestamp", "bids"),
+    ("idx_chat_auction_id", "chat_messages"),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            condition = sa.text(where) if where else None
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=condition,
+                sqlite_where=condition,
+            )
+        for name, table in LEGACY_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
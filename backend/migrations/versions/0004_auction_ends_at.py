@@ -0,0 +1,31 @@
+"""Auction end time
+
+Adds auctions.ends_at, the time the scheduler closes a live auction. Bids in
+the final seconds push it back (soft close). NULL means the auction stays
+open until an admin ends it.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("auctions", sa.Column("ends_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("auctions") as batch_op:
+        batch_op.drop_column("ends_at")
@@ -0,0 +1,39 @@
+"""Proxy bids
+
+Adds proxy_bids, one hidden maximum per bidder and auction. The bid engine
+bids on the bidder's behalf up to it; only the resulting bids go into bids.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "proxy_bids",
+        sa.Column("id", sa.Uuid(), primary_key=True),
+        sa.Column("auction_id", sa.Uuid(), sa.ForeignKey("auctions.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Uuid(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("max_amount", sa.DECIMAL(15, 2), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        # Also serves the per-auction load into the bid engine
+        sa.UniqueConstraint("auction_id", "user_id", name="unique_proxy_auction_user"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("proxy_bids")
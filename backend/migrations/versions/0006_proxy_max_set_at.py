@@ -0,0 +1,37 @@
+"""Proxy maximum set time
+
+Adds proxy_bids.max_set_at, when the bid engine accepted the current
+maximum. Equal maximums go to the one set first, so the time is stored
+rather than taken from the order rows happen to load in. Existing rows
+start from updated_at, the closest record there is.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("proxy_bids", sa.Column("max_set_at", sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE proxy_bids SET max_set_at = COALESCE(updated_at, created_at, CURRENT_TIMESTAMP)"
+    )
+    with op.batch_alter_table("proxy_bids") as batch_op:
+        batch_op.alter_column("max_set_at", existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("proxy_bids") as batch_op:
+        batch_op.drop_column("max_set_at")
@@ -3,6 +3,8 @@ import uuid
 from sqlalchemy.orm import Session
 from database.database import SessionLocal
 from database import models
+# Registers the hooks that tell running API workers to drop cached copies of changed users
+from database import user_events
 
 def promote_user(email):
     db: Session = SessionLocal()
@@ -0,0 +1,66 @@
+"""
+Test Setup
+Points the app at a throwaway database before any app module is imported
+"""
+
+import os
+import tempfile
+from decimal import Decimal
+from datetime import datetime
+
+# TEST_DATABASE_URL runs the suite against PostgreSQL instead (e.g. to cover
+# the single-statement CTE path); tables are created if they are missing
+os.environ["DATABASE_URL"] = (
+    os.environ.get("TEST_DATABASE_URL")
+    or f"sqlite:///{tempfile.mkdtemp(prefix='auction-tests-')}/test.db"
+)
+
+import pytest
+
+from database.database import Base, engine, async_engine, AsyncSessionLocal
+from database import models
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def tables():
+    Base.metadata.create_all(engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+async def db(tables):
+    async with AsyncSessionLocal() as session:
+        yield session
+    # Pooled connections belong to this test's event loop
+    await async_engine.dispose()
+
+
+@pytest.fixture
+async def user(db):
+    user = models.User(email=f"{os.urandom(6).hex()}@example.com", password_hash="x", name="Tester")
+    db.add(user)
+    await db.commit()
+    return user
+
+
+@pytest.fixture
+def make_auction(db, user):
+    async def make(price: str = "100.00", status: str = "live") -> models.Auction:
+        auction = models.Auction(
+            title="Lot",
+            starting_price=Decimal(price),
+            current_price=Decimal(price),
+            auction_date=datetime.utcnow(),
+            status=status,
+            created_by=user.id
+        )
+        db.add(auction)
+        await db.commit()
+        return auction
+    return make
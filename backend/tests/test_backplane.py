@@ -0,0 +1,142 @@
+"""
+Backplane: room events and module messages reach the other worker over RESP
+"""
+
+import asyncio
+from typing import Dict, Set
+
+import pytest
+
+from api.backplane import Backplane, RedisBackplane, encode_command, read_reply
+from api.websocket_manager import ConnectionManager
+
+pytestmark = pytest.mark.anyio
+
+
+class PubSubServer:
+    """Just enough of the Redis protocol for SUBSCRIBE and PUBLISH"""
+
+    def __init__(self):
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.server = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"redis://{host}:{port}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                command = await read_reply(reader)
+                name = command[0].upper()
+                if name == b"SUBSCRIBE":
+                    self.channels.setdefault(command[1], set()).add(writer)
+                    writer.write(b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n" % (len(command[1]), command[1]))
+                elif name == b"PUBLISH":
+                    subscribers = self.channels.get(command[1], set())
+                    for subscriber in subscribers:
+                        subscriber.write(b"*3\r\n$7\r\nmessage\r\n$%d\r\n%s\r\n$%d\r\n%s\r\n" % (
+                            len(command[1]), command[1], len(command[2]), command[2]
+                        ))
+                    writer.write(b":%d\r\n" % len(subscribers))
+                else:
+                    writer.write(b"+OK\r\n")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in self.channels.values():
+                subscribers.discard(writer)
+            writer.close()
+
+
+@pytest.fixture
+async def workers():
+    server = PubSubServer()
+    url = await server.start()
+    managers = []
+    for _ in range(2):
+        manager = ConnectionManager(RedisBackplane(url))
+        connected = asyncio.Event()
+        manager.on_reconnect(connected.set)
+        await manager.start()
+        await asyncio.wait_for(connected.wait(), 5)
+        managers.append(manager)
+    yield managers
+    for manager in managers:
+        await manager.stop()
+    await server.stop()
+
+
+def test_backplane_is_abstract():
+    with pytest.raises(TypeError):
+        Backplane()
+
+
+def test_encode_command():
+    assert encode_command("PUBLISH", "ch", b"hi") == b"*3\r\n$7\r\nPUBLISH\r\n$2\r\nch\r\n$2\r\nhi\r\n"
+
+
+async def test_messages_reach_the_other_worker(workers):
+    first, second = workers
+    received = {0: [], 1: []}
+    got = asyncio.Event()
+
+    def handler(index):
+        def on_message(data):
+            received[index].append(data)
+            got.set()
+        return on_message
+
+    first.on_message("ping", handler(0))
+    second.on_message("ping", handler(1))
+
+    first.publish("ping", {"n": 1})
+    await asyncio.wait_for(got.wait(), 5)
+    # Give a stray echo to the publisher time to arrive
+    await asyncio.sleep(0.05)
+
+    assert received == {0: [], 1: [{"n": 1}]}
+
+
+async def test_room_events_reach_the_other_worker(workers, monkeypatch):
+    first, second = workers
+    delivered = asyncio.Queue()
+    monkeypatch.setattr(second, "_deliver", lambda *event: delivered.put_nowait(event))
+
+    first.broadcast("auction-1", "bidUpdated", {"newPrice": 110.0})
+
+    auction_id, message_type, data = await asyncio.wait_for(delivered.get(), 5)
+    assert (auction_id, message_type, data) == ("auction-1", "bidUpdated", {"newPrice": 110.0})
+
+
+async def test_publish_drops_once_the_server_stops_reading():
+    stalled = asyncio.Event()
+
+    async def never_read(reader, writer):
+        await stalled.wait()
+        writer.close()
+
+    server = await asyncio.start_server(never_read, "127.0.0.1", 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    backplane = RedisBackplane(f"redis://{host}:{port}", max_buffer=256 * 1024)
+    await backplane.start(lambda data: None)
+    await asyncio.wait_for(backplane._publisher_ready.wait(), 5)
+
+    payload = b"x" * 64 * 1024
+    for _ in range(1000):
+        backplane.publish(payload)
+
+    buffered = backplane._writer.transport.get_write_buffer_size()
+    stalled.set()
+    await backplane.stop()
+    server.close()
+    await server.wait_closed()
+
+    assert backplane.dropped > 0
+    # At most one frame past the cap is ever buffered
+    assert buffered < 256 * 1024 + len(payload) + 64
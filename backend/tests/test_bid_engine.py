@@ -0,0 +1,114 @@
+"""
+Bid engine: single-writer ordering and rejections
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from api.bid_engine import AcceptedBid, BidEngine, BidRejected, SOFT_CLOSE_EXTENSION
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def engine():
+    engine = BidEngine()
+    yield engine
+    for auction_id in list(engine._states):
+        engine.close(auction_id)
+
+
+def _bid(amount: str, auction_id: str = "a") -> AcceptedBid:
+    return AcceptedBid(auction_id, Decimal(amount), "online", "Tester")
+
+
+async def test_bids_are_decided_in_arrival_order(engine):
+    engine.open("a", Decimal("100.00"))
+
+    bids = [_bid("110"), _bid("105"), _bid("120"), _bid("120")]
+    results = await asyncio.gather(*(engine.submit(bid) for bid in bids), return_exceptions=True)
+
+    assert results[0] is bids[0] and results[2] is bids[2]
+    assert isinstance(results[1], BidRejected) and results[1].reason == "too_low"
+    assert isinstance(results[3], BidRejected) and results[3].reason == "too_low"
+    assert bids[0].previous_price == Decimal("100.00")
+    assert bids[2].previous_price == Decimal("110.00")
+    assert bids[2].previous_bid_id == bids[0].id
+
+    state = engine.get_state("a")
+    assert state.current_price == Decimal("120.00")
+    assert state.leading_bid_id == bids[2].id
+    assert state.bid_count == 2
+
+
+async def test_auctions_are_ordered_independently(engine):
+    engine.open("a", Decimal("100.00"))
+    engine.open("b", Decimal("500.00"))
+
+    a, b = await asyncio.gather(engine.submit(_bid("150", "a")), engine.submit(_bid("550", "b")))
+
+    assert a.previous_price == Decimal("100.00")
+    assert b.previous_price == Decimal("500.00")
+
+
+async def test_amounts_are_quantized_to_cents(engine):
+    engine.open("a", Decimal("100.00"))
+
+    with pytest.raises(BidRejected):
+        await engine.submit(_bid("100.004"))
+    assert (await engine.submit(_bid("100.009"))).amount == Decimal("100.01")
+
+
+async def test_rejects_bids_for_auctions_not_loaded(engine):
+    with pytest.raises(BidRejected) as e:
+        await engine.submit(_bid("110"))
+    assert e.value.reason == "not_live"
+
+
+async def test_close_rejects_queued_bids(engine):
+    engine.open("a", Decimal("100.00"))
+    pending = [asyncio.ensure_future(engine.submit(_bid(amount))) for amount in ("110", "120")]
+    # Both are queued; the writer has not run yet
+    await asyncio.sleep(0)
+
+    engine.close("a")
+
+    for future in pending:
+        with pytest.raises(BidRejected) as e:
+            await future
+        assert e.value.reason == "not_live"
+    assert not engine.is_loaded("a")
+
+
+async def test_rejects_bids_after_ends_at(engine):
+    engine.open("a", Decimal("100.00"), ends_at=datetime.utcnow() - timedelta(seconds=1))
+
+    with pytest.raises(BidRejected) as e:
+        await engine.submit(_bid("110"))
+    assert e.value.detail == "Auction has ended"
+
+
+async def test_late_bid_extends_ends_at(engine):
+    ends_at = datetime.utcnow() + timedelta(seconds=1)
+    engine.open("a", Decimal("100.00"), ends_at=ends_at)
+
+    bid = await engine.submit(_bid("110"))
+
+    assert bid.extended_until == bid.timestamp + SOFT_CLOSE_EXTENSION
+    assert engine.get_state("a").ends_at == bid.extended_until
+
+
+async def test_observe_only_moves_the_price_up(engine):
+    engine.open("a", Decimal("100.00"))
+
+    engine.observe("a", "remote-1", Decimal("130.00"))
+    engine.observe("a", "remote-2", Decimal("120.00"))
+
+    state = engine.get_state("a")
+    assert state.current_price == Decimal("130.00")
+    assert state.leading_bid_id == "remote-1"
+    with pytest.raises(BidRejected):
+        await engine.submit(_bid("125"))
@@ -0,0 +1,135 @@
+"""
+Bid persistence: compare-and-swap acceptance and the batch fallback
+"""
+
+import asyncio
+import os
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from database import models
+from database.database import AsyncSessionLocal
+from database.bid_store import accept_bid, accept_bid_batch
+from api.bid_engine import AcceptedBid
+
+pytestmark = pytest.mark.anyio
+
+
+def _bid(auction: models.Auction, amount: str) -> AcceptedBid:
+    return AcceptedBid(str(auction.id), Decimal(amount), "online", "Tester")
+
+
+async def _price(db, auction: models.Auction) -> Decimal:
+    return await db.scalar(select(models.Auction.current_price).where(models.Auction.id == auction.id))
+
+
+async def _stored(db, auction: models.Auction) -> list:
+    rows = await db.execute(
+        select(models.Bid.amount, models.Bid.is_winning)
+        .where(models.Bid.auction_id == auction.id)
+        .order_by(models.Bid.amount)
+    )
+    return [(amount, is_winning) for amount, is_winning in rows]
+
+
+async def test_accept_bid_raises_price_and_moves_winner(db, make_auction):
+    auction = await make_auction("100.00")
+    first, second = _bid(auction, "110"), _bid(auction, "120")
+
+    async with db.begin():
+        assert await accept_bid(db, first) == first.timestamp
+        assert await accept_bid(db, second) == second.timestamp
+
+    assert await _price(db, auction) == Decimal("120.00")
+    assert await _stored(db, auction) == [(Decimal("110.00"), False), (Decimal("120.00"), True)]
+
+
+async def test_accept_bid_leaves_no_trace_when_outbid(db, make_auction):
+    auction = await make_auction("100.00")
+
+    async with db.begin():
+        assert await accept_bid(db, _bid(auction, "120")) is not None
+        assert await accept_bid(db, _bid(auction, "120")) is None
+        assert await accept_bid(db, _bid(auction, "115")) is None
+
+    assert await _price(db, auction) == Decimal("120.00")
+    assert await _stored(db, auction) == [(Decimal("120.00"), True)]
+
+
+async def test_accept_bid_refuses_auction_not_live(db, make_auction):
+    auction = await make_auction("100.00", status="completed")
+
+    async with db.begin():
+        assert await accept_bid(db, _bid(auction, "500")) is None
+
+    assert await _price(db, auction) == Decimal("100.00")
+    assert await _stored(db, auction) == []
+
+
+async def test_batch_is_written_with_one_raise(db, make_auction):
+    auction = await make_auction("100.00")
+    bids = [_bid(auction, amount) for amount in ("110", "120", "130")]
+
+    async with db.begin():
+        assert await accept_bid_batch(db, bids) == [bid.timestamp for bid in bids]
+
+    assert await _price(db, auction) == Decimal("130.00")
+    assert await _stored(db, auction) == [
+        (Decimal("110.00"), False), (Decimal("120.00"), False), (Decimal("130.00"), True)
+    ]
+
+
+async def test_batch_falls_back_when_outbid_midway(db, make_auction):
+    auction = await make_auction("100.00")
+    async with db.begin():
+        # Another worker already committed 115
+        await accept_bid(db, _bid(auction, "115"))
+
+    bids = [_bid(auction, amount) for amount in ("110", "120", "130")]
+    async with db.begin():
+        outcome = await accept_bid_batch(db, bids)
+
+    assert outcome == [None, bids[1].timestamp, bids[2].timestamp]
+    assert await _price(db, auction) == Decimal("130.00")
+    assert await _stored(db, auction) == [
+        (Decimal("115.00"), False), (Decimal("120.00"), False), (Decimal("130.00"), True)
+    ]
+
+
+async def test_batch_out_of_order_is_decided_per_bid(db, make_auction):
+    auction = await make_auction("100.00")
+    bids = [_bid(auction, amount) for amount in ("130", "120", "140")]
+
+    async with db.begin():
+        outcome = await accept_bid_batch(db, bids)
+
+    assert outcome == [bids[0].timestamp, None, bids[2].timestamp]
+    assert await _price(db, auction) == Decimal("140.00")
+    assert await _stored(db, auction) == [(Decimal("130.00"), False), (Decimal("140.00"), True)]
+
+
+@pytest.mark.skipif(
+    not os.environ["DATABASE_URL"].startswith("postgresql"),
+    reason="row locks and statement snapshots are PostgreSQL behaviour"
+)
+async def test_concurrent_accepts_leave_one_winner(db, make_auction):
+    auction = await make_auction("100.00")
+
+    async with AsyncSessionLocal() as first, AsyncSessionLocal() as second:
+        async def accept_second():
+            async with second.begin():
+                return await accept_bid(second, _bid(auction, "120"))
+
+        await first.begin()
+        assert await accept_bid(first, _bid(auction, "110")) is not None
+        # Waits on the auctions row the first transaction has locked
+        blocked = asyncio.ensure_future(accept_second())
+        await asyncio.sleep(0.2)
+        assert not blocked.done()
+        await first.commit()
+        assert await blocked is not None
+
+    assert await _price(db, auction) == Decimal("120.00")
+    assert await _stored(db, auction) == [(Decimal("110.00"), False), (Decimal("120.00"), True)]
@@ -0,0 +1,112 @@
+"""
+Auction catalog cache: ETags, invalidation on status and end-time changes, live overlay
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import httpx
+import pytest
+
+from database import models
+from api.bid_engine import bid_engine
+from api.catalog_cache import CatalogCache, CatalogPage, catalog_cache
+from api.main import app
+from api.scheduler import AuctionScheduler
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(db):
+    catalog_cache.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def _ids(response: httpx.Response) -> set:
+    return {auction["id"] for auction in response.json()}
+
+
+async def test_unchanged_catalog_is_not_modified(client, make_auction):
+    await make_auction(status="scheduled")
+
+    first = await client.get("/api/auctions/", params={"status": "scheduled"})
+    again = await client.get("/api/auctions/", params={"status": "scheduled"},
+                             headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.headers["etag"] == first.headers["etag"]
+
+
+async def test_scheduled_start_moves_auction_between_listings(client, make_auction):
+    auction = await make_auction(status="scheduled")
+    auction_id = str(auction.id)
+    scheduled = await client.get("/api/auctions/", params={"status": "scheduled"})
+    live = await client.get("/api/auctions/", params={"status": "live"})
+    assert auction_id in _ids(scheduled) and auction_id not in _ids(live)
+
+    await AuctionScheduler()._start(auction_id)
+
+    for listing, before, present in (("scheduled", scheduled, False), ("live", live, True)):
+        response = await client.get("/api/auctions/", params={"status": listing},
+                                    headers={"If-None-Match": before.headers["etag"]})
+        assert response.status_code == 200
+        assert response.headers["etag"] != before.headers["etag"]
+        assert (auction_id in _ids(response)) is present
+    bid_engine.close(auction_id)
+
+
+async def test_extended_close_changes_listing(client, make_auction):
+    auction = await make_auction(status="live")
+    auction_id = str(auction.id)
+    before = await client.get("/api/auctions/", params={"status": "live"})
+
+    ends_at = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=5)
+    await AuctionScheduler()._save_end(auction_id, ends_at)
+
+    after = await client.get("/api/auctions/", params={"status": "live"},
+                             headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    listed = next(item for item in after.json() if item["id"] == auction_id)
+    assert listed["ends_at"] == ends_at.isoformat()
+
+
+async def test_live_detail_overlays_engine_state(client, make_auction):
+    auction = await make_auction("100.00", status="live")
+    auction_id = str(auction.id)
+
+    first = (await client.get(f"/api/auctions/{auction_id}")).json()
+    # A bid committed on another worker moves this worker's engine, not the cached detail
+    bid_engine.observe(auction_id, "remote-bid", Decimal("150.00"))
+    second = (await client.get(f"/api/auctions/{auction_id}")).json()
+
+    assert Decimal(first["current_price"]) == Decimal("100.00")
+    assert Decimal(second["current_price"]) == Decimal("150.00")
+    assert second["bid_count"] == first["bid_count"] + 1
+    bid_engine.close(auction_id)
+
+
+def test_page_read_before_an_invalidation_is_not_stored():
+    cache = CatalogCache(maxsize=10, ttl=60, detail_maxsize=10, detail_ttl=60)
+    key = ("live", 0, 100, None)
+    generation = cache.generation
+
+    cache.invalidate("a")
+    cache.put(key, CatalogPage(b"[]", None, ("a",)), generation)
+
+    assert cache.get(key) is None
+
+
+def test_status_change_drops_listings_of_both_statuses():
+    cache = CatalogCache(maxsize=10, ttl=60, detail_maxsize=10, detail_ttl=60)
+    pages = {status: (status, 0, 100, None) for status in ("scheduled", "live", "completed", None)}
+    for key in pages.values():
+        cache.put(key, CatalogPage(b"[]", None, ()), cache.generation)
+
+    cache.invalidate("a", "live", "completed")
+
+    assert cache.get(pages["scheduled"]) is not None
+    assert all(cache.get(pages[status]) is None for status in ("live", "completed", None))
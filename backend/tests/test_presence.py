@@ -0,0 +1,73 @@
+"""
+Room presence: snapshots as of the last delta, and the deltas after them
+"""
+
+from api.presence import PRESENCE_COUNT, RoomPresence
+
+
+def test_snapshot_then_join_and_leave_deltas():
+    room = RoomPresence()
+    room.add("w:1", "ann", "Ann")
+    room.add("w:2", "bob", "Bob")
+    assert room.take_delta() == {
+        "version": 1, "count": 2,
+        "joined": [{"user_id": "ann", "user_name": "Ann"}, {"user_id": "bob", "user_name": "Bob"}],
+        "left": []
+    }
+    snapshot = room.snapshot()
+
+    room.add("w:3", "cy", "Cy")
+    room.remove("w:1")
+    # Nothing reported yet: joiners until the next delta share the same snapshot
+    assert room.snapshot() == snapshot
+    delta = room.take_delta()
+
+    assert delta == {"version": 2, "count": 2, "joined": [{"user_id": "cy", "user_name": "Cy"}], "left": ["ann"]}
+    assert snapshot["version"] + 1 == delta["version"]
+    assert room.snapshot()["participants"] == [
+        {"user_id": "bob", "user_name": "Bob"}, {"user_id": "cy", "user_name": "Cy"}
+    ]
+
+
+def test_user_is_reported_once_across_tabs():
+    room = RoomPresence()
+    room.add("w:1", "ann", "Ann")
+    room.take_delta()
+
+    room.add("w:2", "ann", "Ann")
+    assert room.take_delta() is None
+
+    room.remove("w:1")
+    assert room.take_delta() is None
+    room.remove("w:2")
+    assert room.take_delta()["left"] == ["ann"]
+
+
+def test_leave_and_return_within_one_interval_is_silent():
+    room = RoomPresence()
+    room.add("w:1", "ann", "Ann")
+    room.take_delta()
+
+    room.remove("w:1")
+    room.add("w:2", "ann", "Ann")
+
+    assert room.take_delta() is None
+
+
+def test_join_and_leave_within_one_interval_is_silent():
+    room = RoomPresence()
+    room.add("w:1", "ann", "Ann")
+    room.remove("w:1")
+
+    assert room.take_delta() is None
+
+
+def test_guests_only_change_the_count():
+    room = RoomPresence()
+    room.add("w:1", None, None)
+    room.add("w:2", None, None)
+
+    assert room.take_delta() == {"version": 1, "count": 2, "joined": [], "left": []}
+    assert room.snapshot(PRESENCE_COUNT) == {"version": 1, "count": 2}
+    room.remove("w:1")
+    assert room.take_delta()["count"] == 1
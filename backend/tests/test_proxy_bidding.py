@@ -0,0 +1,157 @@
+"""
+Proxy bidding: the maximum book and the single bid each decision places
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from api.bid_engine import (
+    AcceptedBid, BidEngine, BidRejected, PROXY_INCREMENT, ProxyBook, ProxyMaximum, bid_engine, load_auction_state
+)
+from database import models
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def engine():
+    engine = BidEngine()
+    engine.open("a", Decimal("100.00"))
+    yield engine
+    engine.close("a")
+
+
+def _proxy(user_id: str, max_amount: str, set_at: datetime = None) -> ProxyMaximum:
+    return ProxyMaximum(user_id, user_id.title(), Decimal(max_amount), set_at)
+
+
+def test_book_orders_by_maximum():
+    book = ProxyBook()
+    low, high, middle = _proxy("ann", "150"), _proxy("bob", "300"), _proxy("cy", "200")
+    for proxy in (low, high, middle):
+        book.put(proxy)
+
+    assert book.top_two() == (high, middle)
+
+
+def test_book_equal_maximums_earliest_first():
+    book = ProxyBook()
+    now = datetime.utcnow()
+    early, late = _proxy("cy", "200", now), _proxy("ann", "200", now + timedelta(seconds=1))
+    book.put(late)
+    book.put(early)
+
+    assert book.top_two() == (early, late)
+
+
+def test_book_keeps_one_maximum_per_bidder():
+    book = ProxyBook()
+    book.put(_proxy("ann", "200"))
+    book.put(_proxy("cy", "250"))
+    raised = _proxy("ann", "300")
+    book.put(raised)
+
+    assert len(book) == 2
+    assert book.get("ann") is raised
+    assert book.top_two()[0] is raised
+
+
+async def test_lone_maximum_bids_one_increment_over_the_price(engine):
+    bid = await engine.submit_proxy("a", _proxy("ann", "200"))
+
+    assert bid.amount == Decimal("100.00") + PROXY_INCREMENT
+    assert bid.user_id == "ann"
+    # Already leading with nobody competing: nothing more to place
+    assert await engine.submit_proxy("a", _proxy("ann", "250")) is None
+
+
+async def test_competing_maximums_settle_in_one_bid(engine):
+    await engine.submit_proxy("a", _proxy("ann", "200"))
+
+    # Cy's lower maximum makes Ann answer one increment over it
+    bid = await engine.submit_proxy("a", _proxy("cy", "150"))
+    assert (bid.user_id, bid.amount) == ("ann", Decimal("150.00") + PROXY_INCREMENT)
+
+    # Cy's higher maximum takes the lead one increment over Ann's
+    bid = await engine.submit_proxy("a", _proxy("cy", "300"))
+    assert (bid.user_id, bid.amount) == ("cy", Decimal("200.00") + PROXY_INCREMENT)
+
+
+async def test_increment_is_capped_at_the_maximum(engine):
+    await engine.submit_proxy("a", _proxy("ann", "200"))
+
+    bid = await engine.submit_proxy("a", _proxy("cy", "200.50"))
+    assert (bid.user_id, bid.amount) == ("cy", Decimal("200.50"))
+
+
+async def test_tied_maximum_goes_to_the_earlier_bidder(engine):
+    await engine.submit_proxy("a", _proxy("ann", "200"))
+
+    bid = await engine.submit_proxy("a", _proxy("cy", "200"))
+    assert (bid.user_id, bid.amount) == ("ann", Decimal("200.00"))
+    assert engine.get_state("a").leading_user_id == "ann"
+
+
+async def test_tie_survives_a_reload(engine):
+    await engine.submit_proxy("a", _proxy("cy", "200"))
+    await engine.submit_proxy("a", _proxy("ann", "200"))
+    stored = [engine.get_state("a").proxies.get(user_id) for user_id in ("ann", "cy")]
+
+    # Another worker, or this one after a restart, loads the maximums in any order
+    book = ProxyBook()
+    for proxy in stored:
+        book.put(ProxyMaximum(proxy.user_id, proxy.bidder_name, proxy.max_amount, proxy.set_at))
+
+    assert book.top_two()[0].user_id == engine.get_state("a").leading_user_id == "cy"
+
+
+async def test_manual_bid_is_answered_by_the_proxy(engine):
+    await engine.submit_proxy("a", _proxy("ann", "200"))
+
+    bid = await engine.submit(AcceptedBid("a", Decimal("150"), "online", "Bob", user_id="bob"))
+    assert (bid.proxy_response.user_id, bid.proxy_response.amount) == ("ann", Decimal("150.00") + PROXY_INCREMENT)
+    assert bid.proxy_response.previous_bid_id == bid.id
+
+    # A bid over the maximum is left standing
+    bid = await engine.submit(AcceptedBid("a", Decimal("250"), "online", "Bob", user_id="bob"))
+    assert bid.proxy_response is None
+    assert engine.get_state("a").current_price == Decimal("250.00")
+
+
+async def test_maximum_must_beat_price_and_previous_maximum(engine):
+    await engine.submit_proxy("a", _proxy("ann", "200"))
+
+    with pytest.raises(BidRejected) as e:
+        await engine.submit_proxy("a", _proxy("ann", "180"))
+    assert e.value.reason == "too_low"
+
+    with pytest.raises(BidRejected) as e:
+        await engine.submit_proxy("a", _proxy("cy", "100"))
+    assert e.value.detail == "Maximum must be higher than current price: $101.00"
+
+
+async def test_load_breaks_ties_by_when_the_maximum_was_set(db, user, make_auction):
+    auction = await make_auction()
+    rival = models.User(email=f"rival-{auction.id}@example.com", password_hash="x", name="Rival")
+    db.add(rival)
+    await db.commit()
+    now = datetime.utcnow()
+    # The rival set 200 first; the other row was touched more recently without
+    # changing its amount, so updated_at alone would point the wrong way
+    db.add_all([
+        models.ProxyBid(auction_id=auction.id, user_id=rival.id, max_amount=Decimal("200"),
+                        max_set_at=now - timedelta(minutes=5), updated_at=now),
+        models.ProxyBid(auction_id=auction.id, user_id=user.id, max_amount=Decimal("200"),
+                        max_set_at=now - timedelta(minutes=1), updated_at=now - timedelta(minutes=10)),
+    ])
+    await db.commit()
+
+    try:
+        state = await load_auction_state(db, auction)
+        top, runner = state.proxies.top_two()
+    finally:
+        bid_engine.close(str(auction.id))
+
+    assert (top.user_id, runner.user_id) == (rival.id, user.id)
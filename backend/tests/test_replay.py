@@ -0,0 +1,112 @@
+"""
+Room event replay: numbering, resuming from a cursor, and when a client must reload
+"""
+
+import json
+
+from api.config import WS_REPLAY_BUFFER_SIZE
+from api.replay import RoomHistory, parse_cursor
+from api.websocket_manager import ConnectionManager
+from api.ws_codec import ENCODING_JSON
+
+
+class RecordingConnection:
+    """Collects the frames a resume queues"""
+
+    encoding = ENCODING_JSON
+
+    def __init__(self):
+        self.frames = []
+
+    def send(self, message_type, frame, cursor=None):
+        self.frames.append(json.loads(frame))
+        return True
+
+
+def _history(events: int, size: int = 5) -> RoomHistory:
+    history = RoomHistory(size)
+    for n in range(1, events + 1):
+        history.append("bidUpdated", {"n": n})
+    return history
+
+
+def test_events_are_numbered_in_order():
+    history = _history(3)
+
+    assert history.seq == 3
+    assert [seq for seq, _, _ in history.events] == [1, 2, 3]
+
+
+def test_since_returns_only_missed_events():
+    history = _history(4)
+
+    assert history.since(4) == []
+    assert history.since(2) == [(3, "bidUpdated", {"n": 3}), (4, "bidUpdated", {"n": 4})]
+
+
+def test_since_a_cursor_older_than_the_buffer_is_none():
+    history = _history(8, size=5)
+
+    # Events 4..8 are kept: resuming after 3 works, after 2 misses event 3
+    assert [seq for seq, _, _ in history.since(3)] == [4, 5, 6, 7, 8]
+    assert history.since(2) is None
+
+
+def test_parse_cursor():
+    assert parse_cursor("abc:12") == ("abc", 12)
+    assert parse_cursor("abc:") is None
+    assert parse_cursor("12") is None
+    assert parse_cursor(None) is None
+
+
+def _resume(manager: ConnectionManager, since=None) -> list:
+    connection = RecordingConnection()
+    manager._resume(connection, "room", since)
+    return connection.frames
+
+
+def test_resume_replays_from_cursor():
+    manager = ConnectionManager()
+    history = manager._room_history("room")
+    for n in range(1, 4):
+        history.append("bidUpdated", {"n": n})
+
+    frames = _resume(manager, f"{history.epoch}:1")
+
+    assert [(frame["type"], frame.get("seq")) for frame in frames] == [
+        ("bidUpdated", 2), ("bidUpdated", 3), ("sync", None)
+    ]
+    assert frames[-1]["data"] == {"epoch": history.epoch, "seq": 3, "replayed": 2, "reload": False}
+
+
+def test_resume_with_another_epoch_reloads():
+    manager = ConnectionManager()
+    history = manager._room_history("room")
+    history.append("bidUpdated", {"n": 1})
+
+    frames = _resume(manager, "another-worker:1")
+
+    assert frames == [{"type": "sync", "data": {"epoch": history.epoch, "seq": 1, "replayed": 0, "reload": True}}]
+
+
+def test_resume_past_the_buffer_reloads():
+    manager = ConnectionManager()
+    history = manager._room_history("room")
+    for n in range(WS_REPLAY_BUFFER_SIZE + 2):
+        history.append("bidUpdated", {"n": n})
+
+    frames = _resume(manager, f"{history.epoch}:1")
+
+    assert [frame["type"] for frame in frames] == ["sync"]
+    assert frames[0]["data"]["reload"] is True
+
+
+def test_first_connect_neither_replays_nor_reloads():
+    manager = ConnectionManager()
+    manager._room_history("room").append("bidUpdated", {"n": 1})
+
+    frames = _resume(manager)
+
+    assert frames == [{"type": "sync", "data": {
+        "epoch": manager._room_history("room").epoch, "seq": 1, "replayed": 0, "reload": False
+    }}]
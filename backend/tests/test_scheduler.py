@@ -0,0 +1,217 @@
+"""
+Auction scheduler: timer bookkeeping, firing order and the guarded status moves
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from api.bid_engine import bid_engine
+from api.scheduler import CLOSE, MAX_CONCURRENT_FIRES, START, AuctionScheduler
+from database import models
+
+pytestmark = pytest.mark.anyio
+
+
+def _at(seconds: float) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=seconds)
+
+
+def test_reschedule_supersedes_earlier_timer():
+    scheduler = AuctionScheduler()
+    first, later = _at(60), _at(120)
+
+    scheduler.track("a", "scheduled", first, None)
+    scheduler.track("a", "live", None, later)
+
+    assert len(scheduler) == 1
+    assert scheduler._due["a"] == (later, CLOSE)
+    # The old entry stays in the heap until it is skipped
+    assert len(scheduler._heap) == 2
+
+
+def test_unchanged_timer_is_not_pushed_again():
+    scheduler = AuctionScheduler()
+    when = _at(60)
+
+    scheduler.track("a", "scheduled", when, None)
+    scheduler.track("a", "scheduled", when, None)
+
+    assert len(scheduler._heap) == 1
+
+
+def test_untracked_statuses_drop_the_timer():
+    scheduler = AuctionScheduler()
+    scheduler.track("a", "scheduled", _at(60), None)
+
+    scheduler.track("a", "completed", None, None)
+    scheduler.track("b", "live", None, None)
+
+    assert len(scheduler) == 0
+
+
+def test_heap_is_rebuilt_once_mostly_superseded():
+    scheduler = AuctionScheduler()
+    base = _at(60)
+    scheduler.track("b", "live", None, base)
+    # One live timer each for "a" and "b": up to 2 * 2 + 64 entries are left alone
+    for n in range(68):
+        scheduler.track("a", "live", None, base + timedelta(seconds=n))
+    assert len(scheduler._heap) == 69
+
+    scheduler.track("a", "live", None, base + timedelta(seconds=100))
+
+    assert sorted((entry[0], entry[2], entry[3]) for entry in scheduler._heap) == [
+        (base, "b", CLOSE), (base + timedelta(seconds=100), "a", CLOSE)
+    ]
+
+
+def test_extend_is_ignored_when_not_running():
+    scheduler = AuctionScheduler()
+    scheduler.track("a", "live", None, _at(60))
+
+    scheduler.extend("a", _at(120))
+
+    assert scheduler._due["a"][0] < _at(90)
+
+
+class Recorder:
+    """Runs the scheduler loop with _fire replaced by a log of what came due"""
+
+    def __init__(self):
+        self.scheduler = AuctionScheduler()
+        self.fired = []
+        self.event = asyncio.Event()
+
+    async def _fire(self, auction_id, action):
+        self.fired.append((auction_id, action))
+        self.event.set()
+
+    async def __aenter__(self):
+        self.scheduler._wake = asyncio.Event()
+        self.scheduler._fires = asyncio.Semaphore(MAX_CONCURRENT_FIRES)
+        self.scheduler._fire = self._fire
+        self.scheduler._task = asyncio.create_task(self.scheduler._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.scheduler.stop()
+
+    async def wait(self, count: int):
+        while len(self.fired) < count:
+            self.event.clear()
+            await asyncio.wait_for(self.event.wait(), 2)
+
+
+async def test_timers_fire_in_deadline_order():
+    async with Recorder() as recorder:
+        recorder.scheduler.track("late", "live", None, _at(0.1))
+        recorder.scheduler.track("early", "scheduled", _at(0.03), None)
+        recorder.scheduler.track("due", "scheduled", _at(-1), None)
+
+        await recorder.wait(3)
+
+    assert recorder.fired == [("due", START), ("early", START), ("late", CLOSE)]
+    assert len(recorder.scheduler) == 0
+
+
+async def test_superseded_timer_does_not_fire():
+    async with Recorder() as recorder:
+        recorder.scheduler.track("a", "scheduled", _at(0.03), None)
+        recorder.scheduler.track("a", "live", None, _at(0.1))
+        recorder.scheduler.track("b", "live", None, _at(0.06))
+
+        await recorder.wait(2)
+
+    assert recorder.fired == [("b", CLOSE), ("a", CLOSE)]
+
+
+async def test_extend_pushes_the_close_back(db, make_auction):
+    auction = await make_auction()
+    auction_id = str(auction.id)
+    auction.ends_at = _at(0.05)
+    await db.commit()
+
+    async with Recorder() as recorder:
+        recorder.scheduler.track(auction_id, "live", None, auction.ends_at)
+        extended = _at(0.2)
+        recorder.scheduler.extend(auction_id, extended)
+
+        await recorder.wait(1)
+        fired_at = datetime.utcnow()
+        # Let the background save finish before the loop goes away
+        await asyncio.gather(*recorder.scheduler._pending)
+
+    assert recorder.fired == [(auction_id, CLOSE)]
+    assert fired_at >= extended
+    await db.refresh(auction)
+    assert auction.ends_at == extended
+
+
+async def test_close_waits_for_an_extension_held_by_the_engine(db, make_auction):
+    auction = await make_auction()
+    auction_id = str(auction.id)
+    auction.ends_at = _at(-1)
+    await db.commit()
+    extended = _at(30)
+    bid_engine.open(auction_id, Decimal("100.00"), ends_at=extended)
+    scheduler = AuctionScheduler()
+
+    try:
+        await scheduler._close(auction_id)
+    finally:
+        bid_engine.close(auction_id)
+
+    assert scheduler._due[auction_id] == (extended, CLOSE)
+    await db.refresh(auction)
+    assert auction.status == "live"
+
+
+async def test_close_only_ends_auctions_past_their_end(db, make_auction):
+    ended, extended = await make_auction(), await make_auction()
+    ended.ends_at = _at(-1)
+    extended.ends_at = _at(60)
+    await db.commit()
+    scheduler = AuctionScheduler()
+
+    await scheduler._close(str(ended.id))
+    await scheduler._close(str(extended.id))
+
+    await db.refresh(ended)
+    await db.refresh(extended)
+    assert ended.status == "completed"
+    assert extended.status == "live"
+    # The one that was extended elsewhere keeps a timer at its new end
+    assert scheduler._due == {str(extended.id): (extended.ends_at, CLOSE)}
+
+
+async def test_start_only_opens_auctions_that_are_due(db, make_auction):
+    due, moved = await make_auction(status="scheduled"), await make_auction(status="scheduled")
+    due.auction_date = _at(-1)
+    moved.auction_date = _at(60)
+    await db.commit()
+    scheduler = AuctionScheduler()
+
+    await scheduler._start(str(due.id))
+    await scheduler._start(str(moved.id))
+
+    await db.refresh(due)
+    await db.refresh(moved)
+    assert due.status == "live"
+    assert moved.status == "scheduled"
+    assert scheduler._due == {str(moved.id): (moved.auction_date, START)}
+
+
+async def test_start_of_a_deleted_auction_drops_the_timer(db, make_auction):
+    auction = await make_auction(status="scheduled")
+    auction_id = str(auction.id)
+    await db.delete(auction)
+    await db.commit()
+    scheduler = AuctionScheduler()
+    scheduler.track(auction_id, "scheduled", _at(-1), None)
+
+    await scheduler._start(auction_id)
+
+    assert len(scheduler) == 0
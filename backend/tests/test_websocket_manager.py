@@ -0,0 +1,95 @@
+"""
+WebSocket connections: bounded send queues and dropping stale frames without seq gaps
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from api.config import WS_SEND_QUEUE_SIZE
+from api.websocket_manager import Connection
+from api.ws_codec import ENCODING_JSON, encode_frame
+
+pytestmark = pytest.mark.anyio
+
+
+class StalledSocket:
+    """A client that never reads, so everything stays queued"""
+
+    def __init__(self):
+        self.stalled = asyncio.Event()
+
+    async def send_text(self, frame: str):
+        await self.stalled.wait()
+
+
+@pytest.fixture
+async def connection():
+    closed = []
+    connection = Connection(StalledSocket(), "u", "Tester", on_close=closed.append)
+    yield connection
+    connection.close()
+
+
+def _queued(connection: Connection) -> list:
+    return [json.loads(frame) for _, frame in connection._queue]
+
+
+def _event(connection: Connection, message_type: str, seq: int) -> bool:
+    frame = encode_frame(ENCODING_JSON, message_type, {"n": seq}, seq)
+    return connection.send(message_type, frame, ("epoch", seq))
+
+
+async def test_full_queue_disconnects_on_other_events(connection):
+    for seq in range(1, WS_SEND_QUEUE_SIZE + 1):
+        assert _event(connection, "chatMessage", seq)
+
+    assert not _event(connection, "chatMessage", WS_SEND_QUEUE_SIZE + 1)
+
+
+async def test_dropped_bid_updates_become_one_reload(connection):
+    for seq in range(1, WS_SEND_QUEUE_SIZE):
+        assert _event(connection, "chatMessage", seq)
+    assert _event(connection, "bidUpdated", WS_SEND_QUEUE_SIZE)
+
+    # Full: the queued price update is dropped, and so is this one
+    assert _event(connection, "bidUpdated", WS_SEND_QUEUE_SIZE + 1)
+    last = _queued(connection)[-1]
+    assert last == {"type": "sync", "data": {
+        "epoch": "epoch", "seq": WS_SEND_QUEUE_SIZE + 1, "replayed": 0, "reload": True
+    }}
+
+    # Later price updates replace the pending reload, moving its cursor on
+    assert _event(connection, "bidUpdated", WS_SEND_QUEUE_SIZE + 2)
+    frames = _queued(connection)
+    assert len(frames) == WS_SEND_QUEUE_SIZE
+    assert [frame["type"] for frame in frames].count("sync") == 1
+    assert frames[-1]["data"]["seq"] == WS_SEND_QUEUE_SIZE + 2
+    assert all(frame["type"] != "bidUpdated" for frame in frames)
+
+
+async def test_pending_reload_survives_unnumbered_replacement(connection):
+    for seq in range(1, WS_SEND_QUEUE_SIZE - 1):
+        assert _event(connection, "chatMessage", seq)
+    assert connection.send("presenceCount", encode_frame(ENCODING_JSON, "presenceCount", {"count": 1}))
+    assert _event(connection, "bidUpdated", WS_SEND_QUEUE_SIZE - 1)
+    # Full: the price update turns into a reload
+    assert _event(connection, "bidUpdated", WS_SEND_QUEUE_SIZE)
+    assert _queued(connection)[-1]["type"] == "sync"
+
+    assert connection.send("presenceCount", encode_frame(ENCODING_JSON, "presenceCount", {"count": 2}))
+
+    frames = _queued(connection)
+    assert [frame["type"] for frame in frames[-2:]] == ["sync", "presenceCount"]
+    assert frames[-2]["data"] == {"epoch": "epoch", "seq": WS_SEND_QUEUE_SIZE, "replayed": 0, "reload": True}
+
+
+async def test_unnumbered_frames_are_simply_replaced(connection):
+    for seq in range(1, WS_SEND_QUEUE_SIZE):
+        assert _event(connection, "chatMessage", seq)
+    assert connection.send("presenceCount", encode_frame(ENCODING_JSON, "presenceCount", {"count": 1}))
+
+    assert connection.send("presenceCount", encode_frame(ENCODING_JSON, "presenceCount", {"count": 2}))
+
+    assert _queued(connection)[-1] == {"type": "presenceCount", "data": {"count": 2}}
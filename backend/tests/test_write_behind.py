@@ -0,0 +1,113 @@
+"""
+Write-behind queue: group commit, failure isolation and retraction of failed bids
+"""
+
+import asyncio
+import uuid
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from database import models
+from api.bid_engine import AcceptedBid, bid_engine
+from api.metrics import bids_total
+from api.routers import bids as bids_router
+from api.write_behind import WriteBehind
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def write_behind(db):
+    queue = WriteBehind(flush_interval=0.001, max_batch=100)
+    yield queue
+    await queue.stop()
+
+
+def _bid(auction: models.Auction, amount: str, type: str = "online") -> AcceptedBid:
+    return AcceptedBid(str(auction.id), Decimal(amount), type, "Tester")
+
+
+def _message(auction: models.Auction, user: models.User, text) -> dict:
+    return {"id": uuid.uuid4(), "auction_id": auction.id, "user_id": user.id, "message": text}
+
+
+async def test_bids_and_messages_share_one_flush(db, user, make_auction, write_behind):
+    auction = await make_auction("100.00")
+    first, second = _bid(auction, "110"), _bid(auction, "120")
+
+    results = await asyncio.gather(
+        write_behind.submit_bid(first),
+        write_behind.submit_bid(second),
+        write_behind.submit_message(_message(auction, user, "hello")),
+    )
+
+    assert results == [first.timestamp, second.timestamp, None]
+    assert await db.scalar(select(models.Auction.current_price).where(models.Auction.id == auction.id)) == Decimal("120.00")
+
+
+async def test_lost_race_resolves_to_none(db, make_auction, write_behind):
+    auction = await make_auction("200.00")
+
+    assert await write_behind.submit_bid(_bid(auction, "150")) is None
+
+
+async def test_failing_group_only_fails_its_own_rows(db, user, make_auction, write_behind):
+    good, bad = await make_auction("100.00"), await make_auction("100.00")
+
+    results = await asyncio.gather(
+        write_behind.submit_bid(_bid(good, "110")),
+        # NOT NULL violation inside the bad auction's savepoint
+        write_behind.submit_bid(_bid(bad, "110", type=None)),
+        write_behind.submit_message(_message(good, user, None)),
+        return_exceptions=True,
+    )
+
+    assert not isinstance(results[0], Exception)
+    assert isinstance(results[1], Exception)
+    assert isinstance(results[2], Exception)
+    prices = dict((await db.execute(
+        select(models.Auction.id, models.Auction.current_price)
+        .where(models.Auction.id.in_((good.id, bad.id)))
+    )).all())
+    assert prices == {good.id: Decimal("110.00"), bad.id: Decimal("100.00")}
+
+
+@pytest.fixture
+def retracted(monkeypatch):
+    sent = []
+
+    async def broadcast_bid_rejected(auction_id, bid_id):
+        sent.append(bid_id)
+
+    monkeypatch.setattr(bids_router.manager, "broadcast_bid_rejected", broadcast_bid_rejected)
+    return sent
+
+
+async def test_failed_write_retracts_the_bid(db, make_auction, retracted):
+    auction = await make_auction("100.00")
+    bid = _bid(auction, "110")
+    bid_engine.open(bid.auction_id, Decimal("110.00"))
+    failures = bids_total._values.get(("rejected", "persist_error"), 0)
+
+    with pytest.raises(RuntimeError):
+        await bids_router._settle_bid(db, bid, RuntimeError("disk full"))
+
+    assert retracted == [str(bid.id)]
+    assert not bid_engine.is_loaded(bid.auction_id)
+    assert bids_total._values[("rejected", "persist_error")] == failures + 1
+
+
+async def test_lost_race_retracts_the_bid(db, make_auction, retracted):
+    auction = await make_auction("150.00")
+    bid = _bid(auction, "120")
+    bid_engine.open(bid.auction_id, Decimal("120.00"))
+
+    with pytest.raises(HTTPException) as e:
+        await bids_router._settle_bid(db, bid, None)
+
+    assert e.value.detail == "Bid must be higher than current price: $150.00"
+    assert retracted == [str(bid.id)]
+    assert not bid_engine.is_loaded(bid.auction_id)
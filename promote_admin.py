@@ -12,6 +12,8 @@ load_dotenv(os.path.join(os.path.dirname(__file__), 'backend', '.env'))
 
 from backend.database.database import SessionLocal
 from backend.database import models
+# Registers the hooks that tell running API workers to drop cached copies of changed users
+from backend.database import user_events
 
 def promote_user(email):
     db = SessionLocal()
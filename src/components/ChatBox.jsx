@@ -27,7 +27,8 @@ const ChatBox = ({ auctionId: propAuctionId, isAdminView = false }) => {
         const loadHistory = async () => {
             try {
                 const res = await chatAPI.getHistory(auctionId);
-                const formattedMessages = res.data.map(msg => ({
+                // The API returns the newest messages first; the chat reads top to bottom
+                const formattedMessages = [...res.data].reverse().map(msg => ({
                     id: msg.id,
                     user: msg.user_name || (msg.is_admin_message ? 'System' : 'Unknown'),
                     text: msg.message,
@@ -77,14 +77,30 @@ const AuctionRoom = () => {
             setCurrentPrice(newBid.amount);
         };
 
+        // Missed events left the server's buffer, or were dropped while we fell behind
+        const handleRoomReload = () => {
+            loadAuction();
+            loadBids();
+        };
+
+        // A broadcast bid failed to persist: drop it and refetch the committed price
+        const handleBidRejected = (data) => {
+            setCurrentBids(prev => prev.filter(bid => String(bid.id) !== String(data.id)));
+            handleRoomReload();
+        };
+
         socketService.on('bid_update', handleBidUpdate);
         // Also listen for legacy event name just in case
         socketService.on('bidUpdated', handleBidUpdate);
+        socketService.on('roomReload', handleRoomReload);
+        socketService.on('bidRejected', handleBidRejected);
 
         return () => {
             socketService.leaveAuction(id);
             socketService.off('bid_update', handleBidUpdate);
             socketService.off('bidUpdated', handleBidUpdate);
+            socketService.off('roomReload', handleRoomReload);
+            socketService.off('bidRejected', handleBidRejected);
         };
     }, [id]);
 
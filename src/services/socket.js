@@ -11,6 +11,10 @@ class SocketService {
         this.currentAuctionId = null;
         this.listeners = new Map();
         this.reconnectTimer = null;
+        // Room presence rebuilt from presenceSnapshot / presenceDelta frames
+        this.presence = { version: 0, count: 0, participants: new Map() };
+        // Position in the room's event stream ({ epoch, seq }), used to resume after a drop
+        this.cursor = null;
     }
 
     connect() {
@@ -26,6 +30,7 @@ class SocketService {
         // Leave any previous room first
         if (this.currentAuctionId && this.currentAuctionId !== String(auctionId)) {
             this._closeSocket();
+            this.cursor = null;
         }
         this.currentAuctionId = String(auctionId);
         this._openSocket(auctionId);
@@ -36,6 +41,7 @@ class SocketService {
         if (this.currentAuctionId === String(auctionId)) {
             this._closeSocket();
             this.currentAuctionId = null;
+            this.cursor = null;
         }
     }
 
@@ -72,7 +78,12 @@ class SocketService {
         if (this.socket) return; // Already open
 
         const token = localStorage.getItem('access_token');
-        const url = `${WS_BASE}/api/bids/ws/${auctionId}${token ? `?token=${token}` : ''}`;
+        const params = new URLSearchParams();
+        if (token) params.set('token', token);
+        // Resume where we left off: the server replays only the events we missed
+        if (this.cursor) params.set('since', `${this.cursor.epoch}:${this.cursor.seq}`);
+        const query = params.toString();
+        const url = `${WS_BASE}/api/bids/ws/${auctionId}${query ? `?${query}` : ''}`;
         console.log('[WS] Connecting to', url);
 
         try {
@@ -91,6 +102,21 @@ class SocketService {
                     const message = JSON.parse(event.data);
                     const type = message.type;
                     const data = message.data || message;
+                    if (message.seq != null && this.cursor) {
+                        this.cursor.seq = message.seq;
+                    }
+                    if (type === 'sync') {
+                        this.cursor = { epoch: data.epoch, seq: data.seq };
+                        // Missed events are no longer buffered, or were dropped while this
+                        // client fell behind: listeners should refetch
+                        if (data.reload) this._trigger('roomReload', data);
+                        return;
+                    }
+                    if (type === 'presenceSnapshot' || type === 'presenceDelta' || type === 'presenceCount') {
+                        this._applyPresence(type, data);
+                        return;
+                    }
+                    // Room events (bidUpdated, bidRejected, chatMessage, ...) go to listeners by type
                     this._trigger(type, data);
                 } catch (e) {
                     console.error('[WS] Failed to parse message:', e);
@@ -128,6 +154,29 @@ class SocketService {
         }
     }
 
+    /**
+     * Keep the room's participant list from a snapshot plus deltas and hand
+     * listeners the same { count, participants } shape as before.
+     * Deltas are idempotent, so one overlapping the snapshot is harmless.
+     */
+    _applyPresence(type, data) {
+        const presence = this.presence;
+        if (type === 'presenceSnapshot') {
+            presence.participants = new Map(
+                (data.participants || []).map(p => [p.user_id, p])
+            );
+        } else if (type === 'presenceDelta') {
+            (data.joined || []).forEach(p => presence.participants.set(p.user_id, p));
+            (data.left || []).forEach(userId => presence.participants.delete(userId));
+        }
+        presence.version = data.version;
+        presence.count = data.count;
+        this._trigger('participantUpdate', {
+            count: presence.count,
+            participants: Array.from(presence.participants.values())
+        });
+    }
+
     _trigger(event, data) {
         const callbacks = this.listeners.get(event);
         if (callbacks) {